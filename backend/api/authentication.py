@@ -0,0 +1,127 @@
+"""
+JWT authentication that resolves the caller's identity from token claims.
+
+Access tokens carry the user ID, the staff flag and the customer ID (see
+``CustomTokenObtainPairSerializer``). ``ClaimsJWTAuthentication`` turns them
+into a ``RequestIdentity`` without loading the User or Customer rows; the only
+lookup is the account state from ``utils.lookup_utils.get_user_identity``,
+which is served from process memory and lets a deactivated account or a
+revoked staff flag take effect before its tokens expire.
+
+``request.user`` is an ``IdentityUser``: the ID and flags are answered from the
+identity, and any other attribute loads the real User on first use, so views
+that need the full account (profile, password change) keep working.
+"""
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from utils.lookup_utils import get_customer_id, get_user_identity
+
+CUSTOMER_ID_CLAIM = 'customer_id'
+STAFF_CLAIM = 'is_staff'
+
+
+class RequestIdentity:
+    """Who is making the request: user ID, customer ID (or None) and staff flags"""
+
+    __slots__ = ('user_id', 'customer_id', 'is_staff', 'is_superuser')
+
+    def __init__(self, user_id, customer_id, is_staff, is_superuser=False):
+        self.user_id = user_id
+        self.customer_id = customer_id
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+
+    def __repr__(self):
+        return f"<RequestIdentity user={self.user_id} customer={self.customer_id} staff={self.is_staff}>"
+
+
+class IdentityUser(SimpleLazyObject):
+    """
+    Lazily loaded User that answers identity attributes without a query.
+    """
+
+    def __init__(self, identity):
+        user_id = identity.user_id
+        super().__init__(lambda: get_user_model().objects.get(pk=user_id))
+        self.__dict__['identity'] = identity
+
+    def __bool__(self):
+        return True
+
+    @property
+    def pk(self):
+        return self.identity.user_id
+
+    id = pk
+
+    @property
+    def customer_id(self):
+        return self.identity.customer_id
+
+    @property
+    def is_staff(self):
+        return self.identity.is_staff
+
+    @property
+    def is_superuser(self):
+        return self.identity.is_superuser
+
+    @property
+    def is_active(self):
+        return True
+
+    @property
+    def is_authenticated(self):
+        return True
+
+    @property
+    def is_anonymous(self):
+        return False
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that builds ``request.user`` from the token claims"""
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        state = get_user_identity(user_id)
+        if state is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not state['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+
+        # A revoked staff flag applies at once, a granted one with the next
+        # token. Tokens issued before the claims existed, or before the
+        # customer profile was created, use the account state.
+        is_staff = bool(validated_token.get(STAFF_CLAIM, state['is_staff'])) and state['is_staff']
+        customer_id = validated_token.get(CUSTOMER_ID_CLAIM) or state['customer_id']
+
+        return IdentityUser(RequestIdentity(
+            user_id=user_id,
+            customer_id=customer_id,
+            is_staff=is_staff,
+            is_superuser=state['is_superuser'],
+        ))
+
+
+def request_customer_id(request):
+    """
+    Customer ID of the authenticated user, or None.
+
+    Read from the JWT identity when there is one; session-authenticated users
+    (admin, browsable API) fall back to the cached lookup.
+    """
+    identity = getattr(request.user, 'identity', None)
+    if identity is not None:
+        return identity.customer_id
+    return get_customer_id(request.user.pk)
@@ -0,0 +1,40 @@
+"""
+Filter backends shared by the API viewsets.
+"""
+from rest_framework import filters
+
+
+class FullTextSearchFilter(filters.SearchFilter):
+    """
+    SearchFilter that hands the ``search`` parameter to the view's
+    ``full_text_search(queryset, text)`` (see utils.search_utils) instead of
+    chaining ``icontains`` over ``search_fields``. Views without one keep the
+    SearchFilter behaviour.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search = getattr(view, 'full_text_search', None)
+        if search is None:
+            return super().filter_queryset(request, queryset, view)
+
+        text = request.query_params.get(self.search_param, '').strip()
+        if not text:
+            return queryset
+        return search(queryset, text)
+
+
+class RankedOrderingFilter(filters.OrderingFilter):
+    """
+    OrderingFilter that keeps the relevance order of ``FullTextSearchFilter``.
+
+    With a ``search`` term and no ``ordering`` parameter the view's default
+    ``ordering`` is not applied, so results stay sorted by search rank. An
+    explicit ``ordering`` parameter still wins.
+    """
+
+    def get_default_ordering(self, view):
+        request = getattr(view, 'request', None)
+        if (request is not None and getattr(view, 'full_text_search', None) is not None
+                and request.query_params.get(filters.SearchFilter.search_param, '').strip()):
+            return None
+        return super().get_default_ordering(view)
@@ -0,0 +1,82 @@
+"""
+Which API requests read from a replica (see utils.replica_utils).
+
+A viewset opts actions in with ``replica_actions``. READ_REPLICA_ACTIONS in
+settings overrides it per viewset class name, e.g.
+``{'InvoiceViewSet': ['list'], 'CarViewSet': []}``. Function views opt in
+with ``replica_view``.
+
+Only safe requests are routed, and never for a user pinned to the primary by
+a recent write. ``ReplicaPinMiddleware`` sets that pin after every unsafe
+request. It runs after the view, so ``request.user`` is also set for JWT
+requests, which DRF authenticates inside the view.
+
+Cached values, including ``cache_response`` responses and autocomplete
+results, are built on the primary by ``utils.cache_utils``. A lagging replica
+would otherwise store stale data under the new versions, and other users
+would be served it until the next write. Actions wrapped in
+``cache_response`` would gain nothing from a replica, so they are not listed
+in ``replica_actions``.
+"""
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+from utils.replica_utils import is_pinned, pin_to_primary, use_replica
+
+REPLICA_ACTIONS = getattr(settings, 'READ_REPLICA_ACTIONS', {})
+
+
+def _reads_from_replica(request):
+    if request.method not in SAFE_METHODS:
+        return False
+    return not (request.user.is_authenticated and is_pinned(request.user.pk))
+
+
+class ReplicaRoutingMixin:
+    """Serve the ``replica_actions`` of a viewset from a read replica"""
+
+    replica_actions = ()
+
+    def get_replica_actions(self):
+        return REPLICA_ACTIONS.get(type(self).__name__, self.replica_actions)
+
+    def dispatch(self, request, *args, **kwargs):
+        # Closed once the response is built, whichever way dispatch returns
+        self._replica_scope = ExitStack()
+        with self._replica_scope:
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        # Authentication and permission checks run on the primary
+        super().initial(request, *args, **kwargs)
+        if self.action in self.get_replica_actions() and _reads_from_replica(request):
+            self._replica_scope.enter_context(use_replica())
+
+
+def replica_view(view):
+    """Serve a function view from a read replica; apply it below ``@api_view``"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not _reads_from_replica(request):
+            return view(request, *args, **kwargs)
+        with use_replica():
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """Pin a user's reads to the primary for a while after they write"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                pin_to_primary(user.pk)
+        return response
@@ -0,0 +1,62 @@
+"""
+Per-user, version-aware caching of DRF responses.
+
+``cache_response`` replaces ``cache_page`` + ``vary_on_cookie`` on read
+endpoints. Entries are keyed on the authenticated user, the action, the full
+path and the versions of the data the response is built from (see
+``utils.cache_utils``), so a response is never shared between users and an
+edit to any dependency makes the next request rebuild it.
+
+On detail routes the object is looked up with ``view.get_object()`` before the
+cache is consulted, so permission checks always run against live data and the
+dependencies can name the object and its relations.
+"""
+from functools import wraps
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from utils.cache_utils import NOT_CACHEABLE, get_or_compute, versioned_key
+
+DEFAULT_TIMEOUT = getattr(settings, 'CACHE_TTL', 60 * 15)
+
+
+def cache_response(depends_on, timeout=None):
+    """
+    Cache a viewset method's successful responses per user.
+
+    Args:
+        depends_on (callable): Takes (request, obj) and returns the cache_utils
+            dependencies of the response; ``obj`` is None on list routes
+        timeout (int, optional): Cache timeout in seconds. Defaults to settings.CACHE_TTL.
+
+    Returns:
+        callable: Decorated method
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+                return method(view, request, *args, **kwargs)
+
+            obj = view.get_object() if (view.lookup_url_kwarg or view.lookup_field) in kwargs else None
+            key = versioned_key(
+                f"response:{view.__class__.__name__}:{method.__name__}:user:{request.user.pk}:{request.get_full_path()}",
+                depends_on(request, obj),
+            )
+
+            response = None
+
+            def build():
+                nonlocal response
+                response = method(view, request, *args, **kwargs)
+                return response.data if response.status_code == status.HTTP_200_OK else NOT_CACHEABLE
+
+            # Concurrent misses on the same key are collapsed into one build
+            data = get_or_compute(key, build, timeout or DEFAULT_TIMEOUT)
+            if response is not None:
+                return response
+            return Response(data)
+        return wrapper
+    return decorator
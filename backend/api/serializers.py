@@ -1,13 +1,17 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from core.models import Customer, Car, Service, ServiceItem, Invoice, Notification, ServiceInterval, MileageUpdate, ServiceHistory
+from core.models import Customer, Car, Service, ServiceItem, Invoice, Notification, ServiceInterval, MileageUpdate, ServiceHistory, ArchivedNotification
 from django.contrib.auth.password_validation import validate_password
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework.exceptions import AuthenticationFailed
 from drf_yasg.utils import swagger_serializer_method
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from django.core.exceptions import ValidationError as DjangoValidationError
 from django.db import transaction
+from utils.lookup_utils import get_customer_id, get_user_identity
+from .tokens import RedisRefreshToken, record_login
 import logging
 
 logger = logging.getLogger(__name__)
@@ -165,7 +169,7 @@ class ServiceSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Service
-        fields = ['id', 'car', 'car_details', 'title', 'description', 'status', 
+        fields = ['id', 'car', 'car_id', 'car_details', 'title', 'description', 'status', 
                  'scheduled_date', 'completed_date', 'technician_notes', 
                  'service_mileage', 'service_type', 'service_type_id', 'is_routine_maintenance',
                  'service_items', 'created_at', 'updated_at', 'service_type_details']
@@ -300,6 +304,19 @@ class NotificationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
         ref_name = 'NotificationFull'
 
+class ArchivedNotificationSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='original_id', read_only=True)
+    is_read = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = ArchivedNotification
+        fields = ['id', 'title', 'message', 'notification_type', 'is_read', 'created_at', 'archived_at']
+        read_only_fields = fields
+    
+    def get_is_read(self, obj):
+        # Only read notifications are archived
+        return True
+
 # Registration and authentication serializers
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
@@ -348,6 +365,13 @@ class ChangePasswordSerializer(serializers.Serializer):
         return attrs
 
 class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
+    token_class = RedisRefreshToken
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        record_login(self.user)
+        return data
+
     @classmethod
     def get_token(cls, user):
         token = super().get_token(user)
@@ -356,12 +380,42 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         token['username'] = user.username
         token['email'] = user.email
         token['is_staff'] = user.is_staff
+        # Lets ClaimsJWTAuthentication scope requests without loading the customer
+        token['customer_id'] = get_customer_id(user.pk)
         
         return token 
 
     class Meta:
         ref_name = 'TokenObtainPair'
 
+class RedisTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh with the token state in Redis. The account check uses the cached
+    identity state instead of loading the user.
+    """
+    token_class = RedisRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+
+        state = get_user_identity(refresh.payload.get(jwt_settings.USER_ID_CLAIM))
+        if state is None or not state['is_active']:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+
+        if jwt_settings.ROTATE_REFRESH_TOKENS:
+            # Blacklist first: a token replayed concurrently loses here
+            if jwt_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            data = {'access': str(refresh.access_token)}
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+            return data
+
+        return {'access': str(refresh.access_token)}
+
 class MileageUpdateSerializer(serializers.ModelSerializer):
     car_id = serializers.PrimaryKeyRelatedField(
         queryset=Car.objects.all(),
@@ -421,6 +475,40 @@ class MileageUpdateSerializer(serializers.ModelSerializer):
             
         return mileage_update
 
+class MileageReadingSerializer(serializers.Serializer):
+    """A single odometer reading inside a batch (documents MileageBatchRequestSerializer)"""
+    car_id = serializers.IntegerField(required=False, help_text="Car ID (or use license_plate)")
+    license_plate = serializers.CharField(required=False, help_text="License plate (used when car_id is not given)")
+    mileage = serializers.IntegerField(min_value=0)
+    reported_date = serializers.DateTimeField(required=False, help_text="Time of the reading; defaults to now")
+    notes = serializers.CharField(required=False, allow_blank=True)
+
+    class Meta:
+        ref_name = 'MileageReading'
+
+class MileageBatchSerializer(serializers.Serializer):
+    """
+    Envelope for batch mileage ingestion.
+    Individual readings are validated by utils.mileage_utils so that a bad
+    reading is rejected on its own instead of failing the whole batch.
+    """
+    readings = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+
+    class Meta:
+        ref_name = 'MileageBatch'
+
+    def validate_readings(self, value):
+        from utils.mileage_utils import MAX_BATCH_SIZE
+        if len(value) > MAX_BATCH_SIZE:
+            raise serializers.ValidationError(
+                _('A batch cannot contain more than {} readings.').format(MAX_BATCH_SIZE)
+            )
+        return value
+
+class MileageBatchRequestSerializer(MileageBatchSerializer):
+    """Request body of batch mileage ingestion as documented in the API schema"""
+    readings = serializers.ListField(child=MileageReadingSerializer(), allow_empty=False)
+
 class ServicePredictionSerializer(serializers.Serializer):
     """Serializer for service prediction results"""
     has_prediction = serializers.BooleanField()
@@ -0,0 +1,238 @@
+"""
+Server-Sent Events stream of new notifications.
+
+Served directly by the ASGI entry point (``ecar_backend.asgi``) at
+``/api/notifications/stream/`` so that an open stream costs one coroutine and
+no database connection: the JWT access token is verified from its signature
+alone, missed events come from the Redis backlog and live events arrive over
+one shared pub/sub connection per process.
+
+Clients authenticate with ``Authorization: Bearer <access token>`` or, for
+browser ``EventSource``, a ``?token=`` query parameter. After a reconnect the
+``Last-Event-ID`` header (or ``?last_event_id=``) replays missed events.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+import redis.asyncio as aioredis
+from django.conf import settings
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from utils.notification_stream import STREAM_REDIS_URL, CHANNEL_PREFIX, backlog_key
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/notifications/stream/'
+
+# Comment line sent when idle so proxies keep the connection open
+KEEPALIVE_SECONDS = getattr(settings, 'NOTIFICATION_STREAM_KEEPALIVE', 15)
+
+# Events buffered per stream before a slow client is disconnected (it resumes from its last ID)
+QUEUE_SIZE = 100
+
+# Client reconnect delay advertised in the stream
+RETRY_MILLISECONDS = 3000
+
+
+class NotificationBroker:
+    """
+    Fan out pub/sub messages to the streams open in this process.
+
+    One pattern subscription covers every user, so the number of Redis
+    connections does not grow with the number of open streams.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.redis = None
+        self.subscribers = defaultdict(set)
+        self.listener = None
+
+    def _ensure_started(self):
+        if self.redis is None:
+            self.redis = aioredis.from_url(self.url)
+        if self.listener is None or self.listener.done():
+            self.listener = asyncio.ensure_future(self._listen())
+
+    async def _listen(self):
+        delay = 1
+        while True:
+            try:
+                pubsub = self.redis.pubsub()
+                try:
+                    await pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                    delay = 1
+                    async for message in pubsub.listen():
+                        if message['type'] != 'pmessage':
+                            continue
+                        channel = message['channel'].decode()
+                        user_id = int(channel[len(CHANNEL_PREFIX):])
+                        for queue in list(self.subscribers.get(user_id, ())):
+                            try:
+                                queue.put_nowait(message['data'].decode())
+                            except asyncio.QueueFull:
+                                # Too far behind: end the stream, the client resumes from its last ID
+                                self.unsubscribe(user_id, queue)
+                                while not queue.empty():
+                                    queue.get_nowait()
+                                queue.put_nowait(None)
+                finally:
+                    # Release the connection before the next attempt opens another one
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Notification stream listener error, reconnecting in {delay}s: {str(e)}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def subscribe(self, user_id):
+        self._ensure_started()
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.subscribers[user_id].add(queue)
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self.subscribers[user_id]
+
+    async def backlog(self, user_id, after_id):
+        """Events newer than ``after_id`` still in the user's backlog"""
+        self._ensure_started()
+        items = await self.redis.zrangebyscore(backlog_key(user_id), f"({after_id}", '+inf')
+        return [item.decode() for item in items]
+
+
+broker = NotificationBroker(STREAM_REDIS_URL)
+
+
+def _authenticate(scope):
+    """Return (user_id, token expiry timestamp) from the access token, or None"""
+    headers = dict(scope.get('headers') or [])
+    query = parse_qs(scope.get('query_string', b'').decode())
+
+    raw_token = None
+    auth_header = headers.get(b'authorization', b'').decode()
+    parts = auth_header.split()
+    if len(parts) == 2 and parts[0] in jwt_settings.AUTH_HEADER_TYPES:
+        raw_token = parts[1]
+    elif query.get('token'):
+        raw_token = query['token'][0]
+    if not raw_token:
+        return None
+
+    try:
+        token = AccessToken(raw_token)
+    except TokenError:
+        return None
+    return token[jwt_settings.USER_ID_CLAIM], token['exp']
+
+
+def _last_event_id(scope):
+    headers = dict(scope.get('headers') or [])
+    query = parse_qs(scope.get('query_string', b'').decode())
+    value = headers.get(b'last-event-id', b'').decode() or (query.get('last_event_id') or [''])[0]
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _format_event(data):
+    event_id = json.loads(data)['id']
+    return f"id: {event_id}\nevent: notification\ndata: {data}\n\n".encode(), event_id
+
+
+async def _wait_for_disconnect(receive):
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return
+
+
+async def _send_json(send, status, body):
+    payload = json.dumps(body).encode()
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': payload})
+
+
+async def notification_stream_app(scope, receive, send):
+    """ASGI application serving one customer's notification stream"""
+    if scope['method'] != 'GET':
+        return await _send_json(send, 405, {'detail': 'Method not allowed'})
+
+    identity = _authenticate(scope)
+    if identity is None:
+        return await _send_json(send, 401, {'detail': 'Authentication credentials were not provided or are invalid.'})
+    user_id, expires_at = identity
+
+    # Subscribe before reading the backlog so nothing published in between is lost
+    queue = broker.subscribe(user_id)
+    disconnect = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': f"retry: {RETRY_MILLISECONDS}\n\n".encode(), 'more_body': True})
+
+        replayed = set()
+        last_event_id = _last_event_id(scope)
+        if last_event_id is not None:
+            for data in await broker.backlog(user_id, last_event_id):
+                body, event_id = _format_event(data)
+                replayed.add(event_id)
+                await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        while True:
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                # Client reconnects with a fresh token and its Last-Event-ID
+                await send({'type': 'http.response.body', 'body': b"event: reauthenticate\ndata: {}\n\n", 'more_body': True})
+                break
+
+            getter = asyncio.ensure_future(queue.get())
+            done, _ = await asyncio.wait(
+                {getter, disconnect},
+                timeout=min(KEEPALIVE_SECONDS, remaining),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if disconnect in done:
+                getter.cancel()
+                return
+            if getter not in done:
+                getter.cancel()
+                await send({'type': 'http.response.body', 'body': b": keepalive\n\n", 'more_body': True})
+                continue
+
+            data = getter.result()
+            if data is None:
+                break
+            body, event_id = _format_event(data)
+            # Skip events already replayed from the backlog
+            if event_id in replayed:
+                continue
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+        await send({'type': 'http.response.body', 'body': b'', 'more_body': False})
+    finally:
+        broker.unsubscribe(user_id, queue)
+        disconnect.cancel()
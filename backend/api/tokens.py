@@ -0,0 +1,95 @@
+"""
+Refresh token state kept in Redis instead of the token_blacklist tables.
+
+Every login and every refresh used to insert OutstandingToken and
+BlacklistedToken rows, which were never removed. ``RedisRefreshToken`` keeps
+the same state as cache keys that expire with the token:
+
+- ``jwt:outstanding:<jti>``: user ID of an issued refresh token
+- ``jwt:blacklist:<jti>``: set when the token is rotated or revoked
+
+Blacklisting uses ``cache.add``, so of two concurrent refreshes with the same
+token only one succeeds. If Redis is unavailable, refreshes are refused
+(access tokens keep working) rather than letting a rotated token be reused.
+
+``record_login`` replaces simplejwt's UPDATE_LAST_LOGIN and writes
+``last_login`` at most once per LAST_LOGIN_UPDATE_INTERVAL per user.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import BlacklistMixin, RefreshToken
+
+LAST_LOGIN_UPDATE_INTERVAL = getattr(settings, 'LAST_LOGIN_UPDATE_INTERVAL', 60 * 60)
+
+
+def _outstanding_key(jti):
+    return f"jwt:outstanding:{jti}"
+
+
+def _blacklist_key(jti):
+    return f"jwt:blacklist:{jti}"
+
+
+def _remaining_lifetime(exp):
+    """Seconds until ``exp`` (epoch seconds), at least 1"""
+    return max(int(exp - time.time()), 1)
+
+
+def is_blacklisted(jti):
+    return cache.get(_blacklist_key(jti)) is not None
+
+
+def blacklist_jti(jti, exp):
+    """
+    Blacklist a token until it expires.
+
+    Returns:
+        bool: True if this call blacklisted it, False if it already was
+        (or the cache could not be reached)
+    """
+    return bool(cache.add(_blacklist_key(jti), 1, _remaining_lifetime(exp)))
+
+
+class RedisRefreshToken(RefreshToken):
+    """RefreshToken whose outstanding and blacklisted state lives in the cache"""
+
+    def check_blacklist(self):
+        if is_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_("Token is blacklisted"))
+
+    def blacklist(self):
+        if not blacklist_jti(self.payload[api_settings.JTI_CLAIM], self.payload['exp']):
+            raise TokenError(_("Token is blacklisted"))
+
+    def outstand(self):
+        cache.set(
+            _outstanding_key(self.payload[api_settings.JTI_CLAIM]),
+            self.payload.get(api_settings.USER_ID_CLAIM),
+            _remaining_lifetime(self.payload['exp']),
+        )
+
+    @classmethod
+    def for_user(cls, user):
+        # Skip BlacklistMixin.for_user, which inserts an OutstandingToken row
+        token = super(BlacklistMixin, cls).for_user(user)
+        token.outstand()
+        return token
+
+
+def record_login(user):
+    """
+    Set ``last_login``, unless it was already set within the last
+    LAST_LOGIN_UPDATE_INTERVAL seconds.
+    """
+    if cache.add(f"jwt:last_login:{user.pk}", 1, LAST_LOGIN_UPDATE_INTERVAL):
+        now = timezone.now()
+        # update() rather than save(): no signals, no cache invalidation
+        get_user_model().objects.filter(pk=user.pk).update(last_login=now)
+        user.last_login = now
@@ -9,7 +9,7 @@ from .swagger_wrapper import FixedSchemaGenerator
 from .views import (
     UserViewSet, CustomerViewSet, CarViewSet, ServiceViewSet,
     ServiceItemViewSet, InvoiceViewSet, NotificationViewSet,
-    ChangePasswordView, get_user_data,
+    ChangePasswordView, get_user_data, cache_stats, global_search_view,
     RateLimitedTokenObtainPairView, RateLimitedTokenRefreshView,
     admin_login, MileageUpdateViewSet,
     ServiceIntervalViewSet, ServiceHistoryViewSet
@@ -76,6 +76,12 @@ urlpatterns = [
     # Admin Helper API
     path('get-user-data/', get_user_data, name='get_user_data'),
     
+    # Search across customers, cars, services and invoices
+    path('search/', global_search_view, name='global_search'),
+    
+    # Per-worker cache counters (staff only)
+    path('cache-stats/', cache_stats, name='cache_stats'),
+    
     # Admin Login API
     path('admin-login/', admin_login, name='admin_login'),
     
@@ -6,26 +6,23 @@ from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.auth.models import User
 from django.db.models import Q, Sum, F, DecimalField, Case, When, Max
 from django.db.models.functions import Coalesce
-from core.models import Customer, Car, Service, ServiceItem, Invoice, Notification, ServiceInterval, MileageUpdate, ServiceHistory
+from core.models import Customer, Car, Service, ServiceItem, Invoice, Notification, ServiceInterval, MileageUpdate, ServiceHistory, ArchivedNotification
 from .serializers import (
     UserSerializer, CustomerSerializer, CarSerializer, 
     ServiceSerializer, ServiceItemSerializer, InvoiceSerializer, 
     NotificationSerializer, UserRegistrationSerializer, ChangePasswordSerializer,
-    CustomTokenObtainPairSerializer, RefundRequestSerializer, MileageUpdateSerializer,
-    ServiceIntervalSerializer, ServicePredictionSerializer, ServiceHistorySerializer
+    CustomTokenObtainPairSerializer, RedisTokenRefreshSerializer, RefundRequestSerializer, MileageUpdateSerializer,
+    ServiceIntervalSerializer, ServicePredictionSerializer, ServiceHistorySerializer,
+    MileageBatchSerializer, MileageBatchRequestSerializer, ArchivedNotificationSerializer
 )
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django_ratelimit.decorators import ratelimit
-from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
-from django.views.decorators.cache import cache_page
-from django.views.decorators.vary import vary_on_cookie
 from django.views.decorators.http import require_GET, require_http_methods
 from django.contrib.auth import authenticate, login, logout
 from django.http import HttpResponseRedirect, HttpResponse
 from django.urls import reverse
-from django.conf import settings
 from django.utils.translation import gettext_lazy as _
 from django.utils import timezone
 from rest_framework.parsers import MultiPartParser, FormParser
@@ -37,6 +34,15 @@ from io import StringIO
 from drf_yasg.utils import swagger_auto_schema, no_body
 from drf_yasg import openapi
 from auditlog.registry import auditlog
+from .response_cache import cache_response
+from .replica_routing import ReplicaRoutingMixin, replica_view
+from utils.lookup_utils import get_applicable_service_intervals
+from .authentication import request_customer_id
+from .filters import FullTextSearchFilter, RankedOrderingFilter
+from utils.search_utils import search_customers, search_invoices, search_services, search_users
+from utils.autocomplete_utils import AUTOCOMPLETE_PAGE_SIZE, autocomplete, in_match_order
+from utils.vehicle_lookup_utils import lookup_car_ids
+from utils.global_search_utils import global_search
 import traceback # Added for detailed logging
 
 # Set up logger
@@ -64,44 +70,42 @@ class IsOwnerOrStaff(permissions.BasePermission):
         # Staff can do anything
         if request.user.is_staff:
             return True
+        
+        # Compare customer IDs rather than loading the owning user
+        customer_id = request_customer_id(request)
+        if customer_id is None:
+            return False
             
         # For Customer: check if the user is the customer
         if isinstance(obj, Customer):
-            return obj.user == request.user
+            return obj.pk == customer_id
             
         # For Car: check if the user is the car's customer
         if isinstance(obj, Car):
-            return obj.customer.user == request.user
-            
-        # For Service: check if the user is the car's customer
-        if isinstance(obj, Service):
-            return obj.car.customer.user == request.user
-            
-        # For ServiceItem: check if the user is the service's car's customer
-        if isinstance(obj, ServiceItem):
-            return obj.service.car.customer.user == request.user
+            return obj.customer_id == customer_id
             
-        # For Invoice: check if the user is the service's car's customer
-        if isinstance(obj, Invoice):
-            return obj.service.car.customer.user == request.user
+        # Service, ServiceItem, Invoice: denormalized copy of the car's customer
+        if isinstance(obj, (Service, ServiceItem, Invoice)):
+            return obj.customer_id == customer_id
             
         # For Notification: check if the user is the notification's customer
         if isinstance(obj, Notification):
-            return obj.customer.user == request.user
+            return obj.customer_id == customer_id
             
         return False
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     Added filtering to find users without an associated customer profile.
     Added /me endpoint to get current user details.
     """
     serializer_class = UserSerializer
+    replica_actions = ('list',)
     permission_classes = [IsAuthenticated, IsAdminUser]
     # Define filter backends to enable filtering
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ['username', 'first_name', 'last_name', 'email']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
+    full_text_search = staticmethod(search_users)
     ordering_fields = ['username', 'first_name', 'last_name', 'email']
     ordering = ['username']
 
@@ -180,12 +184,13 @@ class UserViewSet(viewsets.ModelViewSet):
         # Should not happen with methods=['get', 'patch', 'put']
         return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
 
-class CustomerViewSet(viewsets.ModelViewSet):
+class CustomerViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows customers to be viewed or edited.
     Users can only view and edit their own customer profile.
     """
     serializer_class = CustomerSerializer  
+    replica_actions = ('list', 'statistics', 'service_history', 'cars', 'export')
     permission_classes = [IsAuthenticated]
     
     def get_serializer_class(self):
@@ -195,8 +200,9 @@ class CustomerViewSet(viewsets.ModelViewSet):
         return self.serializer_class
     
     queryset = Customer.objects.all()
-    filterset_fields = ['user__email', 'phone', 'address']
-    search_fields = ['user__first_name', 'user__last_name', 'user__email', 'phone']
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
+    filterset_fields = ['user__email', 'phone']
+    full_text_search = staticmethod(search_customers)
     ordering_fields = ['user__last_name', 'user__email', 'created_at']
     ordering = ['-created_at']
     
@@ -265,35 +271,22 @@ class CustomerViewSet(viewsets.ModelViewSet):
     
     def get_queryset(self):
         """
-        Filter customers based on user permissions and search parameters.
-        Regular users only see their own profile, while staff can see all customers
-        and perform searches.
+        Filter customers based on user permissions.
+        Regular users only see their own profile, while staff can see all customers.
+        The search parameter is handled by FullTextSearchFilter.
         """
-        queryset = Customer.objects.all()
-        
         if not self.request.user.is_staff:
-            return Customer.objects.filter(user=self.request.user)
-            
-        # Add search functionality for staff users
-        search_query = self.request.query_params.get('search', None)
-        if search_query:
-            queryset = queryset.filter(
-                Q(user__first_name__icontains=search_query) | 
-                Q(user__last_name__icontains=search_query) | 
-                Q(user__email__icontains=search_query) | 
-                Q(phone__icontains=search_query)
-            )
+            return Customer.objects.filter(pk=request_customer_id(self.request))
             
-        return queryset
+        return Customer.objects.all()
     
-    @method_decorator(cache_page(settings.CACHE_TTL))
-    @method_decorator(vary_on_cookie)
     @action(detail=False, methods=['get'])
     @swagger_auto_schema(
         operation_summary="Get current customer profile",
         operation_description="Retrieve the authenticated user's customer profile",
         tags=['customers']
     )
+    @cache_response(lambda request, obj: [(User, request.user.pk)])
     def me(self, request):
         """
         Retrieve the authenticated user's customer profile.
@@ -306,7 +299,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
             404 Not Found: If the user doesn't have a customer profile
         """
         try:
-            customer = Customer.objects.get(user=request.user)
+            customer = Customer.objects.select_related('user').get(pk=request_customer_id(request))
             serializer = self.get_serializer(customer)
             return Response(serializer.data)
         except Customer.DoesNotExist:
@@ -345,20 +338,20 @@ class CustomerViewSet(viewsets.ModelViewSet):
         
         # Calculate statistics
         total_cars = Car.objects.filter(customer=customer).count()
-        total_services = Service.objects.filter(car__customer=customer).count()
+        total_services = Service.objects.filter(customer=customer).count()
         completed_services = Service.objects.filter(
-            car__customer=customer, 
+            customer=customer, 
             status='completed'
         ).count()
         
         # Get invoice data
-        invoices = Invoice.objects.filter(service__car__customer=customer)
+        invoices = Invoice.objects.filter(customer=customer)
         total_amount_spent = sum(invoice.total for invoice in invoices)
         paid_invoices = invoices.filter(status='paid').count()
         
         # Calculate last service date
         last_service = Service.objects.filter(
-            car__customer=customer
+            customer=customer
         ).order_by('-scheduled_date').first()
         
         last_service_date = last_service.scheduled_date if last_service else None
@@ -390,7 +383,7 @@ class CustomerViewSet(viewsets.ModelViewSet):
             200 OK: List of service objects with related data
         """
         customer = self.get_object()
-        services = Service.objects.filter(car__customer=customer).order_by('-scheduled_date')
+        services = Service.objects.filter(customer=customer).order_by('-scheduled_date')
         serializer = ServiceSerializer(services, many=True)
         return Response(serializer.data)
     
@@ -548,12 +541,13 @@ class CustomerViewSet(viewsets.ModelViewSet):
             
         return response
 
-class CarViewSet(viewsets.ModelViewSet):
+class CarViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows cars to be viewed or edited.
     Users can only view and edit their own cars.
     """
     serializer_class = CarSerializer
+    replica_actions = ('list', 'lookup', 'services', 'mileage_history', 'service_history')
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['make', 'model', 'year', 'license_plate', 'fuel_type']
@@ -570,12 +564,52 @@ class CarViewSet(viewsets.ModelViewSet):
         if self.request.user.is_staff:
             return Car.objects.all()
         
-        try:
-            customer = Customer.objects.get(user=self.request.user)
-            return Car.objects.filter(customer=customer)
-        except Customer.DoesNotExist:
+        customer_id = request_customer_id(self.request)
+        if customer_id is None:
             return Car.objects.none()
+        return Car.objects.filter(customer_id=customer_id)
     
+    @cache_response(lambda request, car: [car, (Customer, car.customer_id)])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+    @swagger_auto_schema(
+        operation_summary="Look up cars by license plate or VIN",
+        operation_description="Matches ignore case, spaces and dashes: '123 tu 4567' finds 123TU4567. "
+                              "Suffix matching finds a car from the last characters of its plate.",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, description="Plate or VIN, or part of it", type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('match', openapi.IN_QUERY, description="exact (default), prefix or suffix", type=openapi.TYPE_STRING),
+            openapi.Parameter('field', openapi.IN_QUERY, description="plate or vin; both when omitted", type=openapi.TYPE_STRING),
+        ],
+        responses={
+            200: CarSerializer(many=True),
+            400: "Bad request"
+        },
+        tags=['vehicles']
+    )
+    @action(detail=False, methods=['get'])
+    def lookup(self, request):
+        """
+        Find cars by normalized license plate or VIN, with exact, prefix or
+        suffix matching. Non-staff users only find their own cars.
+        """
+        term = request.query_params.get('q', '')
+        match = request.query_params.get('match', 'exact')
+        field = request.query_params.get('field')
+
+        if not term.strip():
+            return Response({"error": "q is required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            car_ids = lookup_car_ids(term, match=match, fields=[field] if field else None,
+                                     queryset=self.get_queryset())
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        cars = in_match_order(Car.objects.all(), car_ids)
+        serializer = self.get_serializer(cars, many=True)
+        return Response(serializer.data)
+
     @action(detail=True, methods=['get'])
     def services(self, request, pk=None):
         car = self.get_object()
@@ -636,14 +670,8 @@ class CarViewSet(viewsets.ModelViewSet):
             }).data)
         
         # Find applicable service intervals for this car
-        service_intervals = ServiceInterval.objects.filter(
-            Q(car_make=car.make, car_model=car.model) | 
-            Q(car_make=car.make, car_model__isnull=True) |
-            Q(car_make__isnull=True, car_model__isnull=True),
-            is_active=True
-        ).order_by('-car_make', '-car_model')
-        
-        service_interval = service_intervals.first() if service_intervals.exists() else None
+        service_intervals = get_applicable_service_intervals(car.make, car.model)
+        service_interval = service_intervals[0] if service_intervals else None
         
         days_until_service = (next_service_date - timezone.now().date()).days
         mileage_until_service = next_service_mileage - car.mileage
@@ -700,16 +728,17 @@ class CarViewSet(viewsets.ModelViewSet):
         serializer = ServiceHistorySerializer(service_history, many=True)
         return Response(serializer.data)
 
-class ServiceViewSet(viewsets.ModelViewSet):
+class ServiceViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows services to be viewed or edited.
     Users can only view and edit services for their own cars.
     """
     serializer_class = ServiceSerializer
+    replica_actions = ('list', 'upcoming', 'in_progress', 'completed', 'statistics')
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     filterset_fields = ['status', 'scheduled_date', 'completed_date', 'is_routine_maintenance']
-    search_fields = ['title', 'description', 'technician_notes', 'car__license_plate']
+    full_text_search = staticmethod(search_services)
     ordering_fields = ['scheduled_date', 'completed_date', 'status']
     
     def get_serializer_class(self):
@@ -724,6 +753,9 @@ class ServiceViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
     
+    @cache_response(lambda request, service: [
+        service, (Car, service.car_id), (Customer, service.car.customer_id), ServiceInterval,
+    ])
     def retrieve(self, request, *args, **kwargs):
         return super().retrieve(request, *args, **kwargs)
     
@@ -737,14 +769,13 @@ class ServiceViewSet(viewsets.ModelViewSet):
         return super().destroy(request, *args, **kwargs)
     
     def get_queryset(self):
-        queryset = Service.objects.all()
+        queryset = Service.objects.select_related('car')
         
         if not self.request.user.is_staff:
-            try:
-                customer = Customer.objects.get(user=self.request.user)
-                queryset = queryset.filter(car__customer=customer)
-            except Customer.DoesNotExist:
+            customer_id = request_customer_id(self.request)
+            if customer_id is None:
                 return Service.objects.none()
+            queryset = queryset.filter(customer_id=customer_id)
         
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
@@ -765,13 +796,8 @@ class ServiceViewSet(viewsets.ModelViewSet):
         if date_to:
             queryset = queryset.filter(scheduled_date__lte=date_to)
             
-        # Search by title or description
-        search_query = self.request.query_params.get('search', None)
-        if search_query:
-            queryset = queryset.filter(
-                Q(title__icontains=search_query) | 
-                Q(description__icontains=search_query)
-            )
+        # The search parameter is handled by FullTextSearchFilter, which
+        # orders matches by rank
             
         # Order by date (newest first by default)
         order_by = self.request.query_params.get('order_by', '-scheduled_date')
@@ -779,18 +805,16 @@ class ServiceViewSet(viewsets.ModelViewSet):
             
         return queryset
     
-    @method_decorator(cache_page(settings.CACHE_TTL))
-    @method_decorator(vary_on_cookie)
     @action(detail=True, methods=['get'])
+    @cache_response(lambda request, service: [service])
     def items(self, request, pk=None):
         service = self.get_object()
         items = ServiceItem.objects.filter(service=service)
         serializer = ServiceItemSerializer(items, many=True)
         return Response(serializer.data)
     
-    @method_decorator(cache_page(settings.CACHE_TTL))
-    @method_decorator(vary_on_cookie)
     @action(detail=True, methods=['get'])
+    @cache_response(lambda request, service: [service, (Car, service.car_id)])
     def invoice(self, request, pk=None):
         service = self.get_object()
         try:
@@ -1156,12 +1180,13 @@ class ServiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class ServiceItemViewSet(viewsets.ModelViewSet):
+class ServiceItemViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows service items to be viewed or edited.
     Users can only view and edit service items for their own services.
     """
     serializer_class = ServiceItemSerializer
+    replica_actions = ('list',)
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
@@ -1177,23 +1202,23 @@ class ServiceItemViewSet(viewsets.ModelViewSet):
         if self.request.user.is_staff:
             return ServiceItem.objects.all()
         
-        try:
-            customer = Customer.objects.get(user=self.request.user)
-            return ServiceItem.objects.filter(service__car__customer=customer)
-        except Customer.DoesNotExist:
+        customer_id = request_customer_id(self.request)
+        if customer_id is None:
             return ServiceItem.objects.none()
+        return ServiceItem.objects.filter(customer_id=customer_id)
 
-class InvoiceViewSet(viewsets.ModelViewSet):
+class InvoiceViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows invoices to be viewed or edited.
     Users can only view invoices for their own services.
     Only admins can create, update, or delete invoices.
     """
     serializer_class = InvoiceSerializer
+    replica_actions = ('list', 'unpaid', 'paid', 'refunded')
     permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, FullTextSearchFilter, RankedOrderingFilter]
     filterset_fields = ['status', 'due_date', 'issued_date']
-    search_fields = ['invoice_number', 'notes', 'service__car__license_plate']
+    full_text_search = staticmethod(search_invoices)
     ordering_fields = ['issued_date', 'due_date', 'status', 'total']
     
     def get_serializer_class(self):
@@ -1206,11 +1231,10 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         queryset = Invoice.objects.all()
         
         if not self.request.user.is_staff:
-            try:
-                customer = Customer.objects.get(user=self.request.user)
-                queryset = queryset.filter(service__car__customer=customer)
-            except Customer.DoesNotExist:
+            customer_id = request_customer_id(self.request)
+            if customer_id is None:
                 return Invoice.objects.none()
+            queryset = queryset.filter(customer_id=customer_id)
                 
         # Filter by status
         status_filter = self.request.query_params.get('status', None)
@@ -1235,15 +1259,10 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         if self.request.user.is_staff:
             customer_filter = self.request.query_params.get('customer', None)
             if customer_filter:
-                queryset = queryset.filter(service__car__customer_id=customer_filter)
+                queryset = queryset.filter(customer_id=customer_filter)
                 
-        # Search by invoice number
-        search_query = self.request.query_params.get('search', None)
-        if search_query:
-            queryset = queryset.filter(
-                Q(invoice_number__icontains=search_query) | 
-                Q(notes__icontains=search_query)
-            )
+        # The search parameter is handled by FullTextSearchFilter, which
+        # orders matches by rank
             
         # Order by date (newest first by default)
         order_by = self.request.query_params.get('order_by', '-issued_date')
@@ -1297,10 +1316,13 @@ class InvoiceViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['get'])
     @swagger_auto_schema(
         operation_summary="Download invoice PDF",
-        operation_description="Download the PDF file for an invoice",
+        operation_description="Download the PDF file for an invoice. The PDF is generated on first download "
+                              "and regenerated only when the invoice changes. Supports If-None-Match, and Range requests "
+                              "when served through nginx.",
         tags=['invoices'],
         responses={
             200: "Invoice PDF file",
+            304: "PDF unchanged since the ETag sent in If-None-Match",
             404: "Invoice or PDF not found"
         }
     )
@@ -1308,16 +1330,39 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         """
         Download invoice PDF
         """
+        from django.utils.cache import get_conditional_response
+        from utils.file_delivery import PROTECTED_CACHE_CONTROL, serve_protected_file
+        from utils.pdf_utils import ensure_invoice_pdf
+        
         invoice = self.get_object()
         
-        if invoice.pdf_file:
-            from django.http import FileResponse
-            return FileResponse(invoice.pdf_file.open('rb'), as_attachment=True, filename=f"invoice_{invoice.invoice_number}.pdf")
-        else:
+        try:
+            name, etag = ensure_invoice_pdf(invoice)
+        except Exception as e:
+            logger.error(f"Error generating PDF for invoice {invoice.id}: {str(e)}")
+            name = None
+        
+        if not name:
             return Response(
                 {"detail": _("PDF not found for this invoice")},
                 status=status.HTTP_404_NOT_FOUND
             )
+        
+        etag = f'"{etag}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            # A 304 carries the same validators as the 200 it stands for
+            not_modified['ETag'] = etag
+            not_modified['Cache-Control'] = PROTECTED_CACHE_CONTROL
+            return not_modified
+        
+        # Behind nginx only the headers go through this worker; nginx sends the file
+        return serve_protected_file(
+            invoice.pdf_file,
+            f"invoice_{invoice.invoice_number}.pdf",
+            content_type='application/pdf',
+            etag=etag,
+        )
     
     @action(detail=True, methods=['post'])
     def upload_pdf(self, request, pk=None):
@@ -1333,7 +1378,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Save the PDF file
+        # Save the PDF file; Invoice.save() releases the replaced one once this commits
         invoice.pdf_file = pdf_file
         invoice.save()
         
@@ -1506,6 +1551,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
             ))
         }
     )
+    @cache_response(lambda request, obj: [Invoice, ServiceItem])
     def statistics(self, request):
         """
         Get invoice statistics
@@ -1524,9 +1570,12 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         from django.db.models import Sum, F, DecimalField
         from django.db.models.functions import Coalesce
         
+        # Invoice totals are the sum of their service items (see Invoice.total)
+        items_total = Sum(F('service__items__quantity') * F('service__items__unit_price'), output_field=DecimalField())
+        
         # Get total invoice amount
         total_invoice_amount = queryset.filter(status__in=['paid', 'refunded']).aggregate(
-            total=Coalesce(Sum('total'), 0, output_field=DecimalField())
+            total=Coalesce(items_total, 0, output_field=DecimalField())
         )['total'] or 0
         
         # Get total refunded amount
@@ -1553,7 +1602,7 @@ class InvoiceViewSet(viewsets.ModelViewSet):
         
         # This month's revenue
         month_revenue = month_invoices.filter(status__in=['paid', 'refunded']).aggregate(
-            total=Coalesce(Sum('total'), 0, output_field=DecimalField())
+            total=Coalesce(items_total, 0, output_field=DecimalField())
         )['total'] or 0
         
         # This month's refunds
@@ -1725,13 +1774,14 @@ class InvoiceViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows notifications to be viewed or edited.
     Users can only view their own notifications.
     Only admins can create, update, or delete notifications.
     """
     serializer_class = NotificationSerializer
+    replica_actions = ('archived',)
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['is_read', 'notification_type']
@@ -1753,20 +1803,59 @@ class NotificationViewSet(viewsets.ModelViewSet):
             # Return empty queryset for swagger schema generation
             return Notification.objects.none()
             
-        customer = Customer.objects.get(user=self.request.user)
-        return Notification.objects.filter(customer=customer)
+        return Notification.objects.filter(customer_id=request_customer_id(self.request))
+    
+    @swagger_auto_schema(
+        operation_summary="Unread notification count",
+        operation_description="Number of unread notifications for the current user, served from a cached counter.",
+        responses={200: openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={'unread_count': openapi.Schema(type=openapi.TYPE_INTEGER)}
+        )},
+        tags=['notifications']
+    )
+    @action(detail=False, methods=['get'])
+    def unread_count(self, request):
+        from utils.notification_utils import get_unread_count
+        return Response({"unread_count": get_unread_count(request.user.id)})
+    
+    @swagger_auto_schema(
+        operation_summary="Archived notifications",
+        operation_description="Read notifications older than the retention period, moved out of the main list. Newest first, paginated.",
+        responses={200: ArchivedNotificationSerializer(many=True)},
+        tags=['notifications']
+    )
+    @action(detail=False, methods=['get'])
+    def archived(self, request):
+        queryset = ArchivedNotification.objects.filter(customer_id=request_customer_id(request)).order_by('-created_at')
+        
+        notification_type = request.query_params.get('notification_type')
+        if notification_type:
+            queryset = queryset.filter(notification_type=notification_type)
+        
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = ArchivedNotificationSerializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        
+        serializer = ArchivedNotificationSerializer(queryset, many=True)
+        return Response(serializer.data)
     
     @action(detail=True, methods=['patch'])
     def mark_read(self, request, pk=None):
+        from utils.notification_utils import adjust_unread_count
         notification = self.get_object()
-        notification.is_read = True
-        notification.save()
+        # Conditional update so only an actual unread -> read change touches the counter
+        updated = Notification.objects.filter(pk=notification.pk, is_read=False).update(is_read=True)
+        adjust_unread_count(request.user.id, -updated)
         return Response({"status": "notification marked as read"})
     
     @action(detail=False, methods=['patch'])
     def mark_all_read(self, request):
+        from utils.notification_utils import set_unread_count
         notifications = self.get_queryset().filter(is_read=False)
         notifications.update(is_read=True)
+        set_unread_count(request.user.id, 0)
         return Response({"status": "all notifications marked as read"})
 
 @swagger_auto_schema(
@@ -1872,12 +1961,70 @@ class RateLimitedTokenObtainPairView(CustomTokenObtainPairView): # Now this shou
         return super().post(request, *args, **kwargs)
 
 class RateLimitedTokenRefreshView(TokenRefreshView):
-   # ... existing refresh view ...
+   # Token state in Redis, see api.tokens
+   serializer_class = RedisTokenRefreshSerializer
    throttle_scope = 'token_refresh'
    @swagger_auto_schema(tags=['auth'])
    def post(self, request, *args, **kwargs):
         return super().post(request, *args, **kwargs)
 
+@swagger_auto_schema(
+    method='get',
+    operation_summary="In-process cache statistics",
+    operation_description="Hit/miss counters of each two-tier cache, and recompute/lock-wait counters, "
+                          "in the worker that serves the request",
+    tags=['Admin']
+)
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """Cache counters of this worker process"""
+    from utils.cache_utils import two_tier_stats, recompute_stats
+    return Response({
+        'two_tier': two_tier_stats(),
+        'recompute': recompute_stats(),
+    })
+
+@swagger_auto_schema(
+    method='get',
+    operation_summary="Search customers, cars, services and invoices",
+    operation_description="Searches every entity in parallel within a latency budget and returns the best "
+                          "matches first. Entities that miss their deadline are listed in timed_out.",
+    manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, description="Name, phone, plate, title or invoice number", type=openapi.TYPE_STRING, required=True),
+        openapi.Parameter('types', openapi.IN_QUERY, description="Comma-separated subset of customer, car, service, invoice", type=openapi.TYPE_STRING),
+        openapi.Parameter('limit', openapi.IN_QUERY, description="Maximum results (at most 20)", type=openapi.TYPE_INTEGER),
+    ],
+    tags=['search']
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@replica_view
+def global_search_view(request):
+    """Ranked hits of every entity; non-staff users only search their own records"""
+    types = request.query_params.get('types')
+    try:
+        limit = int(request.query_params.get('limit', 0)) or None
+    except ValueError:
+        return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+
+    customer_id = None
+    if not request.user.is_staff:
+        customer_id = request_customer_id(request)
+        if customer_id is None:
+            return Response({"detail": _("Customer profile not found")}, status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        results = global_search(
+            request.query_params.get('q', ''),
+            customer_id=customer_id,
+            entities=types.split(',') if types else None,
+            limit=limit,
+        )
+    except ValueError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(results)
+
 @csrf_exempt
 @swagger_auto_schema(
     method='get',
@@ -1907,6 +2054,7 @@ class RateLimitedTokenRefreshView(TokenRefreshView):
 )
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])  # Allow any access for admin interface
+@replica_view
 def get_user_data(request):
     """Get user data for admin form"""
     search_term = request.GET.get('search', '')
@@ -1916,13 +2064,11 @@ def get_user_data(request):
         if not request.META.get('HTTP_X_REQUESTED_WITH') == 'XMLHttpRequest':
             return Response({"error": "Unauthorized"}, status=status.HTTP_401_UNAUTHORIZED)
 
-    # Search for users matching the search term
-    users = User.objects.filter(
-        Q(username__icontains=search_term) | 
-        Q(email__icontains=search_term) |
-        Q(first_name__icontains=search_term) |
-        Q(last_name__icontains=search_term)
-    )[:10]  # Limit to 10 results for performance
+    # Indexed prefix, then fuzzy, matches; at most AUTOCOMPLETE_PAGE_SIZE
+    if search_term.strip():
+        users = in_match_order(User.objects.all(), autocomplete('user', search_term))
+    else:
+        users = User.objects.order_by('username')[:AUTOCOMPLETE_PAGE_SIZE]
 
     # Format the response
     results = []
@@ -2010,12 +2156,13 @@ def custom_logout(request):
     logout(request)
     return redirect(next_url)
 
-class MileageUpdateViewSet(viewsets.ModelViewSet):
+class MileageUpdateViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint that allows mileage updates to be viewed or added.
     Users can only view and add mileage updates for their own cars.
     """
     serializer_class = MileageUpdateSerializer
+    replica_actions = ('list',)
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['car']
@@ -2124,6 +2271,39 @@ class MileageUpdateViewSet(viewsets.ModelViewSet):
         
         return response
     
+    @swagger_auto_schema(
+        operation_summary="Batch mileage ingestion",
+        operation_description="Report many odometer readings at once (fleet telematics). "
+                              "Readings are validated per car; rejected readings are itemized in the response.",
+        request_body=MileageBatchRequestSerializer,
+        responses={
+            200: openapi.Response('Ingestion summary', schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'accepted': openapi.Schema(type=openapi.TYPE_INTEGER, description='Readings stored'),
+                    'rejected': openapi.Schema(type=openapi.TYPE_INTEGER, description='Readings rejected'),
+                    'cars_updated': openapi.Schema(type=openapi.TYPE_INTEGER, description='Cars with new readings'),
+                    'rejections': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT),
+                                                 description='Index, car and reason of every rejected reading'),
+                }
+            )),
+            400: "Invalid payload"
+        },
+        tags=['vehicles']
+    )
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        Ingest a batch of mileage readings.
+        Non-staff users can only report readings for their own cars.
+        """
+        serializer = MileageBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        from utils.mileage_utils import ingest_mileage_readings
+        result = ingest_mileage_readings(serializer.validated_data['readings'], user=request.user)
+        return Response(result)
+    
     def get_queryset(self):
         """
         Return empty queryset for swagger schema generation to avoid AnonymousUser errors
@@ -2133,7 +2313,10 @@ class MileageUpdateViewSet(viewsets.ModelViewSet):
         
         # Regular users can only see their own mileage updates
         if not self.request.user.is_staff:
-            return MileageUpdate.objects.filter(car__owner__user=self.request.user)
+            customer_id = request_customer_id(self.request)
+            if customer_id is None:
+                return MileageUpdate.objects.none()
+            return MileageUpdate.objects.filter(car__customer_id=customer_id)
         
         # Staff can see all mileage updates
         return MileageUpdate.objects.all()
@@ -2151,7 +2334,7 @@ class MileageUpdateViewSet(viewsets.ModelViewSet):
             serializer.save()
 
 # @swagger_auto_schema(auto_schema=None)
-class ServiceIntervalViewSet(viewsets.ModelViewSet):
+class ServiceIntervalViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint for service intervals.
     
@@ -2160,6 +2343,7 @@ class ServiceIntervalViewSet(viewsets.ModelViewSet):
     """
     queryset = ServiceInterval.objects.all()
     serializer_class = ServiceIntervalSerializer
+    replica_actions = ('list', 'for_vehicle')
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['interval_type', 'car_make', 'car_model', 'is_active']
@@ -2282,7 +2466,7 @@ class ServiceIntervalViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 # @swagger_auto_schema(auto_schema=None)
-class ServiceHistoryViewSet(viewsets.ModelViewSet):
+class ServiceHistoryViewSet(ReplicaRoutingMixin, viewsets.ModelViewSet):
     """
     API endpoint for vehicle service history.
     
@@ -2290,6 +2474,7 @@ class ServiceHistoryViewSet(viewsets.ModelViewSet):
     to service intervals for prediction purposes.
     """
     serializer_class = ServiceHistorySerializer
+    replica_actions = ('list',)
     permission_classes = [IsAuthenticated]
     swagger_schema_fields = {
         'manual_parameters': [],
@@ -2366,7 +2551,7 @@ class ServiceHistoryViewSet(viewsets.ModelViewSet):
         
         # Regular users can only see their own service history
         if not self.request.user.is_staff:
-            return ServiceHistory.objects.filter(car__customer__user=self.request.user)
+            return ServiceHistory.objects.filter(customer_id=request_customer_id(self.request))
         
         # Staff can see all service history
         return ServiceHistory.objects.all()
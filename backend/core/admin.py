@@ -1,7 +1,7 @@
 from django.contrib import admin
 from django.utils.translation import gettext_lazy as _
 from django.utils.translation import ngettext
-from .models import Customer, Car, Service, ServiceItem, Invoice, Notification, ServiceInterval, MileageUpdate, ServiceHistory
+from .models import Customer, Car, Service, ServiceItem, Invoice, Notification, ServiceInterval, MileageUpdate, ServiceHistory, OutboxMessage, SMSDelivery, ArchivedNotification, StoredFile
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.admin.widgets import AutocompleteSelect
@@ -15,14 +15,43 @@ from django.contrib import messages
 from django.shortcuts import render
 from django.core.exceptions import ValidationError
 import logging # Added for logging
+from utils.autocomplete_utils import AUTOCOMPLETE_PAGE_SIZE, autocomplete, in_match_order
 
 # Unregister User if already registered (by another app like django.contrib.auth)
 if admin.site.is_registered(User):
     admin.site.unregister(User)
 
+class AutocompleteSearchMixin:
+    """
+    Answer admin autocomplete requests with utils.autocomplete_utils (indexed
+    prefix, then fuzzy, matching) instead of icontains over search_fields.
+    At most AUTOCOMPLETE_PAGE_SIZE results are returned; the changelist
+    search is unchanged.
+    """
+    autocomplete_source = None
+    autocomplete_select_related = ()
+
+    def is_autocomplete_request(self, request):
+        return request.path == reverse('admin:autocomplete')
+
+    def get_search_results(self, request, queryset, search_term):
+        if not (self.is_autocomplete_request(request) and search_term.strip()):
+            return super().get_search_results(request, queryset, search_term)
+        queryset = in_match_order(queryset, autocomplete(self.autocomplete_source, search_term))
+        if self.autocomplete_select_related:
+            # Used by __str__ of each result
+            queryset = queryset.select_related(*self.autocomplete_select_related)
+        return queryset, False
+
+    def get_paginator(self, request, queryset, per_page, *args, **kwargs):
+        if self.is_autocomplete_request(request):
+            per_page = AUTOCOMPLETE_PAGE_SIZE
+        return super().get_paginator(request, queryset, per_page, *args, **kwargs)
+
 # Register User for autocomplete with enhanced configuration
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(AutocompleteSearchMixin, admin.ModelAdmin):
+    autocomplete_source = 'user'
     search_fields = ['username', 'first_name', 'last_name', 'email']
     list_display = ['username', 'first_name', 'last_name', 'email', 'is_staff']
     list_filter = ['is_staff', 'is_active']
@@ -51,8 +80,10 @@ class CarInline(admin.TabularInline):
     extra = 0
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
+class CustomerAdmin(AutocompleteSearchMixin, admin.ModelAdmin):
     form = CustomerForm
+    autocomplete_source = 'customer'
+    autocomplete_select_related = ('user',)
     list_display = ('id', 'get_full_name', 'phone', 'get_email', 'created_at')
     search_fields = ('user__first_name', 'user__last_name', 'user__email', 'phone')
     list_filter = ('created_at',)
@@ -86,7 +117,8 @@ class ServiceItemInline(admin.TabularInline):
     max_num = 10
 
 @admin.register(Car)
-class CarAdmin(admin.ModelAdmin):
+class CarAdmin(AutocompleteSearchMixin, admin.ModelAdmin):
+    autocomplete_source = 'car'
     list_display = ('id', 'license_plate', 'make', 'model', 'year', 'get_customer_name', 'initial_mileage', 'mileage', 'next_service_date', 'next_service_mileage')
     list_filter = ('make', 'year', 'fuel_type')
     search_fields = ('license_plate', 'make', 'model', 'vin', 'customer__user__first_name', 'customer__user__last_name')
@@ -380,7 +412,9 @@ class ServiceHistoryInline(admin.TabularInline):
         return request.user.is_superuser
 
 @admin.register(Service)
-class ServiceAdmin(admin.ModelAdmin):
+class ServiceAdmin(AutocompleteSearchMixin, admin.ModelAdmin):
+    autocomplete_source = 'service'
+    autocomplete_select_related = ('car',)
     list_display = ('id', 'title', 'get_car_info', 'status', 'scheduled_date', 'service_mileage', 'is_routine_maintenance', 'created_at')
     list_filter = ('status', 'scheduled_date', 'created_at', 'is_routine_maintenance')
     search_fields = ('title', 'description', 'car__license_plate', 'car__make', 'car__model')
@@ -649,7 +683,9 @@ class InvoiceAdmin(admin.ModelAdmin):
     def get_pdf_link(self, obj):
         """Display link to view/download PDF if it exists"""
         if obj and obj.pdf_file:
-            return mark_safe(f'<a href="{obj.pdf_file.url}" target="_blank">View/Download PDF</a>')
+            # Invoice files are not publicly served; go through the permission-checked endpoint
+            url = reverse('invoice-download', args=[obj.pk])
+            return mark_safe(f'<a href="{url}" target="_blank">View/Download PDF</a>')
         return _('No PDF file uploaded')
     get_pdf_link.short_description = _('PDF Link')
     
@@ -798,3 +834,61 @@ class NotificationAdmin(admin.ModelAdmin):
     def get_customer_name(self, obj):
         return f"{obj.customer.user.first_name} {obj.customer.user.last_name}"
     get_customer_name.short_description = _('Customer')
+
+@admin.register(ArchivedNotification)
+class ArchivedNotificationAdmin(admin.ModelAdmin):
+    list_display = ('original_id', 'title', 'notification_type', 'customer', 'created_at', 'archived_at')
+    list_filter = ('notification_type', 'archived_at')
+    search_fields = ('title', 'customer__user__first_name', 'customer__user__last_name')
+    list_select_related = ('customer__user',)
+    readonly_fields = ('original_id', 'customer', 'title', 'message', 'notification_type', 'created_at', 'archived_at')
+    
+    def has_add_permission(self, request):
+        # Rows are only created by the archive job
+        return False
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ('id', 'event', 'channel', 'object_id', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'channel', 'event')
+    search_fields = ('dedup_key', 'last_error')
+    readonly_fields = ('event', 'channel', 'object_id', 'dedup_key', 'attempts', 'last_error', 'created_at', 'sent_at')
+    actions = ['retry_now']
+    
+    def has_add_permission(self, request):
+        # Messages are only created by the models that trigger them
+        return False
+    
+    def retry_now(self, request, queryset):
+        """Make selected failed or pending messages due immediately"""
+        updated = queryset.exclude(status='sent').update(status='pending', attempts=0, next_attempt_at=timezone.now())
+        self.message_user(request, ngettext(
+            '%d message queued for retry.',
+            '%d messages queued for retry.',
+            updated
+        ) % updated, messages.SUCCESS)
+    retry_now.short_description = _('Retry selected messages now')
+
+
+@admin.register(SMSDelivery)
+class SMSDeliveryAdmin(admin.ModelAdmin):
+    list_display = ('id', 'phone_number', 'status', 'attempts', 'provider_message_id', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('phone_number', 'provider_message_id')
+    readonly_fields = ('phone_number', 'message', 'status', 'provider_message_id', 'attempts', 'error', 'created_at')
+    date_hierarchy = 'created_at'
+    
+    def has_add_permission(self, request):
+        # Deliveries are recorded by utils.sms_utils
+        return False
+
+
+@admin.register(StoredFile)
+class StoredFileAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'reference_count', 'created_at')
+    search_fields = ('name', 'sha256')
+    readonly_fields = ('name', 'sha256', 'size', 'reference_count', 'created_at')
+    
+    def has_add_permission(self, request):
+        # Rows are maintained by utils.storage
+        return False
@@ -7,3 +7,24 @@ class CoreConfig(AppConfig):
 
     # def ready(self):
     #     import core.signals # Removed signal import
+
+    def ready(self):
+        from django.contrib.auth.models import User
+        from utils.cache_utils import connect_cache_versioning
+        from .models import Customer, Car, Service, ServiceItem, Invoice, MileageUpdate, ServiceHistory
+
+        def user_customers(user):
+            return [(Customer, pk) for pk in Customer.objects.filter(user_id=user.pk).values_list('pk', flat=True)]
+
+        # Cached values declaring depends_on= are invalidated by version bumps.
+        # A change also bumps the rows whose serialized form nests it.
+        connect_cache_versioning(list(self.get_models()) + [User], parents={
+            User: [user_customers],
+            Customer: ['user'],
+            Car: ['customer'],
+            Service: ['car'],
+            ServiceItem: ['service'],
+            Invoice: ['service'],
+            MileageUpdate: ['car'],
+            ServiceHistory: ['car', 'service'],
+        })
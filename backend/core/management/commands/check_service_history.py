@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.db import IntegrityError
 from core.models import Service, ServiceHistory
+from utils.replica_utils import use_primary
 import logging
 
 logger = logging.getLogger(__name__)
@@ -73,93 +74,96 @@ class Command(BaseCommand):
                 
                 # Try to create service history if not in dry run mode
                 if not dry_run:
-                    try:
-                        # Check for orphaned records first if fix_constraints is enabled
-                        if fix_constraints:
-                            # Try to find a service history with this service ID using raw SQL
-                            # This bypasses Django's ORM and can find records even if the foreign key is broken
-                            from django.db import connection
-                            with connection.cursor() as cursor:
-                                cursor.execute("SELECT id FROM core_servicehistory WHERE service_id = %s", [service.id])
-                                orphaned_ids = [row[0] for row in cursor.fetchall()]
+                    # The repair reads back the history it creates, so it runs on the
+                    # primary even when the scan reads from a replica
+                    with use_primary():
+                        try:
+                            # Check for orphaned records first if fix_constraints is enabled
+                            if fix_constraints:
+                                # Try to find a service history with this service ID using raw SQL
+                                # This bypasses Django's ORM and can find records even if the foreign key is broken
+                                from django.db import connection
+                                with connection.cursor() as cursor:
+                                    cursor.execute("SELECT id FROM core_servicehistory WHERE service_id = %s", [service.id])
+                                    orphaned_ids = [row[0] for row in cursor.fetchall()]
                                 
-                                if orphaned_ids:
-                                    orphaned_id = orphaned_ids[0]
-                                    if verbose:
-                                        self.stdout.write(self.style.WARNING(
-                                            f"  Found orphaned service history record with ID {orphaned_id}"
-                                        ))
+                                    if orphaned_ids:
+                                        orphaned_id = orphaned_ids[0]
+                                        if verbose:
+                                            self.stdout.write(self.style.WARNING(
+                                                f"  Found orphaned service history record with ID {orphaned_id}"
+                                            ))
                                     
-                                    # Update the record
-                                    try:
-                                        orphaned = ServiceHistory.objects.get(id=orphaned_id)
-                                        orphaned.car = service.car
-                                        orphaned.service = service  # This might fix the association
-                                        orphaned.service_interval = service.service_type
-                                        orphaned.service_date = service.completed_date.date() if service.completed_date else timezone.now().date()
-                                        orphaned.service_mileage = service.service_mileage or service.car.mileage
-                                        orphaned.save()
+                                        # Update the record
+                                        try:
+                                            orphaned = ServiceHistory.objects.get(id=orphaned_id)
+                                            orphaned.car = service.car
+                                            orphaned.service = service  # This might fix the association
+                                            orphaned.service_interval = service.service_type
+                                            orphaned.service_date = service.completed_date.date() if service.completed_date else timezone.now().date()
+                                            orphaned.service_mileage = service.service_mileage or service.car.mileage
+                                            orphaned.save()
                                         
-                                        constraint_fixed_count += 1
+                                            constraint_fixed_count += 1
                                         
-                                        if verbose:
-                                            self.stdout.write(self.style.SUCCESS(
-                                                f"  Fixed orphaned service history record with ID {orphaned_id}"
-                                            ))
+                                            if verbose:
+                                                self.stdout.write(self.style.SUCCESS(
+                                                    f"  Fixed orphaned service history record with ID {orphaned_id}"
+                                                ))
                                             
-                                        # Update car's last service info
-                                        service.car.last_service_date = orphaned.service_date
-                                        service.car.last_service_mileage = orphaned.service_mileage
-                                        service.car.save(update_fields=['last_service_date', 'last_service_mileage'])
+                                            # Update car's last service info
+                                            service.car.last_service_date = orphaned.service_date
+                                            service.car.last_service_mileage = orphaned.service_mileage
+                                            service.car.save(update_fields=['last_service_date', 'last_service_mileage'])
                                         
-                                        # Update service predictions
-                                        service.car.update_service_predictions()
+                                            # Update service predictions
+                                            service.car.update_service_predictions()
                                         
-                                        # Skip to the next service
-                                        continue
-                                    except Exception as e:
-                                        self.stdout.write(self.style.ERROR(
-                                            f"  Error fixing orphaned record: {str(e)}"
-                                        ))
+                                            # Skip to the next service
+                                            continue
+                                        except Exception as e:
+                                            self.stdout.write(self.style.ERROR(
+                                                f"  Error fixing orphaned record: {str(e)}"
+                                            ))
                             
-                        # If we didn't find an orphaned record or fix_constraints is disabled, create a new one
-                        service_history = ServiceHistory.objects.create(
-                            car=service.car,
-                            service=service,
-                            service_interval=service.service_type,
-                            service_date=service.completed_date.date() if service.completed_date else timezone.now().date(),
-                            service_mileage=service.service_mileage or service.car.mileage
-                        )
-                        created_count += 1
+                            # If we didn't find an orphaned record or fix_constraints is disabled, create a new one
+                            service_history = ServiceHistory.objects.create(
+                                car=service.car,
+                                service=service,
+                                service_interval=service.service_type,
+                                service_date=service.completed_date.date() if service.completed_date else timezone.now().date(),
+                                service_mileage=service.service_mileage or service.car.mileage
+                            )
+                            created_count += 1
                         
-                        if verbose:
-                            self.stdout.write(self.style.SUCCESS(
-                                f"  Created service history record with ID {service_history.id}"
-                            ))
+                            if verbose:
+                                self.stdout.write(self.style.SUCCESS(
+                                    f"  Created service history record with ID {service_history.id}"
+                                ))
                         
-                        # Update car's last service info
-                        service.car.last_service_date = service_history.service_date
-                        service.car.last_service_mileage = service_history.service_mileage
-                        service.car.save(update_fields=['last_service_date', 'last_service_mileage'])
+                            # Update car's last service info
+                            service.car.last_service_date = service_history.service_date
+                            service.car.last_service_mileage = service_history.service_mileage
+                            service.car.save(update_fields=['last_service_date', 'last_service_mileage'])
                         
-                        # Update service predictions
-                        service.car.update_service_predictions()
-                    except IntegrityError as e:
-                        if "duplicate key value violates unique constraint" in str(e):
-                            error_count += 1
-                            self.stdout.write(self.style.ERROR(
-                                f"  Constraint violation for service {service.id}. Try running with --fix-constraints."
-                            ))
-                        else:
+                            # Update service predictions
+                            service.car.update_service_predictions()
+                        except IntegrityError as e:
+                            if "duplicate key value violates unique constraint" in str(e):
+                                error_count += 1
+                                self.stdout.write(self.style.ERROR(
+                                    f"  Constraint violation for service {service.id}. Try running with --fix-constraints."
+                                ))
+                            else:
+                                error_count += 1
+                                self.stdout.write(self.style.ERROR(
+                                    f"  Error creating service history for service {service.id}: {str(e)}"
+                                ))
+                        except Exception as e:
                             error_count += 1
                             self.stdout.write(self.style.ERROR(
                                 f"  Error creating service history for service {service.id}: {str(e)}"
                             ))
-                    except Exception as e:
-                        error_count += 1
-                        self.stdout.write(self.style.ERROR(
-                            f"  Error creating service history for service {service.id}: {str(e)}"
-                        ))
         
         # Print summary
         if dry_run:
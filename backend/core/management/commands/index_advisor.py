@@ -0,0 +1,196 @@
+import json
+from collections import Counter
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+# GET endpoints with side effects outside the database (the invoice PDF is
+# generated and stored), which the replay transaction cannot roll back
+SKIPPED_URL_NAMES = {'invoice-download'}
+
+REPLAY_SETTINGS = {
+    # Never read or write the real cache, so every request reaches the database
+    'CACHES': {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+    'ALLOWED_HOSTS': ['testserver'],
+    'SECURE_SSL_REDIRECT': False,
+}
+
+
+class Command(BaseCommand):
+    help = ('Replay every GET endpoint of the API with the test client, run EXPLAIN (ANALYZE, BUFFERS) '
+            'on each SELECT it issues, and flag sequential scans and sorts or hashes that spill to disk')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='User to replay as (default: the first superuser)')
+        parser.add_argument('--min-rows', type=int, default=1000,
+                            help='Only flag sequential scans reading at least this many rows')
+        parser.add_argument('--search-term', default='a', help='Term for search and lookup endpoints')
+        parser.add_argument('--url', action='append', default=[], help='Extra path to replay, e.g. /api/search/?q=123')
+        parser.add_argument('--output-format', choices=['console', 'json'], default='console')
+
+    def _user(self, username):
+        users = User.objects.filter(username=username) if username else User.objects.filter(is_superuser=True)
+        user = users.order_by('pk').first()
+        if user is None:
+            raise CommandError(f"User not found: {username}" if username else "No superuser found; use --username")
+        return user
+
+    def _first_id(self, response):
+        if response.status_code != 200:
+            return None
+        data = response.json()
+        if isinstance(data, dict):
+            data = data.get('results', [])
+        if data and isinstance(data, list) and isinstance(data[0], dict):
+            return data[0].get('id')
+        return None
+
+    def _requests(self, client, options):
+        """(path, params) of every GET endpoint, detail routes on the first visible row"""
+        from api.urls import router
+        from core.models import Car
+
+        term = options['search_term']
+        car = Car.objects.order_by('pk').first()
+        params = {
+            'car-lookup': {'q': term, 'match': 'prefix'},
+            'service-interval-for-vehicle': {'make': car.make if car else term},
+        }
+        for prefix, viewset, basename in router.registry:
+            list_path = reverse(f'{basename}-list')
+            yield list_path, {}
+            yield list_path, {'search': term}
+            pk = self._first_id(client.get(list_path))
+            if pk is not None:
+                yield reverse(f'{basename}-detail', args=[pk]), {}
+            for action in viewset.get_extra_actions():
+                name = f'{basename}-{action.url_name}'
+                if 'get' not in action.mapping or name in SKIPPED_URL_NAMES:
+                    continue
+                if not action.detail:
+                    yield reverse(name), params.get(name, {})
+                elif pk is not None:
+                    yield reverse(name, args=[pk]), params.get(name, {})
+        # Not /api/search/: it queries from pool threads, outside the capture,
+        # and runs the same per-entity searches as the ?search= requests above
+        yield reverse('get_user_data'), {'search': term}
+        for url in options['url']:
+            yield url, {}
+
+    def _explain_postgresql(self, sql, min_rows):
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+
+        def walk(node):
+            yield node
+            for child in node.get('Plans', []):
+                yield from walk(child)
+
+        findings = []
+        for node in walk(plan[0]['Plan']):
+            node_type = node['Node Type']
+            loops = node.get('Actual Loops', 1)
+            if node_type == 'Seq Scan':
+                rows = (node.get('Actual Rows', 0) + node.get('Rows Removed by Filter', 0)) * loops
+                if rows >= min_rows:
+                    findings.append(('seq_scan', node['Relation Name'],
+                                     f"{rows} rows read, filter: {node.get('Filter', 'none')}"))
+            elif node_type == 'Sort' and node.get('Sort Space Type') == 'Disk':
+                findings.append(('sort_spill', ', '.join(node.get('Sort Key', [])),
+                                 f"{node.get('Sort Method')}, {node.get('Sort Space Used')} kB on disk"))
+            elif node_type == 'Hash' and node.get('Hash Batches', 1) > 1:
+                findings.append(('hash_spill', node.get('Parent Relationship', ''),
+                                 f"{node['Hash Batches']} batches, {node.get('Peak Memory Usage')} kB"))
+        return findings
+
+    def _explain_sqlite(self, sql, min_rows):
+        # No ANALYZE and no row counts: flag full scans and sorts without an index
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            details = [row[-1] for row in cursor.fetchall()]
+        findings = []
+        for detail in details:
+            if detail.startswith('SCAN ') and 'INDEX' not in detail:
+                findings.append(('seq_scan', detail.split()[1], detail))
+            elif detail.startswith('USE TEMP B-TREE'):
+                findings.append(('sort', '', detail))
+        return findings
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'postgresql':
+            explain = self._explain_postgresql
+        elif connection.vendor == 'sqlite':
+            explain = self._explain_sqlite
+        else:
+            raise CommandError(f"Unsupported database: {connection.vendor}")
+
+        user = self._user(options['username'])
+        client = APIClient()
+        client.force_authenticate(user)
+
+        report = []
+        explained = set()
+        try:
+            with override_settings(**REPLAY_SETTINGS), transaction.atomic():
+                for path, params in list(self._requests(client, options)):
+                    with CaptureQueriesContext(connection) as captured:
+                        response = client.get(path, params)
+                    entry = {'path': path, 'params': params, 'status': response.status_code,
+                             'queries': len(captured), 'findings': []}
+                    for query in captured.captured_queries:
+                        sql = query['sql']
+                        if not sql.lstrip().upper().startswith(('SELECT', 'WITH')) or sql in explained:
+                            continue
+                        explained.add(sql)
+                        try:
+                            # Savepoint, so a failing EXPLAIN does not abort the replay
+                            with transaction.atomic():
+                                findings = explain(sql, options['min_rows'])
+                        except Exception as e:
+                            findings = [('error', '', str(e))]
+                        entry['findings'] += [
+                            {'kind': kind, 'on': on, 'detail': detail, 'sql': sql}
+                            for kind, on, detail in findings
+                        ]
+                    report.append(entry)
+                # Roll back whatever the GET requests wrote
+                transaction.set_rollback(True)
+        except CommandError:
+            raise
+        except Exception as e:
+            raise CommandError(f"Error running index advisor: {str(e)}")
+
+        if options['output_format'] == 'json':
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+            return
+        self._print_report(report, user, options['verbosity'])
+
+    def _print_report(self, report, user, verbosity):
+        self.stdout.write(f"Replayed {len(report)} requests as {user.username} on {connection.vendor}")
+        summary = Counter()
+        for entry in report:
+            query_string = '&'.join(f"{key}={value}" for key, value in entry['params'].items())
+            url = f"{entry['path']}?{query_string}" if query_string else entry['path']
+            line = f"{entry['status']} {url}: {entry['queries']} queries"
+            if not entry['findings']:
+                self.stdout.write(line)
+                continue
+            self.stdout.write(self.style.WARNING(f"{line}, {len(entry['findings'])} findings"))
+            for finding in entry['findings']:
+                summary[(finding['kind'], finding['on'])] += 1
+                self.stdout.write(f"  {finding['kind']} {finding['on']}: {finding['detail']}")
+                if verbosity > 1:
+                    self.stdout.write(f"    {finding['sql'][:300]}")
+
+        if not summary:
+            self.stdout.write(self.style.SUCCESS("No sequential scans or spills found"))
+            return
+        self.stdout.write("\nFindings by kind and relation:")
+        for (kind, on), count in summary.most_common():
+            self.stdout.write(f"  {count:4d}  {kind} {on}")
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.core.management import call_command
+from utils.replica_utils import use_replica
 import logging
 
 logger = logging.getLogger(__name__)
@@ -40,8 +41,10 @@ class Command(BaseCommand):
             self.stdout.write(f"Running task: {task['name']} - {task['description']}")
             
             try:
-                # Call the command
-                call_command(task['name'], *task['args'], **task['kwargs'])
+                # Reads go to a replica, writes to the primary. Not sticky, so the scans stay on the
+                # replica after the first write; check_service_history reads its repairs from the primary
+                with use_replica(sticky=False):
+                    call_command(task['name'], *task['args'], **task['kwargs'])
                 self.stdout.write(self.style.SUCCESS(f"Successfully completed task: {task['name']}"))
             except Exception as e:
                 self.stdout.write(self.style.ERROR(f"Error running task {task['name']}: {str(e)}"))
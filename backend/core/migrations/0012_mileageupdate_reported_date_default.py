@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:52
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_fix_customer_user_cascade'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mileageupdate',
+            name='reported_date',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False, verbose_name='Reported Date'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:55
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_mileageupdate_reported_date_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('channel', models.CharField(choices=[('email', 'Email'), ('sms', 'SMS')], max_length=10, verbose_name='Channel')),
+                ('event', models.CharField(max_length=50, verbose_name='Event')),
+                ('object_id', models.BigIntegerField(verbose_name='Object ID')),
+                ('dedup_key', models.CharField(max_length=150, unique=True, verbose_name='Deduplication Key')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('sent', 'Sent'), ('skipped', 'Skipped'), ('failed', 'Failed')], default='pending', max_length=10, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Next Attempt')),
+                ('last_error', models.TextField(blank=True, null=True, verbose_name='Last Error')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Sent At')),
+            ],
+            options={
+                'verbose_name': 'Outbox Message',
+                'verbose_name_plural': 'Outbox Messages',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'next_attempt_at'], name='core_outbox_status_88bc63_idx'), models.Index(fields=['created_at'], name='core_outbox_created_15ee16_idx')],
+            },
+        ),
+    ]
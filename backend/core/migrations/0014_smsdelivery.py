@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-19 03:58
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SMSDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(max_length=20, verbose_name='Phone Number')),
+                ('message', models.TextField(verbose_name='Message')),
+                ('status', models.CharField(choices=[('sent', 'Sent'), ('failed', 'Failed')], max_length=10, verbose_name='Status')),
+                ('provider_message_id', models.CharField(blank=True, max_length=100, null=True, verbose_name='Provider Message ID')),
+                ('attempts', models.PositiveSmallIntegerField(default=1, verbose_name='Attempts')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Error')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'SMS Delivery',
+                'verbose_name_plural': 'SMS Deliveries',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='core_smsdel_status_5b49d7_idx'), models.Index(fields=['phone_number'], name='core_smsdel_phone_n_5cd5b4_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_smsdelivery'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='core_notifi_custome_d5e864_idx',
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['customer', 'is_read', 'created_at'], name='notif_customer_unread_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:02
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_notification_unread_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('original_id', models.BigIntegerField(unique=True, verbose_name='Original ID')),
+                ('title', models.CharField(max_length=100, verbose_name='Title')),
+                ('message', models.TextField(verbose_name='Message')),
+                ('notification_type', models.CharField(choices=[('service_reminder', 'Service Reminder'), ('service_update', 'Service Update'), ('invoice', 'Invoice'), ('general', 'General')], max_length=20, verbose_name='Type')),
+                ('created_at', models.DateTimeField(verbose_name='Created At')),
+                ('archived_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Archived At')),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to='core.customer')),
+            ],
+            options={
+                'verbose_name': 'Archived Notification',
+                'verbose_name_plural': 'Archived Notifications',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['customer', 'created_at'], name='archived_notif_customer_idx'), models.Index(fields=['archived_at'], name='core_archiv_archive_51f2ff_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_archivednotification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='invoice',
+            name='pdf_hash',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, verbose_name='PDF Content Hash'),
+        ),
+    ]
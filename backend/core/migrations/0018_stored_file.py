@@ -0,0 +1,30 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:11
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_invoice_pdf_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True, verbose_name='Name')),
+                ('sha256', models.CharField(db_index=True, max_length=64, verbose_name='SHA-256')),
+                ('size', models.BigIntegerField(verbose_name='Size')),
+                ('reference_count', models.PositiveIntegerField(default=1, verbose_name='Reference Count')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Created At')),
+            ],
+            options={
+                'verbose_name': 'Stored File',
+                'verbose_name_plural': 'Stored Files',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
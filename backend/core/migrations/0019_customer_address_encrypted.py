@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:23
+
+import utils.encryption_utils
+from django.db import migrations
+
+BATCH_SIZE = 500
+
+
+def encrypt_addresses(apps, schema_editor):
+    # Plain-text addresses read back unchanged and are encrypted on save
+    Customer = apps.get_model('core', 'Customer')
+    customers = Customer.objects.exclude(address__isnull=True).only('id', 'address').order_by('id')
+    batch = []
+    for customer in customers.iterator(chunk_size=BATCH_SIZE):
+        if customer.address:
+            batch.append(customer)
+        if len(batch) >= BATCH_SIZE:
+            Customer.objects.bulk_update(batch, ['address'])
+            batch = []
+    if batch:
+        Customer.objects.bulk_update(batch, ['address'])
+
+
+def decrypt_addresses(apps, schema_editor):
+    # Write plain text with raw SQL, bypassing the field's encryption
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT id, address FROM core_customer WHERE address IS NOT NULL AND address <> ''")
+        rows = cursor.fetchall()
+        for customer_id, address in rows:
+            cursor.execute(
+                "UPDATE core_customer SET address = %s WHERE id = %s",
+                [utils.encryption_utils.decrypt_data(address), customer_id],
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_stored_file'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='address',
+            field=utils.encryption_utils.EncryptedTextField(blank=True, null=True, verbose_name='Address'),
+        ),
+        migrations.RunPython(encrypt_addresses, decrypt_addresses),
+    ]
@@ -0,0 +1,56 @@
+from django.db import migrations
+
+# Generated tsvector columns and their GIN indexes, read by utils.search_utils.
+# The columns are not declared on the models. Free text uses the French
+# configuration, names and e-mail addresses the unstemmed "simple" one.
+SEARCH_COLUMNS = {
+    'core_service': (
+        "setweight(to_tsvector('french'::regconfig, coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('french'::regconfig, coalesce(description, '')), 'B') || "
+        "setweight(to_tsvector('french'::regconfig, coalesce(technician_notes, '')), 'C')"
+    ),
+    'core_invoice': (
+        "setweight(to_tsvector('french'::regconfig, coalesce(invoice_number, '')), 'A') || "
+        "setweight(to_tsvector('french'::regconfig, coalesce(notes, '')), 'B')"
+    ),
+    'auth_user': (
+        "setweight(to_tsvector('simple'::regconfig, coalesce(first_name, '')), 'A') || "
+        "setweight(to_tsvector('simple'::regconfig, coalesce(last_name, '')), 'A') || "
+        "setweight(to_tsvector('simple'::regconfig, coalesce(username, '')), 'B') || "
+        "setweight(to_tsvector('simple'::regconfig, coalesce(email, '')), 'B')"
+    ),
+}
+
+
+def add_search_columns(apps, schema_editor):
+    # PostgreSQL only; other databases fall back to icontains
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, expression in SEARCH_COLUMNS.items():
+        schema_editor.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({expression}) STORED"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {table}_search_idx ON {table} USING gin (search_vector)"
+        )
+
+
+def remove_search_columns(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in SEARCH_COLUMNS:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {table}_search_idx")
+        schema_editor.execute(f"ALTER TABLE {table} DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_customer_address_encrypted'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_search_columns, remove_search_columns),
+    ]
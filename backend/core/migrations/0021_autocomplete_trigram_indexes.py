@@ -0,0 +1,43 @@
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+# Trigram GIN indexes on UPPER(column), read by utils.autocomplete_utils: they
+# serve istartswith (UPPER(column) LIKE) and word similarity (%>) lookups
+TRIGRAM_COLUMNS = {
+    'auth_user': ['username', 'first_name', 'last_name', 'email'],
+    'core_customer': ['phone'],
+    'core_car': ['license_plate', 'vin', 'make', 'model'],
+    'core_service': ['title'],
+}
+
+
+def add_trigram_indexes(apps, schema_editor):
+    # PostgreSQL only; other databases get unindexed prefix matches
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, columns in TRIGRAM_COLUMNS.items():
+        for column in columns:
+            schema_editor.execute(
+                f"CREATE INDEX IF NOT EXISTS {table}_{column}_trgm_idx "
+                f"ON {table} USING gin (UPPER({column}) gin_trgm_ops)"
+            )
+
+
+def remove_trigram_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table, columns in TRIGRAM_COLUMNS.items():
+        for column in columns:
+            schema_editor.execute(f"DROP INDEX IF EXISTS {table}_{column}_trgm_idx")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_full_text_search'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(add_trigram_indexes, remove_trigram_indexes),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:30
+
+from django.db import migrations, models
+
+from utils.vehicle_lookup_utils import normalize_plate_key, normalize_vin_key
+
+BATCH_SIZE = 500
+
+# Read by utils.vehicle_lookup_utils. Pattern ops serve both = and LIKE
+# 'prefix%'; the reverse() indexes serve suffix matches. INCLUDE makes the
+# lookups index-only.
+LOOKUP_INDEXES = {
+    'core_car_plate_key_idx': 'plate_key varchar_pattern_ops',
+    'core_car_plate_key_rev_idx': 'reverse(plate_key) text_pattern_ops',
+    'core_car_vin_key_idx': 'vin_key varchar_pattern_ops',
+    'core_car_vin_key_rev_idx': 'reverse(vin_key) text_pattern_ops',
+}
+
+
+def fill_lookup_keys(apps, schema_editor):
+    Car = apps.get_model('core', 'Car')
+    cars = Car.objects.only('id', 'license_plate', 'vin').order_by('id')
+    batch = []
+    for car in cars.iterator(chunk_size=BATCH_SIZE):
+        car.plate_key = normalize_plate_key(car.license_plate)
+        car.vin_key = normalize_vin_key(car.vin)
+        batch.append(car)
+        if len(batch) >= BATCH_SIZE:
+            Car.objects.bulk_update(batch, ['plate_key', 'vin_key'])
+            batch = []
+    if batch:
+        Car.objects.bulk_update(batch, ['plate_key', 'vin_key'])
+
+
+def add_lookup_indexes(apps, schema_editor):
+    # PostgreSQL only; other databases scan the table
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, expression in LOOKUP_INDEXES.items():
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON core_car ({expression}) INCLUDE (id, customer_id)"
+        )
+
+
+def remove_lookup_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in LOOKUP_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_autocomplete_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='plate_key',
+            field=models.CharField(default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='vin_key',
+            field=models.CharField(blank=True, editable=False, max_length=17, null=True),
+        ),
+        migrations.RunPython(fill_lookup_keys, migrations.RunPython.noop),
+        migrations.RunPython(add_lookup_indexes, remove_lookup_indexes),
+    ]
@@ -0,0 +1,133 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Composite and partial indexes for the per-car, per-customer and per-status
+# access paths. New indexes are created before the ones they replace are
+# dropped: single-column indexes that are a prefix of a composite index, the
+# indexes Django already creates for foreign keys (now db_index=False where a
+# composite index leads with the key) and duplicates of unique constraints.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0022_car_lookup_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mileageupdate',
+            index=models.Index(fields=['car', '-reported_date'], name='mileage_car_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['customer', '-created_at'], name='notif_customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False)), fields=['customer', '-created_at'], name='notif_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', True)), fields=['created_at'], name='notif_read_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['car', 'status', 'scheduled_date'], name='service_car_status_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(condition=models.Q(('status__in', ['scheduled', 'in_progress'])), fields=['scheduled_date'], name='service_open_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicehistory',
+            index=models.Index(fields=['car', '-service_date', '-service_mileage'], name='history_car_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicehistory',
+            index=models.Index(fields=['car', 'service_interval', '-service_date', '-service_mileage'], name='history_car_interval_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceinterval',
+            index=models.Index(fields=['is_active', 'car_make', 'car_model'], name='interval_active_make_idx'),
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='core_car_custome_fa7e0d_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='car',
+            name='core_car_license_120e5f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='customer',
+            name='core_custom_user_id_45895b_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='invoice',
+            name='core_invoic_service_7486b3_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='invoice',
+            name='core_invoic_invoice_aef6bc_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='mileageupdate',
+            name='core_mileag_car_id_89a6d4_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='core_notifi_is_read_127eae_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='notification',
+            name='notif_customer_unread_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='service',
+            name='core_servic_car_id_912932_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='servicehistory',
+            name='core_servic_car_id_a9253a_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='servicehistory',
+            name='core_servic_service_c7708f_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='serviceinterval',
+            name='core_servic_is_acti_72a12e_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='serviceitem',
+            name='core_servic_service_4fe05d_idx',
+        ),
+        migrations.AlterField(
+            model_name='archivednotification',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to='core.customer'),
+        ),
+        migrations.AlterField(
+            model_name='mileageupdate',
+            name='car',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='mileage_updates', to='core.car'),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='customer',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='core.customer'),
+        ),
+        migrations.AlterField(
+            model_name='service',
+            name='car',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='services', to='core.car'),
+        ),
+        migrations.AlterField(
+            model_name='servicehistory',
+            name='car',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='service_history', to='core.car'),
+        ),
+    ]
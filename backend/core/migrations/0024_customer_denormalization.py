@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+BATCH_SIZE = 5000
+
+# Per model, the path to the customer the row belongs to
+CUSTOMER_SOURCES = {
+    'service': 'car__customer_id',
+    'invoice': 'service__car__customer_id',
+    'serviceitem': 'service__car__customer_id',
+    'servicehistory': 'car__customer_id',
+}
+
+
+def fill_customer_ids(apps, schema_editor):
+    # One UPDATE per range of primary keys, so no statement locks a whole large table
+    for model_name, source in CUSTOMER_SOURCES.items():
+        model = apps.get_model('core', model_name)
+        owner = Subquery(model.objects.filter(pk=OuterRef('pk')).values(source)[:1])
+        last_pk = model.objects.aggregate(last=Max('pk'))['last'] or 0
+        for start in range(0, last_pk, BATCH_SIZE):
+            model.objects.filter(pk__gt=start, pk__lte=start + BATCH_SIZE).update(customer_id=owner)
+
+
+def customer_field(null):
+    return models.ForeignKey(db_index=False, editable=False, null=null, on_delete=django.db.models.deletion.CASCADE,
+                             related_name='+', to='core.customer')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_composite_indexes'),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(model_name=model_name, name='customer', field=customer_field(null=True))
+            for model_name in CUSTOMER_SOURCES
+        ],
+        migrations.RunPython(fill_customer_ids, migrations.RunPython.noop),
+        *[
+            migrations.AlterField(model_name=model_name, name='customer', field=customer_field(null=False))
+            for model_name in CUSTOMER_SOURCES
+        ],
+        migrations.AddIndex(
+            model_name='service',
+            index=models.Index(fields=['customer', '-scheduled_date'], name='service_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['customer', '-issued_date'], name='invoice_customer_issued_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceitem',
+            index=models.Index(fields=['customer', 'service'], name='serviceitem_customer_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='servicehistory',
+            index=models.Index(fields=['customer', '-service_date'], name='history_customer_date_idx'),
+        ),
+    ]
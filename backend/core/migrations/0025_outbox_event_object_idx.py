@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-19 04:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_customer_denormalization'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='outboxmessage',
+            index=models.Index(fields=['event', 'object_id'], name='core_outbox_event_fa97ea_idx'),
+        ),
+    ]
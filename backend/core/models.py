@@ -12,6 +12,8 @@ from django.utils import timezone
 import logging
 from datetime import timedelta
 from django.conf import settings
+from utils.encryption_utils import EncryptedTextField
+from utils.vehicle_lookup_utils import normalize_plate_key, normalize_vin_key
 
 # --- Signal imports ---
 # Removed signal imports and handler from here
@@ -51,7 +53,8 @@ class Customer(models.Model):
         help_text=_('The user account associated with this customer.')
     )
     phone = models.CharField(_('Phone Number'), max_length=20)
-    address = models.TextField(_('Address'), blank=True, null=True)
+    # Encrypted at rest, so it cannot be filtered on
+    address = EncryptedTextField(_('Address'), blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -62,7 +65,6 @@ class Customer(models.Model):
         verbose_name = _('Customer')
         verbose_name_plural = _('Customers')
         indexes = [
-            models.Index(fields=['user']),
             models.Index(fields=['phone']),
             models.Index(fields=['created_at']),
         ]
@@ -85,6 +87,9 @@ class Car(models.Model):
     year = models.PositiveIntegerField(_('Year'))
     license_plate = models.CharField(_('License Plate'), max_length=20, unique=True, validators=[validate_license_plate])
     vin = models.CharField(_('VIN'), max_length=17, blank=True, null=True)
+    # Normalized copies for lookups, see utils.vehicle_lookup_utils
+    plate_key = models.CharField(max_length=20, default='', editable=False)
+    vin_key = models.CharField(max_length=17, blank=True, null=True, editable=False)
     fuel_type = models.CharField(_('Fuel Type'), max_length=10, choices=FUEL_CHOICES, default='gasoline')
     initial_mileage = models.PositiveIntegerField(_('Initial Mileage'), default=0, help_text=_('Starting mileage when car was added to the system. Cannot be changed except by superadmin.'))
     mileage = models.PositiveIntegerField(_('Current Mileage'), default=0)
@@ -109,22 +114,19 @@ class Car(models.Model):
         """
         logger = logging.getLogger(__name__)
         
-        # Find applicable service intervals for this car
-        service_intervals = ServiceInterval.objects.filter(
-            Q(car_make=self.make, car_model=self.model) | 
-            Q(car_make=self.make, car_model__isnull=True) |
-            Q(car_make__isnull=True, car_model__isnull=True),
-            is_active=True
-        ).order_by('-car_make', '-car_model')
+        from utils.lookup_utils import get_applicable_service_intervals
         
-        if not service_intervals.exists():
+        # Find applicable service intervals for this car (cached in-process)
+        service_intervals = get_applicable_service_intervals(self.make, self.model)
+        
+        if not service_intervals:
             # If no service intervals found, provide a basic fallback prediction
             # based on specified interval (10,000 km or 365 days)
             logger.warning(f"No service intervals found for car {self.id}. Using fallback prediction.")
             return self._generate_fallback_prediction()
             
         # Use the most specific applicable interval
-        service_interval = service_intervals.first()
+        service_interval = service_intervals[0]
         logger.info(f"Car {self.id}: Using service interval '{service_interval.name}' with mileage interval {service_interval.mileage_interval} km")
         
         # Calculate average daily mileage using available data
@@ -577,36 +579,56 @@ class Car(models.Model):
             return True
         return False
 
+    @transaction.atomic
     def save(self, *args, **kwargs):
         """
         Ensure initial_mileage is set when a car is first created.
         The initial_mileage value is immutable after creation except by superadmins.
+        When the car changes owner, its services, invoices, service items and
+        service history move to the new customer.
         """
         is_new = self.pk is None
+        previous_customer_id = None
+        
+        self.plate_key = normalize_plate_key(self.license_plate)
+        self.vin_key = normalize_vin_key(self.vin)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            update_fields = set(update_fields)
+            if 'license_plate' in update_fields:
+                update_fields.add('plate_key')
+            if 'vin' in update_fields:
+                update_fields.add('vin_key')
+            kwargs['update_fields'] = update_fields
         
         # If this is a new car, set initial_mileage to the same as current mileage
         if is_new and self.initial_mileage == 0 and self.mileage > 0:
             self.initial_mileage = self.mileage
         elif not is_new and 'update_fields' in kwargs and 'initial_mileage' in kwargs['update_fields']:
             # Allow explicit updates to initial_mileage via update_fields parameter (used by admin)
-            pass
+            if 'customer' in update_fields:
+                previous_customer_id = Car.objects.filter(pk=self.pk).values_list('customer_id', flat=True).first()
         elif not is_new:
             # For existing cars, retrieve the current initial_mileage to preserve it
             try:
                 current_car = Car.objects.get(pk=self.pk)
                 self.initial_mileage = current_car.initial_mileage
+                if update_fields is None or 'customer' in update_fields:
+                    previous_customer_id = current_car.customer_id
             except Car.DoesNotExist:
                 # This is a safeguard - should not happen in normal operation
                 pass
             
         super().save(*args, **kwargs)
+        
+        if previous_customer_id is not None and previous_customer_id != self.customer_id:
+            from utils.customer_scope_utils import transfer_car
+            transfer_car(self.pk, self.customer_id)
 
     class Meta:
         verbose_name = _('Car')
         verbose_name_plural = _('Cars')
         indexes = [
-            models.Index(fields=['customer']),
-            models.Index(fields=['license_plate']),
             models.Index(fields=['vin']),
             models.Index(fields=['make', 'model']),
             models.Index(fields=['year']),
@@ -677,7 +699,8 @@ class ServiceInterval(models.Model):
         indexes = [
             models.Index(fields=['car_make', 'car_model']),
             models.Index(fields=['interval_type']),
-            models.Index(fields=['is_active']),
+            # get_applicable_service_intervals
+            models.Index(fields=['is_active', 'car_make', 'car_model'], name='interval_active_make_idx'),
         ]
         ordering = ['name', 'car_make', 'car_model']
 
@@ -686,9 +709,12 @@ class MileageUpdate(models.Model):
     """
     Track periodic mileage updates from car owners
     """
-    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='mileage_updates')
+    # Indexed by mileage_car_date_idx
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='mileage_updates', db_index=False)
     mileage = models.PositiveIntegerField(_('Current Mileage'))
-    reported_date = models.DateTimeField(_('Reported Date'), auto_now_add=True)
+    # Not auto_now_add: batch ingestion (utils.mileage_utils) needs to keep the
+    # timestamp reported by the device, and bulk_create would overwrite it.
+    reported_date = models.DateTimeField(_('Reported Date'), default=timezone.now, editable=False)
     notes = models.TextField(_('Notes'), blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -745,7 +771,8 @@ class MileageUpdate(models.Model):
         verbose_name = _('Mileage Update')
         verbose_name_plural = _('Mileage Updates')
         indexes = [
-            models.Index(fields=['car']),
+            # A car's updates, newest first
+            models.Index(fields=['car', '-reported_date'], name='mileage_car_date_idx'),
             models.Index(fields=['reported_date']),
         ]
         ordering = ['-reported_date']
@@ -762,7 +789,11 @@ class Service(models.Model):
         ('cancelled', _('Cancelled')),
     ]
 
-    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='services')
+    # Indexed by service_car_status_date_idx
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='services', db_index=False)
+    # Copy of the car owner for customer-scoped lists, see utils.customer_scope_utils
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', editable=False,
+                                 db_index=False)
     title = models.CharField(_('Service Title'), max_length=100)
     description = models.TextField(_('Description'))
     status = models.CharField(_('Status'), max_length=15, choices=STATUS_CHOICES, default='scheduled')
@@ -833,17 +864,36 @@ class Service(models.Model):
                         )
                     })
 
+    @transaction.atomic
     def save(self, *args, **kwargs):
+        # Atomic so the status change and its outbox messages commit together
         is_new = self.pk is None
         
+        self.customer_id = Car.objects.filter(pk=self.car_id).values_list('customer_id', flat=True).first()
+        
         # Get the old status if this is an existing service
         old_status = None
+        old_customer_id = None
         if not is_new:
-            old_status = Service.objects.get(pk=self.pk).status
+            old_status, old_customer_id = Service.objects.filter(pk=self.pk).values_list('status', 'customer_id').get()
             
         # Call the original save method first
         super().save(*args, **kwargs)
         
+        # Moved to another customer's car: its invoice and items follow
+        if old_customer_id is not None and old_customer_id != self.customer_id:
+            from utils.cache_utils import bump_version
+            # update() sends no signals, so cached rows are dropped by hand
+            moved = [
+                model for model in (Invoice, ServiceItem)
+                if model.objects.filter(service=self).update(customer_id=self.customer_id)
+            ]
+
+            def bump():
+                for model in moved:
+                    bump_version(model)
+            transaction.on_commit(bump)
+        
         import logging
         logger = logging.getLogger(__name__)
         
@@ -863,55 +913,60 @@ class Service(models.Model):
             
             if not existing_history:
                 try:
-                    logger.info(f"Creating service history for service {self.id}")
-                    
-                    # Get or calculate service date and mileage
-                    service_date = self.completed_date.date() if self.completed_date else timezone.now().date()
-                    service_mileage = self.service_mileage or self.car.mileage
-                    
-                    # Create service history record
-                    service_history = ServiceHistory.objects.create(
-                        car=self.car,
-                        service=self,
-                        service_interval=self.service_type,
-                        service_date=service_date,
-                        service_mileage=service_mileage
-                    )
-                    
-                    # Update car's last service info
-                    self.car.last_service_date = service_date
-                    self.car.last_service_mileage = service_mileage
-                    self.car.save(update_fields=['last_service_date', 'last_service_mileage'])
-                    
-                    # Update service predictions
-                    self.car.update_service_predictions()
-                    
-                    logger.info(f"Service history created with ID {service_history.id}")
+                    # Savepoint so a failure here doesn't break the enclosing transaction
+                    with transaction.atomic():
+                        logger.info(f"Creating service history for service {self.id}")
+                        
+                        # Get or calculate service date and mileage
+                        service_date = self.completed_date.date() if self.completed_date else timezone.now().date()
+                        service_mileage = self.service_mileage or self.car.mileage
+                        
+                        # Create service history record
+                        service_history = ServiceHistory.objects.create(
+                            car=self.car,
+                            service=self,
+                            service_interval=self.service_type,
+                            service_date=service_date,
+                            service_mileage=service_mileage
+                        )
+                        
+                        # Update car's last service info
+                        self.car.last_service_date = service_date
+                        self.car.last_service_mileage = service_mileage
+                        self.car.save(update_fields=['last_service_date', 'last_service_mileage'])
+                        
+                        # Update service predictions
+                        self.car.update_service_predictions()
+                        
+                        logger.info(f"Service history created with ID {service_history.id}")
                 except Exception as e:
                     logger.error(f"Error creating service history: {str(e)}")
             else:
                 logger.info(f"Service history already exists for service {self.id}")
                 
-        # Send notification when status changes to completed
+        # Queue notifications when status changes to completed.
+        # Email/SMS go through the outbox so they are only delivered once this
+        # transaction commits, and the request never waits on SMTP or the SMS gateway.
         if self.status == 'completed' and old_status != 'completed':
             try:
-                from utils.email_utils import send_service_completed_notification
-                send_service_completed_notification(self)
-                
-                from utils.sms_utils import send_service_completed_sms
-                send_service_completed_sms(self)
-                
-                # Create in-app notification
-                from core.models import Notification
-                Notification.objects.create(
-                    customer=self.car.customer,
-                    title=_('Service Completed'),
-                    message=_('Your service "{}" has been completed.').format(self.title),
-                    notification_type='service_update'
-                )
+                with transaction.atomic():
+                    from utils.outbox import enqueue_message, occurrence_key
+                    # Keyed per completion: a reopened service is notified again when it completes
+                    for channel in ('email', 'sms'):
+                        enqueue_message('service_completed', channel, self,
+                                        dedup_key=occurrence_key('service_completed', channel, self))
+                    
+                    # Create in-app notification
+                    from core.models import Notification
+                    Notification.objects.create(
+                        customer=self.car.customer,
+                        title=_('Service Completed'),
+                        message=_('Your service "{}" has been completed.').format(self.title),
+                        notification_type='service_update'
+                    )
                 
             except Exception as e:
-                logger.error(f"Error sending service completion notifications: {str(e)}")
+                logger.error(f"Error queuing service completion notifications: {str(e)}")
                 # Don't re-raise the exception to avoid breaking the save process
 
     def __str__(self):
@@ -921,7 +976,13 @@ class Service(models.Model):
         verbose_name = _('Service')
         verbose_name_plural = _('Services')
         indexes = [
-            models.Index(fields=['car']),
+            # A customer's services, newest first
+            models.Index(fields=['customer', '-scheduled_date'], name='service_customer_date_idx'),
+            # A car's services, by status, in date order
+            models.Index(fields=['car', 'status', 'scheduled_date'], name='service_car_status_date_idx'),
+            # Upcoming and in-progress lists
+            models.Index(fields=['scheduled_date'], condition=Q(status__in=['scheduled', 'in_progress']),
+                         name='service_open_date_idx'),
             models.Index(fields=['status']),
             models.Index(fields=['scheduled_date']),
             models.Index(fields=['completed_date']),
@@ -1000,6 +1061,9 @@ class ServiceItem(models.Model):
     ]
 
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='items')
+    # Copy of the car owner for customer-scoped lists, see utils.customer_scope_utils
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', editable=False,
+                                 db_index=False)
     item_type = models.CharField(_('Type'), max_length=5, choices=TYPE_CHOICES)
     name = models.CharField(_('Name'), max_length=100)
     description = models.TextField(_('Description'), blank=True, null=True)
@@ -1013,11 +1077,15 @@ class ServiceItem(models.Model):
     def __str__(self):
         return f"{self.name} ({self.get_item_type_display()})"
 
+    def save(self, *args, **kwargs):
+        self.customer_id = Service.objects.filter(pk=self.service_id).values_list('customer_id', flat=True).first()
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = _('Service Item')
         verbose_name_plural = _('Service Items')
         indexes = [
-            models.Index(fields=['service']),
+            models.Index(fields=['customer', 'service'], name='serviceitem_customer_idx'),
             models.Index(fields=['item_type']),
         ]
 
@@ -1035,12 +1103,17 @@ class Invoice(models.Model):
     ]
 
     service = models.OneToOneField(Service, on_delete=models.CASCADE, related_name='invoice')
+    # Copy of the car owner for customer-scoped lists, see utils.customer_scope_utils
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', editable=False,
+                                 db_index=False)
     invoice_number = models.CharField(_('Invoice Number'), max_length=20, unique=True, editable=False)
     issued_date = models.DateField(_('Issued Date'), auto_now_add=True)
     due_date = models.DateField(_('Due Date'))
     status = models.CharField(_('Status'), max_length=10, choices=STATUS_CHOICES, default='draft')
     notes = models.TextField(_('Notes'), blank=True, null=True)
     pdf_file = models.FileField(_('PDF File'), upload_to='invoices/', blank=True, null=True)
+    # Hash of the render inputs of a generated pdf_file (empty for uploaded PDFs)
+    pdf_hash = models.CharField(_('PDF Content Hash'), max_length=64, blank=True, null=True, editable=False)
     final_amount = models.DecimalField(_('Final Amount'), max_digits=10, decimal_places=3, blank=True, null=True, 
                                      help_text=_('Custom final amount to be displayed to the customer.'))
     refund_date = models.DateField(_('Refund Date'), blank=True, null=True)
@@ -1063,10 +1136,13 @@ class Invoice(models.Model):
         status_changed = False
         old_status = None
         
+        old_pdf_name = None
+        
         if not is_new:
             try:
                 old_obj = Invoice.objects.get(pk=self.pk)
                 old_status = old_obj.status
+                old_pdf_name = old_obj.pdf_file.name
                 if old_status != self.status:
                     status_changed = True
             except Invoice.DoesNotExist:
@@ -1075,6 +1151,8 @@ class Invoice(models.Model):
         if not self.invoice_number:
             self.invoice_number = f"INV-{uuid.uuid4().hex[:8].upper()}"
         
+        self.customer_id = Service.objects.filter(pk=self.service_id).values_list('customer_id', flat=True).first()
+        
         # Handle refund status changes
         if status_changed and self.status == 'refunded' and old_status == 'paid':
             # Set refund date if not set
@@ -1085,13 +1163,18 @@ class Invoice(models.Model):
             if not self.refund_amount:
                 self.refund_amount = self.total
         
-        # Save the invoice first so it has an ID
-        super().save(*args, **kwargs)
-        
-        # Avoid immediate recursive calls by checking flags
-        
-        # Use transaction to avoid database inconsistencies
+        # Use transaction so the invoice and its queued notifications commit together
         with transaction.atomic():
+            # Save the invoice first so it has an ID
+            super().save(*args, **kwargs)
+            
+            # Release the replaced PDF; shared content stays until its last reference goes
+            if old_pdf_name and old_pdf_name != self.pdf_file.name:
+                storage = self.pdf_file.storage
+                transaction.on_commit(lambda: storage.delete(old_pdf_name))
+            
+            # Avoid immediate recursive calls by checking flags
+            
             # Removed automatic PDF generation
             
             # If status changed to paid, create a notification
@@ -1110,22 +1193,32 @@ class Invoice(models.Model):
                 finally:
                     self._refund_notification_in_progress = False
             
-            # Send email notification for new invoices or status changes
+            # Queue email notification for new invoices or status changes.
+            # Delivery happens from the outbox after commit (see utils.outbox).
             if (is_new or status_changed) and not getattr(self, '_notifications_in_progress', False):
                 self._notifications_in_progress = True
                 try:
-                    from utils.email_utils import send_invoice_notification
-                    send_invoice_notification(self)
+                    from utils.outbox import enqueue_message, occurrence_key
+                    # Keyed per status change: paid -> pending -> paid notifies twice
+                    enqueue_message('invoice_updated', 'email', self,
+                                    dedup_key=occurrence_key('invoice_updated', 'email', self))
                     
-                    # Send SMS notification for new invoices
+                    # Queue SMS notification for new invoices
                     if is_new:
-                        from utils.sms_utils import send_invoice_sms
-                        send_invoice_sms(self)
+                        enqueue_message('invoice_created', 'sms', self)
                 except Exception as e:
-                    print(f"Error sending notifications: {e}")
+                    logger.error(f"Error queuing invoice notifications: {str(e)}")
                 finally:
                     self._notifications_in_progress = False
 
+    def delete(self, *args, **kwargs):
+        pdf_name = self.pdf_file.name
+        storage = self.pdf_file.storage
+        result = super().delete(*args, **kwargs)
+        if pdf_name:
+            transaction.on_commit(lambda: storage.delete(pdf_name))
+        return result
+
     def _create_invoice_paid_notification(self):
         """Create a notification when an invoice is paid"""
         Notification.objects.create(
@@ -1153,8 +1246,8 @@ class Invoice(models.Model):
         verbose_name = _('Invoice')
         verbose_name_plural = _('Invoices')
         indexes = [
-            models.Index(fields=['service']),
-            models.Index(fields=['invoice_number']),
+            # A customer's invoices, newest first
+            models.Index(fields=['customer', '-issued_date'], name='invoice_customer_issued_idx'),
             models.Index(fields=['issued_date']),
             models.Index(fields=['due_date']),
             models.Index(fields=['status']),
@@ -1172,7 +1265,8 @@ class Notification(models.Model):
         ('general', _('General')),
     ]
 
-    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='notifications')
+    # Indexed by notif_customer_created_idx
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='notifications', db_index=False)
     title = models.CharField(_('Title'), max_length=100)
     message = models.TextField(_('Message'))
     notification_type = models.CharField(_('Type'), max_length=20, choices=TYPE_CHOICES)
@@ -1182,24 +1276,84 @@ class Notification(models.Model):
     def __str__(self):
         return f"{self.title} - {self.customer}"
 
+    def save(self, *args, **kwargs):
+        from utils.notification_utils import adjust_unread_count, invalidate_unread_count
+        from utils.notification_stream import publish_notification
+
+        is_new = self._state.adding
+        super().save(*args, **kwargs)
+
+        # Keep the cached unread badge in step; other changes force a recount
+        if is_new:
+            if not self.is_read:
+                adjust_unread_count(self.customer.user_id, 1)
+            publish_notification(self, self.customer.user_id)
+        else:
+            invalidate_unread_count(self.customer.user_id)
+
+    def delete(self, *args, **kwargs):
+        from utils.notification_utils import invalidate_unread_count
+
+        user_id = self.customer.user_id
+        result = super().delete(*args, **kwargs)
+        invalidate_unread_count(user_id)
+        return result
+
     class Meta:
         verbose_name = _('Notification')
         verbose_name_plural = _('Notifications')
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['customer']),
+            # The customer's notification list, newest first
+            models.Index(fields=['customer', '-created_at'], name='notif_customer_created_idx'),
+            # Unread count fallback and unread list; only unread rows
+            models.Index(fields=['customer', '-created_at'], condition=Q(is_read=False),
+                         name='notif_unread_idx'),
+            # Archiving of read notifications
+            models.Index(fields=['created_at'], condition=Q(is_read=True), name='notif_read_created_idx'),
             models.Index(fields=['notification_type']),
-            models.Index(fields=['is_read']),
             models.Index(fields=['created_at']),
         ]
 
 
+class ArchivedNotification(models.Model):
+    """
+    Read notification moved out of the Notification table by
+    utils.notification_utils.archive_notifications once it is older than
+    NOTIFICATION_RETENTION_DAYS. Customers can still fetch them on demand.
+    """
+    original_id = models.BigIntegerField(_('Original ID'), unique=True)
+    # Indexed by archived_notif_customer_idx
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='archived_notifications',
+                                 db_index=False)
+    title = models.CharField(_('Title'), max_length=100)
+    message = models.TextField(_('Message'))
+    notification_type = models.CharField(_('Type'), max_length=20, choices=Notification.TYPE_CHOICES)
+    created_at = models.DateTimeField(_('Created At'))
+    archived_at = models.DateTimeField(_('Archived At'), default=timezone.now)
+
+    def __str__(self):
+        return f"{self.title} - {self.customer} (archived)"
+
+    class Meta:
+        verbose_name = _('Archived Notification')
+        verbose_name_plural = _('Archived Notifications')
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', 'created_at'], name='archived_notif_customer_idx'),
+            models.Index(fields=['archived_at']),
+        ]
+
 class ServiceHistory(models.Model):
     """
     Model for tracking service history as it relates to service intervals and predictions.
     This helps maintain a clear record of maintenance for prediction purposes.
     """
-    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='service_history')
+    # Indexed by history_car_date_idx
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='service_history', db_index=False)
+    # Copy of the car owner for customer-scoped lists, see utils.customer_scope_utils
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, related_name='+', editable=False,
+                                 db_index=False)
     service = models.OneToOneField(Service, on_delete=models.CASCADE, related_name='service_history_record')
     service_interval = models.ForeignKey(ServiceInterval, on_delete=models.SET_NULL, null=True, blank=True,
                                      related_name='service_history')
@@ -1211,12 +1365,116 @@ class ServiceHistory(models.Model):
         interval_name = self.service_interval.name if self.service_interval else "Unspecified"
         return f"{interval_name} - {self.car} - {self.service_date}"
     
+    def save(self, *args, **kwargs):
+        self.customer_id = Car.objects.filter(pk=self.car_id).values_list('customer_id', flat=True).first()
+        super().save(*args, **kwargs)
+    
     class Meta:
         verbose_name = _('Service History')
         verbose_name_plural = _('Service History')
         indexes = [
-            models.Index(fields=['car']),
+            # A customer's history, latest first
+            models.Index(fields=['customer', '-service_date'], name='history_customer_date_idx'),
+            # A car's history, latest first, overall and per interval
+            models.Index(fields=['car', '-service_date', '-service_mileage'], name='history_car_date_idx'),
+            models.Index(fields=['car', 'service_interval', '-service_date', '-service_mileage'],
+                         name='history_car_interval_idx'),
             models.Index(fields=['service_date']),
-            models.Index(fields=['service_mileage']),
         ]
         ordering = ['-service_date']
+
+
+class OutboxMessage(models.Model):
+    """
+    Email/SMS side effect recorded in the same transaction as the state change
+    that triggered it. Rows are delivered asynchronously by utils.outbox.dispatch_pending,
+    so messages only go out for committed changes and request latency does not
+    depend on the SMTP server or SMS gateway.
+    """
+    CHANNEL_CHOICES = [
+        ('email', _('Email')),
+        ('sms', _('SMS')),
+    ]
+
+    STATUS_CHOICES = [
+        ('pending', _('Pending')),
+        ('sent', _('Sent')),
+        ('skipped', _('Skipped')),
+        ('failed', _('Failed')),
+    ]
+
+    channel = models.CharField(_('Channel'), max_length=10, choices=CHANNEL_CHOICES)
+    event = models.CharField(_('Event'), max_length=50)
+    object_id = models.BigIntegerField(_('Object ID'))
+    dedup_key = models.CharField(_('Deduplication Key'), max_length=150, unique=True)
+    status = models.CharField(_('Status'), max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(_('Attempts'), default=0)
+    next_attempt_at = models.DateTimeField(_('Next Attempt'), default=timezone.now)
+    last_error = models.TextField(_('Last Error'), blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(_('Sent At'), blank=True, null=True)
+
+    def __str__(self):
+        return f"{self.event} ({self.channel}) #{self.object_id} - {self.status}"
+
+    class Meta:
+        verbose_name = _('Outbox Message')
+        verbose_name_plural = _('Outbox Messages')
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+            models.Index(fields=['created_at']),
+            models.Index(fields=['event', 'object_id']),
+        ]
+        ordering = ['id']
+
+
+class SMSDelivery(models.Model):
+    """
+    Audit record of one SMS handed to the gateway, written by utils.sms_utils
+    after each send with the final status, provider message id and number of attempts.
+    """
+    STATUS_CHOICES = [
+        ('sent', _('Sent')),
+        ('failed', _('Failed')),
+    ]
+
+    phone_number = models.CharField(_('Phone Number'), max_length=20)
+    message = models.TextField(_('Message'))
+    status = models.CharField(_('Status'), max_length=10, choices=STATUS_CHOICES)
+    provider_message_id = models.CharField(_('Provider Message ID'), max_length=100, blank=True, null=True)
+    attempts = models.PositiveSmallIntegerField(_('Attempts'), default=1)
+    error = models.TextField(_('Error'), blank=True, null=True)
+    created_at = models.DateTimeField(_('Created At'), default=timezone.now)
+
+    def __str__(self):
+        return f"SMS to {self.phone_number} - {self.status}"
+
+    class Meta:
+        verbose_name = _('SMS Delivery')
+        verbose_name_plural = _('SMS Deliveries')
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['phone_number']),
+        ]
+        ordering = ['-created_at']
+
+
+class StoredFile(models.Model):
+    """
+    Reference count of a content-addressed media file written by
+    utils.storage.ShardedContentStorage. Identical uploads share one file;
+    it is deleted when the last reference is released.
+    """
+    name = models.CharField(_('Name'), max_length=255, unique=True)
+    sha256 = models.CharField(_('SHA-256'), max_length=64, db_index=True)
+    size = models.BigIntegerField(_('Size'))
+    reference_count = models.PositiveIntegerField(_('Reference Count'), default=1)
+    created_at = models.DateTimeField(_('Created At'), default=timezone.now)
+
+    def __str__(self):
+        return f"{self.name} ({self.reference_count} references)"
+
+    class Meta:
+        verbose_name = _('Stored File')
+        verbose_name_plural = _('Stored Files')
+        ordering = ['-created_at']
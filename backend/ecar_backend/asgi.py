@@ -3,6 +3,10 @@ ASGI config for ecar_backend project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The notification SSE stream is served here, outside the Django request cycle,
+so open streams don't hold middleware state or database connections. Every
+other request goes to Django.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
@@ -13,4 +17,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'ecar_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from api.sse import STREAM_PATH, notification_stream_app  # noqa: E402
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        return await notification_stream_app(scope, receive, send)
+    return await django_application(scope, receive, send)
@@ -26,6 +26,21 @@ app.conf.beat_schedule = {
         'schedule': crontab(hour=3, minute=0),  # Run daily at 3:00 AM
         'options': {'expires': 3600}  # Task expires after 1 hour
     },
+    'dispatch-notification-outbox': {
+        'task': 'utils.outbox_task.dispatch_outbox_task',
+        'schedule': 30.0,  # Every 30 seconds
+        'options': {'expires': 25}
+    },
+    'reconcile-unread-notification-counters': {
+        'task': 'utils.notification_task.reconcile_unread_counts_task',
+        'schedule': crontab(minute='*/15'),  # Every 15 minutes
+        'options': {'expires': 600}
+    },
+    'archive-old-notifications': {
+        'task': 'utils.notification_task.archive_notifications_task',
+        'schedule': crontab(hour=4, minute=0),  # Run daily at 4:00 AM
+        'options': {'expires': 3600}
+    },
 }
 
 # Optional: set timezone for scheduled tasks
@@ -24,6 +24,17 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = os.environ.get('SECRET_KEY', 'django-insecure-sf&5=mdd7n16u!co7v&i8)ygr4c16x(_g7$k=cjvyuqqm!2-kh')
 
+# Field encryption keys by version (utils.encryption_utils). To rotate, add
+# ENCRYPTION_KEY_V2 and so on; new values use the highest version unless
+# ENCRYPTION_KEY_VERSION says otherwise, and older versions stay readable.
+ENCRYPTION_KEYS = {1: os.environ.get('ENCRYPTION_KEY', SECRET_KEY)}
+ENCRYPTION_KEYS.update({
+    int(name[len('ENCRYPTION_KEY_V'):]): value
+    for name, value in os.environ.items()
+    if name.startswith('ENCRYPTION_KEY_V') and name[len('ENCRYPTION_KEY_V'):].isdigit()
+})
+ENCRYPTION_KEY_VERSION = int(os.environ.get('ENCRYPTION_KEY_VERSION', max(ENCRYPTION_KEYS)))
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = True
 
@@ -40,6 +51,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     
     # Third-party apps
     'rest_framework',
@@ -67,6 +79,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'auditlog.middleware.AuditlogMiddleware',
+    'api.replica_routing.ReplicaPinMiddleware',
     'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
@@ -110,6 +123,30 @@ DATABASES = {
     }
 }
 
+# Read replicas: comma-separated host[:port] list, with the primary's name and
+# credentials. Each becomes a 'replicaN' alias that read-only API actions and
+# the nightly jobs read from (see utils.replica_utils). Locally, pointing one
+# at the primary (DB_REPLICA_HOSTS=localhost) exercises the routing.
+READ_REPLICAS = []
+for index, replica in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    host, _, port = replica.strip().partition(':')
+    READ_REPLICAS.append(f'replica{index}')
+    DATABASES[f'replica{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        # Tests read the test primary instead of creating a replica database
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['utils.replica_utils.ReplicaRouter']
+# Seconds a user's reads stay on the primary after they write, so they see
+# their own changes despite replication lag
+READ_REPLICA_PIN_SECONDS = int(os.environ.get('READ_REPLICA_PIN_SECONDS', 10))
+# Per viewset class name, the actions served from a replica; overrides the
+# viewset's replica_actions, e.g. {'InvoiceViewSet': []} keeps it on the primary
+READ_REPLICA_ACTIONS = {}
+
 # SQLite as fallback (commented out)
 """
 DATABASES = {
@@ -134,6 +171,10 @@ CACHES = {
 
 # Cache timeouts
 CACHE_TTL = 60 * 15  # 15 minutes
+# How long an account state change may take to reach JWT-authenticated requests
+IDENTITY_CACHE_TTL = int(os.environ.get('IDENTITY_CACHE_TTL', 30))
+# Minimum seconds between last_login writes for a user logging in with JWT
+LAST_LOGIN_UPDATE_INTERVAL = int(os.environ.get('LAST_LOGIN_UPDATE_INTERVAL', 60 * 60))
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -182,6 +223,21 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Media files are content-addressed and sharded by hash (see utils/storage.py)
+STORAGES = {
+    'default': {
+        'BACKEND': 'utils.storage.ShardedContentStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+
+# Protected files (invoice PDFs): 'django' streams them through the worker,
+# 'x-accel' hands them to nginx's internal PROTECTED_MEDIA_URL location
+FILE_DELIVERY_MODE = os.environ.get('FILE_DELIVERY_MODE', 'django')
+PROTECTED_MEDIA_URL = '/protected-media/'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
@@ -190,7 +246,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
@@ -220,7 +276,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('JWT_REFRESH_TOKEN_LIFETIME', 7))),
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
-    'UPDATE_LAST_LOGIN': True,
+    # Coalesced by api.tokens.record_login (LAST_LOGIN_UPDATE_INTERVAL)
+    'UPDATE_LAST_LOGIN': False,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': os.environ.get('JWT_SECRET_KEY', SECRET_KEY),
     'VERIFYING_KEY': None,
@@ -231,7 +288,7 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
     'JTI_CLAIM': 'jti',
     'TOKEN_OBTAIN_SERIALIZER': 'api.serializers.CustomTokenObtainPairSerializer',
-    'TOKEN_REFRESH_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenRefreshSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.serializers.RedisTokenRefreshSerializer',
     'TOKEN_VERIFY_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenVerifySerializer',
     'TOKEN_BLACKLIST_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenBlacklistSerializer',
     'SLIDING_TOKEN_OBTAIN_SERIALIZER': 'rest_framework_simplejwt.serializers.TokenObtainSlidingSerializer',
@@ -281,6 +338,7 @@ EMAIL_USE_TLS = os.environ.get('EMAIL_USE_TLS', 'True') == 'True'
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER', '')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'noreply@ecar.tn')
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 100))  # Messages per SMTP send_messages() call
 
 # Redis Configuration
 REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/1')
@@ -306,6 +364,29 @@ BACKUP_SFTP_DIRECTORY = os.environ.get('BACKUP_SFTP_DIRECTORY', '/backups')
 # SMS Configuration
 SMS_API_KEY = os.environ.get('SMS_API_KEY', '')
 SMS_SENDER_ID = os.environ.get('SMS_SENDER_ID', 'ECAR')
+SMS_TIMEOUT = int(os.environ.get('SMS_TIMEOUT', 10))  # Seconds
+SMS_API_ENDPOINT = os.environ.get('SMS_API_ENDPOINT', 'https://api.smsgateway.example/v1/messages')
+SMS_BATCH_ENDPOINT = os.environ.get('SMS_BATCH_ENDPOINT', '')  # Empty if the provider has no batch API
+SMS_BATCH_SIZE = int(os.environ.get('SMS_BATCH_SIZE', 100))
+SMS_MAX_CONCURRENCY = int(os.environ.get('SMS_MAX_CONCURRENCY', 8))
+SMS_RATE_LIMIT = float(os.environ.get('SMS_RATE_LIMIT', 20))  # Messages per second
+SMS_MAX_RETRIES = int(os.environ.get('SMS_MAX_RETRIES', 3))
+
+# Notification outbox (email/SMS delivered after commit by dispatch_outbox)
+OUTBOX_TRANSPORT = os.environ.get('OUTBOX_TRANSPORT', 'utils.outbox.DjangoTransport')
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 5))
+OUTBOX_BACKOFF_BASE_SECONDS = 30
+OUTBOX_BACKOFF_MAX_SECONDS = 60 * 60
+
+# Notification retention (read notifications are moved to the archive table)
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', 90))
+NOTIFICATION_ARCHIVE_RETENTION_DAYS = None  # Keep archived notifications forever
+NOTIFICATION_ARCHIVE_BATCH_SIZE = 1000
+
+# Live notification stream (SSE at /api/notifications/stream/, served by ecar_backend.asgi)
+NOTIFICATION_STREAM_ENABLED = os.environ.get('NOTIFICATION_STREAM_ENABLED', 'True') == 'True'
+NOTIFICATION_STREAM_REDIS_URL = os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1')
+NOTIFICATION_STREAM_KEEPALIVE = 15  # Seconds between keepalive comments
 
 # Debug Toolbar Settings
 INTERNAL_IPS = [
@@ -321,6 +402,16 @@ if DEBUG:
 # Admin autocomplete settings
 AUTOCOMPLETE_ENABLE = True
 AUTOCOMPLETE_PAGE_SIZE = 20  # Number of results per page
+AUTOCOMPLETE_CACHE_TIMEOUT = 30  # Seconds autocomplete results are cached per term
+
+# License plate / VIN lookup (api/cars/lookup/)
+VEHICLE_LOOKUP_LIMIT = 20  # Maximum cars returned per lookup
+
+# Global search (api/search/): total latency budget and per-entity timeout
+GLOBAL_SEARCH_BUDGET_MS = int(os.environ.get('GLOBAL_SEARCH_BUDGET_MS', 500))
+GLOBAL_SEARCH_ENTITY_TIMEOUT_MS = int(os.environ.get('GLOBAL_SEARCH_ENTITY_TIMEOUT_MS', 300))
+GLOBAL_SEARCH_WORKERS = int(os.environ.get('GLOBAL_SEARCH_WORKERS', 8))  # Threads per process
+GLOBAL_SEARCH_MAX_RESULTS = 20
 
 # Swagger/OpenAPI settings
 SWAGGER_SETTINGS = {
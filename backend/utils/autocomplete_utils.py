@@ -0,0 +1,145 @@
+"""
+Autocomplete lookups shared by the admin and get_user_data.
+
+``autocomplete(source, term)`` returns the IDs of at most
+AUTOCOMPLETE_PAGE_SIZE rows, best matches first:
+
+1. Prefix matches (``istartswith``) on the source's own columns
+2. If that does not fill the page, fuzzy matches (pg_trgm word similarity),
+   so typos such as "mohamed" / "mohammed" still find the row
+
+Every searched column has a trigram GIN index on ``UPPER(column)`` (core
+migration 0021), which serves both the prefix match (Django compiles
+``istartswith`` to ``UPPER(column) LIKE``) and the fuzzy match. Columns of related tables are
+not joined: their matches are looked up on their own table and mapped
+through the foreign key (a car matches when its customer does, and so on).
+
+Results are cached per source and lower-cased term for
+AUTOCOMPLETE_CACHE_TIMEOUT seconds, and dropped when a row of a searched
+model changes (see utils.cache_utils). Fuzzy matching needs PostgreSQL;
+other databases only get the prefix matches.
+"""
+import hashlib
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Q, When
+from django.db.models.functions import Greatest, Upper
+
+from .cache_utils import get_or_compute, versioned_key
+
+AUTOCOMPLETE_PAGE_SIZE = getattr(settings, 'AUTOCOMPLETE_PAGE_SIZE', 20)
+AUTOCOMPLETE_CACHE_TIMEOUT = getattr(settings, 'AUTOCOMPLETE_CACHE_TIMEOUT', 30)
+
+# Shorter terms only get prefix matches: their trigrams match nearly everything
+FUZZY_MIN_LENGTH = 3
+
+# Per source: model label, own columns, and (foreign key, source) pairs whose
+# matches also match this source
+SOURCES = {
+    'user': ('auth.User', ['username', 'first_name', 'last_name', 'email'], []),
+    'customer': ('core.Customer', ['phone'], [('user_id', 'user')]),
+    'car': ('core.Car', ['license_plate', 'vin', 'make', 'model'], [('customer_id', 'customer')]),
+    'service': ('core.Service', ['title'], [('car_id', 'car')]),
+}
+
+
+def _model(label):
+    from django.apps import apps
+    return apps.get_model(label)
+
+
+def _source_models(source):
+    label, _, related = SOURCES[source]
+    models = [label]
+    for _, related_source in related:
+        models += _source_models(related_source)
+    return models
+
+
+def _prefix_ids(model, fields, term, limit, exclude=()):
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__istartswith": term})
+    return list(
+        model.objects.filter(condition).exclude(pk__in=exclude)
+        .order_by(*fields[:1], 'pk').values_list('pk', flat=True)[:limit]
+    )
+
+
+def _fuzzy_ids(model, fields, term, limit, exclude=()):
+    from django.contrib.postgres.search import TrigramWordSimilarity
+
+    # On UPPER(column), like istartswith, so one trigram index serves both
+    uppers = {f"_upper_{field}": Upper(field) for field in fields}
+    condition = Q()
+    for name in uppers:
+        # <% operator
+        condition |= Q(**{f"{name}__trigram_word_similar": term})
+    similarities = [TrigramWordSimilarity(term, F(name)) for name in uppers]
+    similarity = Greatest(*similarities) if len(similarities) > 1 else similarities[0]
+    return list(
+        model.objects.alias(**uppers).filter(condition).exclude(pk__in=exclude)
+        .annotate(similarity=similarity).order_by('-similarity', 'pk')
+        .values_list('pk', flat=True)[:limit]
+    )
+
+
+def _through_related(model, related, term, limit, ids, fuzzy):
+    """Rows of ``model`` whose related rows match, until ``ids`` holds ``limit``"""
+    for foreign_key, related_source in related:
+        if len(ids) >= limit:
+            break
+        related_ids = _search(related_source, term, limit, fuzzy)
+        if related_ids:
+            ids += list(
+                model.objects.filter(**{f"{foreign_key}__in": related_ids}).exclude(pk__in=ids)
+                .order_by('pk').values_list('pk', flat=True)[:limit - len(ids)]
+            )
+    return ids
+
+
+def _search(source, term, limit, fuzzy):
+    label, fields, related = SOURCES[source]
+    model = _model(label)
+
+    ids = _prefix_ids(model, fields, term, limit)
+    ids = _through_related(model, related, term, limit, ids, fuzzy=False)
+    if fuzzy and len(ids) < limit:
+        ids += _fuzzy_ids(model, fields, term, limit - len(ids), exclude=ids)
+        ids = _through_related(model, related, term, limit, ids, fuzzy=True)
+    return ids[:limit]
+
+
+def autocomplete(source, term, limit=None):
+    """
+    IDs of the rows of ``source`` matching ``term``, best matches first.
+
+    Args:
+        source (str): 'user', 'customer', 'car' or 'service'
+        term (str): What the user typed
+        limit (int, optional): Maximum results. Defaults to AUTOCOMPLETE_PAGE_SIZE.
+
+    Returns:
+        list: Primary keys
+    """
+    term = ' '.join(term.split()).lower()
+    limit = limit or AUTOCOMPLETE_PAGE_SIZE
+    if not term:
+        return []
+
+    fuzzy = connection.vendor == 'postgresql' and len(term) >= FUZZY_MIN_LENGTH
+    key = versioned_key(
+        f"autocomplete:{source}:{limit}:{hashlib.md5(term.encode()).hexdigest()}",
+        _source_models(source),
+    )
+    return get_or_compute(key, lambda: _search(source, term, limit, fuzzy), AUTOCOMPLETE_CACHE_TIMEOUT)
+
+
+def in_match_order(queryset, ids):
+    """``queryset`` limited to ``ids`` and ordered like them"""
+    if not ids:
+        return queryset.none()
+    return queryset.filter(pk__in=ids).order_by(
+        Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+    )
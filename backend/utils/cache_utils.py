@@ -1,12 +1,213 @@
+"""
+Cache helpers with generational invalidation.
+
+Every model, and every model instance, has a version number in the cache.
+Cached values that declare ``depends_on=`` embed the current versions of
+their dependencies in their key. Saving or deleting an instance bumps its own
+version and its model's version once the transaction commits (see
+``connect_cache_versioning``). Entries built on the old versions are then
+never read again and expire on their own, so invalidation costs two INCRs and
+never scans the keyspace.
+
+A dependency is a model class, a model label (``'core.Service'``), a model
+instance, or a ``(model, pk)`` pair for a single row.
+
+Values built by ``cache_result``, ``get_or_set_cache``, ``cache_queryset``
+(and ``api.response_cache``) go through ``get_or_compute``, which stores them
+in an envelope with a soft expiry. ``None`` is cached like any other value.
+Shortly before the soft expiry one caller is picked at random to refresh early.
+After it, one caller takes a short lock and recomputes while the others keep
+serving the stale value for CACHE_STALE_GRACE seconds. Callers with nothing
+to serve wait briefly for the lock holder's result. Values are always built
+on the primary, even inside a read-replica scope (see utils.replica_utils).
+Otherwise a lagging replica would store stale data under the current versions.
+
+``TwoTierCache`` keeps hot reference data in a bounded in-process LRU in front
+of Redis. Local entries carry the versions they were built under. Each worker
+re-reads those versions from Redis at most once per
+TWO_TIER_VERSION_CHECK_INTERVAL, so a write in one worker reaches the other
+workers' local copies within that interval, and the writing worker sees it at once.
+"""
 from django.core.cache import cache
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import post_save, post_delete
+from collections import OrderedDict, namedtuple
 from functools import wraps
 import hashlib
 import json
+import math
+import random
+import threading
+import time
+
+from .replica_utils import use_primary
 
 # Default cache timeout (15 minutes)
 DEFAULT_CACHE_TIMEOUT = getattr(settings, 'CACHE_TTL', 60 * 15)
 
+VERSION_KEY_PREFIX = 'cachever'
+
+# Seconds a worker trusts its snapshot of dependency versions for local entries
+TWO_TIER_VERSION_CHECK_INTERVAL = getattr(settings, 'TWO_TIER_VERSION_CHECK_INTERVAL', 1.0)
+
+# Seconds an expired value is still served while one caller recomputes it
+STALE_GRACE = getattr(settings, 'CACHE_STALE_GRACE', 60)
+
+# Early refresh eagerness (0 disables it; higher refreshes earlier)
+EARLY_REFRESH_BETA = getattr(settings, 'CACHE_EARLY_REFRESH_BETA', 1.0)
+
+# Lifetime of the recompute lock, and how long a caller with no value waits for the holder
+RECOMPUTE_LOCK_TIMEOUT = getattr(settings, 'CACHE_RECOMPUTE_LOCK_TIMEOUT', 10)
+RECOMPUTE_LOCK_WAIT = getattr(settings, 'CACHE_RECOMPUTE_LOCK_WAIT', 2.0)
+RECOMPUTE_POLL_INTERVAL = 0.05
+
+# Incremented on every version bump made by this process, so local tiers
+# notice their own process's writes without waiting for the check interval
+_local_generation = 0
+
+
+def _model_label(model):
+    if isinstance(model, str):
+        # Bare model names refer to the core app
+        label = model if '.' in model else f"core.{model}"
+        return label.lower()
+    return model._meta.label_lower
+
+
+def _version_key(dependency):
+    """Version key of one dependency"""
+    if isinstance(dependency, Model):
+        return f"{VERSION_KEY_PREFIX}:{dependency._meta.label_lower}:{dependency.pk}"
+    if isinstance(dependency, tuple):
+        model, pk = dependency
+        return f"{VERSION_KEY_PREFIX}:{_model_label(model)}:{pk}"
+    return f"{VERSION_KEY_PREFIX}:{_model_label(dependency)}"
+
+
+def _initial_version():
+    # Time-based, so a version key that was evicted never comes back with a value
+    # that entries cached before the eviction still carry
+    return time.time_ns() // 1000
+
+
+def get_versions(dependencies):
+    """
+    Current versions of the given dependencies, in one cache round trip.
+    
+    Args:
+        dependencies (iterable): Models, labels, instances or (model, pk) pairs
+        
+    Returns:
+        list: One version per dependency
+    """
+    keys = [_version_key(dependency) for dependency in dependencies]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            version = _initial_version()
+            # add() so a concurrent bump is not overwritten
+            if not cache.add(key, version, timeout=None):
+                version = cache.get(key, version)
+            versions[key] = version
+    return [versions[key] for key in keys]
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Never read yet; any new value differs from what cached entries carry
+        cache.set(key, _initial_version(), timeout=None)
+
+
+def bump_version(model, pk=None):
+    """
+    Invalidate everything cached with a dependency on a model or one of its rows.
+    
+    Bumping a row also bumps its model, since model-wide results include it.
+    
+    Args:
+        model: Model class or label
+        pk (optional): Primary key of a single row
+    """
+    global _local_generation
+    if pk is not None:
+        _bump(_version_key((model, pk)))
+    _bump(_version_key(model))
+    _local_generation += 1
+
+
+def _resolve_dependencies(depends_on, args=(), kwargs=None):
+    if depends_on is None:
+        return []
+    if callable(depends_on) and not isinstance(depends_on, type):
+        depends_on = depends_on(*args, **(kwargs or {}))
+    if isinstance(depends_on, (str, tuple, Model, type)):
+        return [depends_on]
+    return list(depends_on)
+
+
+def versioned_key(key, depends_on):
+    """Append the current versions of ``depends_on`` to a cache key"""
+    if not depends_on:
+        return key
+    versions = ".".join(str(version) for version in get_versions(depends_on))
+    key = f"{key}:v{versions}"
+    if len(key) > 250:
+        key = f"versioned:{hashlib.md5(key.encode()).hexdigest()}"
+    return key
+
+
+# Rows whose version is also bumped when a related row changes, per model label:
+# a foreign key field name, or a callable returning (model, pk) pairs
+_parents = {}
+
+# Saves touching only these fields never change cached data
+IGNORED_UPDATE_FIELDS = frozenset(['last_login'])
+
+
+def _on_model_change(sender, instance, update_fields=None, **kwargs):
+    if update_fields and IGNORED_UPDATE_FIELDS.issuperset(update_fields):
+        return
+
+    label = sender._meta.label_lower
+    rows = [(label, instance.pk)]
+    for parent in _parents.get(label, ()):
+        if callable(parent):
+            rows.extend(parent(instance))
+        else:
+            field = sender._meta.get_field(parent)
+            pk = getattr(instance, field.attname)
+            if pk is not None:
+                rows.append((field.related_model, pk))
+
+    def bump():
+        for model, pk in rows:
+            bump_version(model, pk)
+    transaction.on_commit(bump)
+
+
+def connect_cache_versioning(models, parents=None):
+    """
+    Bump cache versions whenever instances of ``models`` are saved or deleted.
+    
+    Bulk ``update()``/``delete()`` calls send no signals; call ``bump_version``
+    after them when cached data depends on the rows they change.
+    
+    Args:
+        models (iterable): Model classes to watch
+        parents (dict, optional): Per model, foreign key names (or callables
+            returning (model, pk) pairs) of rows whose cached representations
+            embed it; those rows are bumped too
+    """
+    for model, related in (parents or {}).items():
+        _parents[model._meta.label_lower] = list(related)
+    for model in models:
+        post_save.connect(_on_model_change, sender=model, dispatch_uid=f"cache_version_save:{model._meta.label_lower}")
+        post_delete.connect(_on_model_change, sender=model, dispatch_uid=f"cache_version_delete:{model._meta.label_lower}")
+
 def generate_cache_key(prefix, args=None, kwargs=None):
     """
     Generate a consistent cache key based on a prefix and arguments.
@@ -37,12 +238,115 @@ def generate_cache_key(prefix, args=None, kwargs=None):
         
     return key
 
-def cache_result(timeout=None):
+# Cached envelope: the value, when it goes stale, and how long it took to build
+_Envelope = namedtuple('_Envelope', ['value', 'expires_at', 'compute_time'])
+
+# Returned by a compute function to skip caching its result
+NOT_CACHEABLE = object()
+
+_recompute_stats = {
+    'hits': 0,
+    'misses': 0,
+    'early_refreshes': 0,
+    'stale_served': 0,
+    'recomputes': 0,
+    'lock_waits': 0,
+    'lock_wait_timeouts': 0,
+}
+_recompute_stats_lock = threading.Lock()
+
+
+def _count(name):
+    with _recompute_stats_lock:
+        _recompute_stats[name] += 1
+
+
+def recompute_stats():
+    """Counters of get_or_compute in this process"""
+    with _recompute_stats_lock:
+        return dict(_recompute_stats)
+
+
+def _recompute(key, compute, timeout):
+    started = time.monotonic()
+    # Never from a lagging replica: the value is stored under the current versions
+    with use_primary():
+        value = compute()
+    compute_time = time.monotonic() - started
+    _count('recomputes')
+    if value is not NOT_CACHEABLE:
+        envelope = _Envelope(value, time.time() + timeout, compute_time)
+        cache.set(key, envelope, timeout=timeout + STALE_GRACE)
+    return value
+
+
+def get_or_compute(key, compute, timeout=None):
+    """
+    Return the cached value of ``key``, computing it with stampede protection.
+    
+    Args:
+        key (str): Cache key
+        compute (callable): Builds the value; may return None (cached too)
+            or NOT_CACHEABLE to return a result without caching it
+        timeout (int, optional): Seconds the value stays fresh. Defaults to settings.CACHE_TTL.
+        
+    Returns:
+        Any: The cached or newly computed value
+    """
+    timeout = timeout or DEFAULT_CACHE_TIMEOUT
+    entry = cache.get(key)
+    if not isinstance(entry, _Envelope):
+        entry = None
+    
+    now = time.time()
+    if entry is not None and now < entry.expires_at:
+        # Probabilistic early refresh (XFetch): the closer to expiry and the
+        # slower the value is to build, the likelier a caller refreshes it now
+        if EARLY_REFRESH_BETA <= 0 or \
+                now - entry.compute_time * EARLY_REFRESH_BETA * math.log(1.0 - random.random()) < entry.expires_at:
+            _count('hits')
+            return entry.value
+        _count('early_refreshes')
+    else:
+        _count('misses')
+    
+    lock_key = f"lock:{key}"
+    token = f"{time.monotonic_ns()}:{random.random()}"
+    if cache.add(lock_key, token, timeout=RECOMPUTE_LOCK_TIMEOUT):
+        try:
+            return _recompute(key, compute, timeout)
+        finally:
+            if cache.get(lock_key) == token:
+                cache.delete(lock_key)
+    
+    # Someone else is recomputing
+    if entry is not None:
+        _count('stale_served')
+        return entry.value
+    
+    _count('lock_waits')
+    deadline = time.monotonic() + RECOMPUTE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(RECOMPUTE_POLL_INTERVAL)
+        entry = cache.get(key)
+        if isinstance(entry, _Envelope):
+            return entry.value
+        if cache.get(lock_key) is None:
+            break
+    
+    # The holder failed or is too slow; compute without the lock
+    _count('lock_wait_timeouts')
+    return _recompute(key, compute, timeout)
+
+
+def cache_result(timeout=None, depends_on=None):
     """
     Decorator to cache function results.
     
     Args:
         timeout (int, optional): Cache timeout in seconds. Defaults to settings.CACHE_TTL.
+        depends_on (optional): Dependencies whose changes invalidate the result,
+            or a callable taking the function's arguments and returning them
         
     Returns:
         callable: Decorated function
@@ -56,17 +360,9 @@ def cache_result(timeout=None):
                 args,
                 kwargs
             )
+            cache_key = versioned_key(cache_key, _resolve_dependencies(depends_on, args, kwargs))
             
-            # Try to get cached result
-            result = cache.get(cache_key)
-            
-            # If not cached, call the function and cache the result
-            if result is None:
-                result = func(*args, **kwargs)
-                cache_timeout = timeout or DEFAULT_CACHE_TIMEOUT
-                cache.set(cache_key, result, timeout=cache_timeout)
-                
-            return result
+            return get_or_compute(cache_key, lambda: func(*args, **kwargs), timeout)
         return wrapper
     return decorator
 
@@ -75,22 +371,16 @@ def invalidate_cache_for_model(model_name, instance_id=None):
     Invalidate cache for a specific model or instance.
     
     Args:
-        model_name (str): The model name to invalidate cache for
+        model_name (str): The model label or name to invalidate cache for
         instance_id (int, optional): Specific instance ID to invalidate
         
     Returns:
         bool: True if cache was invalidated, False otherwise
     """
-    if instance_id:
-        # Invalidate for specific instance
-        cache_key_pattern = f"*:{model_name}:*:{instance_id}:*"
-        return cache.delete_pattern(cache_key_pattern)
-    else:
-        # Invalidate for all instances of this model
-        cache_key_pattern = f"*:{model_name}:*"
-        return cache.delete_pattern(cache_key_pattern)
+    bump_version(model_name, instance_id)
+    return True
 
-def get_or_set_cache(key, getter_func, timeout=None):
+def get_or_set_cache(key, getter_func, timeout=None, depends_on=None):
     """
     Get a value from cache or set it if it doesn't exist.
     
@@ -98,18 +388,13 @@ def get_or_set_cache(key, getter_func, timeout=None):
         key (str): Cache key
         getter_func (callable): Function to call if cache misses
         timeout (int, optional): Cache timeout in seconds
+        depends_on (optional): Dependencies whose changes invalidate the value
         
     Returns:
         Any: The cached or newly retrieved value
     """
-    result = cache.get(key)
-    
-    if result is None:
-        result = getter_func()
-        cache_timeout = timeout or DEFAULT_CACHE_TIMEOUT
-        cache.set(key, result, timeout=cache_timeout)
-        
-    return result
+    key = versioned_key(key, _resolve_dependencies(depends_on))
+    return get_or_compute(key, getter_func, timeout)
 
 def clear_cache():
     """
@@ -120,7 +405,7 @@ def clear_cache():
     """
     return cache.clear()
 
-def cache_queryset(queryset, prefix, timeout=None):
+def cache_queryset(queryset, prefix, timeout=None, depends_on=None):
     """
     Cache a Django queryset result.
     
@@ -128,6 +413,8 @@ def cache_queryset(queryset, prefix, timeout=None):
         queryset: Django queryset to cache
         prefix (str): A prefix for the cache key
         timeout (int, optional): Cache timeout in seconds
+        depends_on (optional): Extra dependencies (e.g. joined models); the
+            queryset's own model is always one
         
     Returns:
         list: The queryset results
@@ -135,14 +422,111 @@ def cache_queryset(queryset, prefix, timeout=None):
     # Create a key based on the query
     query_str = str(queryset.query)
     cache_key = generate_cache_key(f"qs:{prefix}", args=[query_str])
+    cache_key = versioned_key(cache_key, [queryset.model] + _resolve_dependencies(depends_on))
     
-    # Try to get from cache
-    result = cache.get(cache_key)
+    return get_or_compute(cache_key, lambda: list(queryset), timeout)
+
+
+_MISSING = object()
+
+_two_tier_caches = {}
+
+
+class TwoTierCache:
+    """
+    Bounded in-process LRU in front of the shared cache.
     
-    # If not in cache, execute the query and cache the result
-    if result is None:
-        result = list(queryset)
-        cache_timeout = timeout or DEFAULT_CACHE_TIMEOUT
-        cache.set(cache_key, result, timeout=cache_timeout)
+    Values are looked up locally first, then in Redis, then built with the
+    getter and written to both tiers. Values may be None. Local values are
+    shared between threads and requests, so callers must not mutate them.
     
-    return result
+    Args:
+        name (str): Namespace of the cache keys
+        depends_on (iterable): Model-level dependencies that invalidate every entry
+        max_size (int): Entries kept in the local tier
+        local_ttl (float): Seconds a local entry may live
+        timeout (int, optional): Redis timeout in seconds. Defaults to settings.CACHE_TTL.
+    """
+    
+    def __init__(self, name, depends_on, max_size=1000, local_ttl=60, timeout=None):
+        self.name = name
+        self.depends_on = list(depends_on)
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self.timeout = timeout or DEFAULT_CACHE_TIMEOUT
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+        self._versions = None
+        self._versions_checked_at = 0.0
+        self._versions_generation = -1
+        self.local_hits = 0
+        self.local_misses = 0
+        self.redis_hits = 0
+        self.redis_misses = 0
+        _two_tier_caches[name] = self
+    
+    def _current_versions(self):
+        now = time.monotonic()
+        if self._versions is None or self._versions_generation != _local_generation \
+                or now - self._versions_checked_at > TWO_TIER_VERSION_CHECK_INTERVAL:
+            generation = _local_generation
+            self._versions = ".".join(str(version) for version in get_versions(self.depends_on))
+            self._versions_checked_at = now
+            self._versions_generation = generation
+        return self._versions
+    
+    def get(self, key, getter):
+        """
+        Return the value for ``key``, building it with ``getter()`` on a miss in both tiers.
+        """
+        versions = self._current_versions()
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None and entry[1] == versions and entry[2] > now:
+                self._local.move_to_end(key)
+                self.local_hits += 1
+                return entry[0]
+        self.local_misses += 1
+        
+        shared_key = f"twotier:{self.name}:{key}:v{versions}"
+        if len(shared_key) > 250:
+            shared_key = f"twotier:{self.name}:{hashlib.md5(shared_key.encode()).hexdigest()}"
+        # Wrapped in a tuple so a cached None is told apart from a miss
+        wrapped = cache.get(shared_key)
+        if wrapped is not None:
+            self.redis_hits += 1
+            value = wrapped[0]
+        else:
+            self.redis_misses += 1
+            with use_primary():
+                value = getter()
+            cache.set(shared_key, (value,), timeout=self.timeout)
+        
+        with self._lock:
+            self._local[key] = (value, versions, now + self.local_ttl)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_size:
+                self._local.popitem(last=False)
+        return value
+    
+    def clear_local(self):
+        with self._lock:
+            self._local.clear()
+    
+    def stats(self):
+        """Hit/miss counters of each tier in this process"""
+        return {
+            'size': len(self._local),
+            'max_size': self.max_size,
+            'local_hits': self.local_hits,
+            'local_misses': self.local_misses,
+            'redis_hits': self.redis_hits,
+            'redis_misses': self.redis_misses,
+        }
+
+
+def two_tier_stats():
+    """Counters of every TwoTierCache in this process, by name"""
+    return {name: two_tier.stats() for name, two_tier in _two_tier_caches.items()}
@@ -0,0 +1,82 @@
+"""
+Denormalized ``customer_id`` on Service, Invoice, ServiceItem and ServiceHistory.
+
+Customer-scoped lists filter and order on the row's own ``customer_id``
+(composite index leading with it) instead of joining through the car, and
+the service for invoices and items. The value is a copy of the car owner:
+
+- ``save()`` of each model sets it from the car or service
+- ``Car.save()`` calls ``transfer_car`` when the car changes owner, which
+  moves every row of the car to the new customer
+- ``Service.save()`` moves its invoice and items when the service moves to
+  another customer's car
+
+Bulk ``update()`` calls on ``Car.customer`` bypass both; run
+``manage.py sync_customer_ids`` after them. The command also checks and
+repairs rows written by older code.
+"""
+from django.apps import apps
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+
+from .cache_utils import bump_version
+
+# Per model, the path to the customer the row belongs to
+CUSTOMER_SOURCES = {
+    'core.Service': 'car__customer_id',
+    'core.Invoice': 'service__car__customer_id',
+    'core.ServiceItem': 'service__car__customer_id',
+    'core.ServiceHistory': 'car__customer_id',
+}
+
+# Per model, the path to the car, for ownership transfers
+CAR_PATHS = {
+    'core.Service': 'car_id',
+    'core.Invoice': 'service__car_id',
+    'core.ServiceItem': 'service__car_id',
+    'core.ServiceHistory': 'car_id',
+}
+
+BATCH_SIZE = 1000
+
+
+def mismatched(label):
+    """Rows of ``label`` whose customer_id is missing or differs from the car owner"""
+    source = CUSTOMER_SOURCES[label]
+    return apps.get_model(label).objects.filter(Q(customer_id__isnull=True) | ~Q(customer_id=F(source)))
+
+
+def sync_customer_ids(label, batch_size=BATCH_SIZE):
+    """
+    Copy the car owner into customer_id wherever it differs, in batches.
+
+    Returns:
+        int: Rows updated
+    """
+    model = apps.get_model(label)
+    owner = Subquery(model.objects.filter(pk=OuterRef('pk')).values(CUSTOMER_SOURCES[label])[:1])
+    updated = 0
+    last_pk = 0
+    while True:
+        ids = list(mismatched(label).filter(pk__gt=last_pk).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            break
+        updated += model.objects.filter(pk__in=ids).update(customer_id=owner)
+        last_pk = ids[-1]
+    if updated:
+        bump_version(model)
+    return updated
+
+
+def transfer_car(car_id, customer_id):
+    """Move every row of a car to its new owner"""
+    labels = []
+    for label, car_path in CAR_PATHS.items():
+        model = apps.get_model(label)
+        if model.objects.filter(**{car_path: car_id}).exclude(customer_id=customer_id).update(customer_id=customer_id):
+            labels.append(label)
+
+    def bump():
+        for label in labels:
+            bump_version(label)
+    transaction.on_commit(bump)
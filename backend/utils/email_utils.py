@@ -1,12 +1,52 @@
+import logging
+import re
+import time
+from functools import lru_cache
 from django.conf import settings
 from django.utils.translation import gettext_lazy as _
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template import engines
+from django.template.loader import get_template
 from django.utils.html import strip_tags
 
-def send_email_notification(recipient_email, subject, template_name, context, attachment=None):
+logger = logging.getLogger(__name__)
+
+# Messages handed to the SMTP connection per send_messages() call
+EMAIL_BATCH_SIZE = getattr(settings, 'EMAIL_BATCH_SIZE', 100)
+
+
+@lru_cache(maxsize=None)
+def get_email_templates(template_name):
     """
-    Send an email notification using a template.
+    Load and compile an email template and its plain-text counterpart once per process.
+    
+    The plain-text template is derived from the HTML source (head and tags
+    stripped) when it is first loaded, so each message only renders it instead
+    of running strip_tags over the rendered HTML.
+    
+    Args:
+        template_name (str): The name of the HTML template
+        
+    Returns:
+        tuple: (html template, text template)
+    """
+    html_template = get_template(template_name)
+    
+    source = html_template.template.source
+    source = re.sub(r'<head.*?</head>', '', source, flags=re.S | re.I)
+    text_source = strip_tags(source)
+    text_source = '\n'.join(line.strip() for line in text_source.splitlines())
+    text_source = re.sub(r'\n{3,}', '\n\n', text_source).strip()
+    text_template = engines['django'].from_string(
+        '{% autoescape off %}' + text_source + '{% endautoescape %}'
+    )
+    
+    return html_template, text_template
+
+
+def build_email_message(recipient_email, subject, template_name, context, attachment=None, connection=None):
+    """
+    Render a templated email without sending it.
     
     Args:
         recipient_email (str): The email address of the recipient
@@ -14,19 +54,24 @@ def send_email_notification(recipient_email, subject, template_name, context, at
         template_name (str): The name of the HTML template to use
         context (dict): The context to render the template with
         attachment (tuple, optional): A tuple of (filename, content, mimetype)
+        connection (optional): Email backend connection to send through
+        
+    Returns:
+        EmailMultiAlternatives: The message, ready to send
     """
-    # Render HTML content
-    html_content = render_to_string(template_name, context)
+    html_template, text_template = get_email_templates(template_name)
     
-    # Create plain text version
-    text_content = strip_tags(html_content)
+    # Render HTML content and the precomputed plain text version
+    html_content = html_template.render(context)
+    text_content = text_template.render(context)
     
     # Create email
     email = EmailMultiAlternatives(
         subject,
         text_content,
         settings.DEFAULT_FROM_EMAIL,
-        [recipient_email]
+        [recipient_email],
+        connection=connection
     )
     
     # Attach HTML content
@@ -37,18 +82,107 @@ def send_email_notification(recipient_email, subject, template_name, context, at
         filename, content, mimetype = attachment
         email.attach(filename, content, mimetype)
     
+    return email
+
+
+def send_email_notification(recipient_email, subject, template_name, context, attachment=None, connection=None):
+    """
+    Send an email notification using a template.
+    
+    Args:
+        recipient_email (str): The email address of the recipient
+        subject (str): The email subject
+        template_name (str): The name of the HTML template to use
+        context (dict): The context to render the template with
+        attachment (tuple, optional): A tuple of (filename, content, mimetype)
+        connection (optional): Open email backend connection to reuse
+    """
+    email = build_email_message(recipient_email, subject, template_name, context, attachment, connection)
+    
     # Send email
     email.send()
     
     return True
 
 
-def send_service_completed_notification(service):
+def send_bulk_emails(messages, batch_size=None):
+    """
+    Send many emails over a single SMTP connection.
+    
+    Messages are handed to the backend in chunks with send_messages(), so the
+    connection (and TLS handshake) is set up once instead of once per email.
+    A failed chunk is counted as failed and the connection is reopened.
+    
+    Args:
+        messages (iterable): EmailMessage objects, e.g. from build_email_message()
+        batch_size (int, optional): Messages per send_messages() call
+        
+    Returns:
+        dict: Number of messages sent and failed, elapsed seconds and throughput
+    """
+    batch_size = batch_size or EMAIL_BATCH_SIZE
+    messages = list(messages)
+    sent = 0
+    failed = 0
+    started = time.monotonic()
+    
+    connection = get_connection()
+    try:
+        for i in range(0, len(messages), batch_size):
+            batch = messages[i:i + batch_size]
+            try:
+                connection.open()
+                sent += connection.send_messages(batch) or 0
+            except Exception as e:
+                failed += len(batch)
+                logger.error(f"Failed to send email batch of {len(batch)}: {str(e)}")
+                connection.close()
+    finally:
+        connection.close()
+    
+    elapsed = time.monotonic() - started
+    logger.info(f"Bulk email: {sent} sent, {failed} failed in {elapsed:.2f}s")
+    
+    return {
+        'sent': sent,
+        'failed': failed,
+        'elapsed': elapsed,
+        'per_second': sent / elapsed if elapsed else 0.0,
+    }
+
+
+def get_invoice_pdf_attachment(invoice):
+    """
+    Build the PDF attachment for an invoice, generating the PDF if it is missing or stale
+    
+    Args:
+        invoice (Invoice): The invoice
+        
+    Returns:
+        tuple: (filename, content, mimetype), or None if no PDF is available
+    """
+    from .pdf_utils import ensure_invoice_pdf
+    
+    name, _etag = ensure_invoice_pdf(invoice)
+    if not name:
+        return None
+    
+    with invoice.pdf_file.open("rb") as f:
+        content = f.read()
+    return (
+        f"invoice_{invoice.invoice_number}.pdf", 
+        content, 
+        "application/pdf"
+    )
+
+
+def send_service_completed_notification(service, connection=None):
     """
     Send a notification when a service is completed
     
     Args:
         service (Service): The completed service
+        connection (optional): Open email backend connection to reuse
     """
     customer = service.car.customer
     user = customer.user
@@ -65,30 +199,23 @@ def send_service_completed_notification(service):
         "car": service.car,
     }
     
-    # If there's an invoice with a PDF, attach it
+    # If there's an invoice, attach its PDF
     attachment = None
     try:
-        invoice = service.invoice
-        if invoice and invoice.pdf_file:
-            with open(invoice.pdf_file.path, "rb") as f:
-                content = f.read()
-                attachment = (
-                    f"invoice_{invoice.invoice_number}.pdf", 
-                    content, 
-                    "application/pdf"
-                )
+        attachment = get_invoice_pdf_attachment(service.invoice)
     except:
         pass
     
-    return send_email_notification(user.email, subject, template_name, context, attachment)
+    return send_email_notification(user.email, subject, template_name, context, attachment, connection)
 
 
-def send_invoice_notification(invoice):
+def send_invoice_notification(invoice, connection=None):
     """
     Send a notification when an invoice is created
     
     Args:
         invoice (Invoice): The invoice
+        connection (optional): Open email backend connection to reuse
     """
     service = invoice.service
     customer = service.car.customer
@@ -107,15 +234,7 @@ def send_invoice_notification(invoice):
         "car": service.car,
     }
     
-    # Attach the PDF if it exists
-    attachment = None
-    if invoice.pdf_file:
-        with open(invoice.pdf_file.path, "rb") as f:
-            content = f.read()
-            attachment = (
-                f"invoice_{invoice.invoice_number}.pdf", 
-                content, 
-                "application/pdf"
-            )
-    
-    return send_email_notification(user.email, subject, template_name, context, attachment)
+    # Attach the up-to-date PDF
+    attachment = get_invoice_pdf_attachment(invoice)
+    
+    return send_email_notification(user.email, subject, template_name, context, attachment, connection)
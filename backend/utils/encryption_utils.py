@@ -1,21 +1,42 @@
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
+from functools import lru_cache
 import base64
 import os
 import hashlib
+import logging
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import models
+from django.dispatch import receiver
 
-def get_encryption_key():
+logger = logging.getLogger(__name__)
+
+# Values written by encrypt_data are "v<key version>:<Fernet token>". Values
+# without the prefix were written before key versioning and use version 1.
+VERSION_PREFIX = 'v'
+VERSION_SEPARATOR = ':'
+LEGACY_KEY_VERSION = 1
+
+# Every Fernet token starts with the version byte 0x80, i.e. "gAAAAA" in base64
+FERNET_TOKEN_START = 'gAAAAA'
+
+
+def _key_material():
+    """Key material by version, and the version used to encrypt new values"""
+    keys = getattr(settings, 'ENCRYPTION_KEYS', None) or {
+        LEGACY_KEY_VERSION: os.environ.get('ENCRYPTION_KEY', settings.SECRET_KEY)
+    }
+    current = getattr(settings, 'ENCRYPTION_KEY_VERSION', None) or max(keys)
+    return keys, current
+
+
+@lru_cache(maxsize=None)
+def _derive_key(key_material):
     """
-    Get or generate an encryption key using the SECRET_KEY or ENCRYPTION_KEY environment variable.
-    The key is derived using PBKDF2 with SHA-256 to ensure it's suitable for Fernet.
+    Derive a Fernet key from key material with PBKDF2-HMAC-SHA256.
     
-    Returns:
-        bytes: An URL-safe base64-encoded 32-byte key
+    Deliberately slow (100,000 iterations), so it runs once per key and process.
     """
-    # Get the key from environment or use settings.SECRET_KEY
-    key_material = os.environ.get('ENCRYPTION_KEY', settings.SECRET_KEY)
-    
-    # Use PBKDF2 to derive a secure key
     # The salt should ideally be stored securely and consistently
     salt = b'ecar_encryption_salt'  # In production, this should be a securely stored value
     
@@ -25,6 +46,79 @@ def get_encryption_key():
     # Encode to URL-safe base64 format as required by Fernet
     return base64.urlsafe_b64encode(key)
 
+
+@lru_cache(maxsize=None)
+def _fernets():
+    """
+    Fernet instances of this process.
+    
+    Returns:
+        tuple: (current key version, {version: Fernet}, MultiFernet over all
+        keys with the current one first)
+    """
+    keys, current = _key_material()
+    if current not in keys:
+        raise ValueError(f"ENCRYPTION_KEY_VERSION {current} has no key in ENCRYPTION_KEYS")
+    by_version = {version: Fernet(_derive_key(material)) for version, material in keys.items()}
+    ordered = [by_version[current]] + [f for version, f in by_version.items() if version != current]
+    return current, by_version, MultiFernet(ordered)
+
+
+@receiver(setting_changed)
+def _clear_key_cache(setting, **kwargs):
+    if setting in ('ENCRYPTION_KEYS', 'ENCRYPTION_KEY_VERSION', 'SECRET_KEY'):
+        _fernets.cache_clear()
+
+
+def get_encryption_key():
+    """
+    Get the current encryption key, derived from ENCRYPTION_KEYS (by default the
+    ENCRYPTION_KEY environment variable or SECRET_KEY).
+    The key is derived using PBKDF2 with SHA-256 to ensure it's suitable for Fernet.
+    
+    Returns:
+        bytes: An URL-safe base64-encoded 32-byte key
+    """
+    keys, current = _key_material()
+    return _derive_key(keys[current])
+
+
+def _encrypt(fernet, version, data):
+    return f"{VERSION_PREFIX}{version}{VERSION_SEPARATOR}{fernet.encrypt(data.encode()).decode()}"
+
+
+def _decrypt(encrypted_data):
+    """
+    Decrypt one value, raising InvalidToken if no configured key can.
+    
+    Values with neither a version prefix nor a Fernet token are returned
+    unchanged: they are plain text stored before the field was encrypted.
+    """
+    _, by_version, multi = _fernets()
+    head, separator, token = encrypted_data.partition(VERSION_SEPARATOR)
+    if separator and head[:1] == VERSION_PREFIX and head[1:].isdigit():
+        fernet = by_version.get(int(head[1:]))
+        if fernet is None:
+            raise InvalidToken(f"No key configured for version {head[1:]}")
+        return fernet.decrypt(token.encode()).decode()
+    if encrypted_data.startswith(FERNET_TOKEN_START):
+        return multi.decrypt(encrypted_data.encode()).decode()
+    return encrypted_data
+
+
+def key_version(encrypted_data):
+    """
+    Key version a value was encrypted with (1 for values without a prefix), or
+    None if it is not encrypted. Used to find values to re-encrypt after a rotation.
+    """
+    head, separator, _ = (encrypted_data or '').partition(VERSION_SEPARATOR)
+    if separator and head[:1] == VERSION_PREFIX and head[1:].isdigit():
+        return int(head[1:])
+    if (encrypted_data or '').startswith(FERNET_TOKEN_START):
+        return LEGACY_KEY_VERSION
+    return None
+
+
 def encrypt_data(data):
     """
     Encrypt sensitive data using AES-256 encryption (via Fernet).
@@ -33,17 +127,13 @@ def encrypt_data(data):
         data (str): Plain text data to encrypt
         
     Returns:
-        str: Encrypted data as a string
+        str: Encrypted data as a string, prefixed with the key version
     """
     if not data:
         return None
         
-    # Initialize Fernet with our key
-    f = Fernet(get_encryption_key())
-    
-    # Encrypt the data and return as a string
-    encrypted_data = f.encrypt(data.encode())
-    return encrypted_data.decode()
+    current, by_version, _ = _fernets()
+    return _encrypt(by_version[current], current, data)
 
 def decrypt_data(encrypted_data):
     """
@@ -58,18 +148,39 @@ def decrypt_data(encrypted_data):
     if not encrypted_data:
         return None
         
-    # Initialize Fernet with our key
-    f = Fernet(get_encryption_key())
-    
-    # Decrypt the data
     try:
-        decrypted_data = f.decrypt(encrypted_data.encode())
-        return decrypted_data.decode()
+        return _decrypt(encrypted_data)
     except Exception as e:
         # Log the error, but don't expose details in the return value
-        print(f"Error decrypting data: {str(e)}")
+        logger.warning(f"Error decrypting data: {str(e)}")
         return None
 
+def encrypt_many(values):
+    """
+    Encrypt a sequence of values with the current key.
+    
+    Args:
+        values (iterable): Plain text values; empty values stay None
+        
+    Returns:
+        list: Encrypted values, in order
+    """
+    current, by_version, _ = _fernets()
+    fernet = by_version[current]
+    return [_encrypt(fernet, current, value) if value else None for value in values]
+
+def decrypt_many(encrypted_values):
+    """
+    Decrypt a sequence of values, e.g. a column of a page of rows.
+    
+    Args:
+        encrypted_values (iterable): Values written by encrypt_data or encrypt_many
+        
+    Returns:
+        list: Plain text values, in order; None where decryption failed
+    """
+    return [decrypt_data(value) for value in encrypted_values]
+
 def encrypt_model_field(model_instance, field_name, value):
     """
     Encrypt a value and store it in a model field prefixed with '_encrypted_'.
@@ -133,3 +244,26 @@ class EncryptedModelFieldMixin:
     def set_encrypted_field(self, field_name, value):
         """Set and encrypt a value in the corresponding encrypted field"""
         encrypt_model_field(self, field_name, value)
+
+
+class EncryptedTextField(models.TextField):
+    """
+    TextField stored encrypted with encrypt_data and read back as plain text.
+    
+    Encryption is randomized, so the column can only be filtered on NULL.
+    Rows written before the field was encrypted are read as plain text and
+    encrypted on their next save. A value no configured key can decrypt
+    raises InvalidToken instead of being read as None, so it is never
+    silently overwritten.
+    """
+    
+    def from_db_value(self, value, expression, connection):
+        if value is None or value == '':
+            return value
+        return _decrypt(value)
+    
+    def get_prep_value(self, value):
+        value = super().get_prep_value(value)
+        if value is None or value == '':
+            return value
+        return encrypt_data(value)
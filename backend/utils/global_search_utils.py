@@ -0,0 +1,254 @@
+"""
+One search box over customers, cars, services and invoices.
+
+``global_search(text)`` runs one search per entity in a thread pool, each
+on its own indexed path:
+
+- customer: phone prefix or user name (utils.search_utils, staff only)
+- car: normalized plate / VIN key, exact then prefix then suffix
+  (utils.vehicle_lookup_utils)
+- service: full-text search on title, description and notes, or plate
+- invoice: exact invoice number (unique index), then full-text search
+
+Each search returns at most ``limit`` hits scored in [0, 1]: exact
+identifier matches score 1, full-text hits score rank / (rank + 1). The hits
+are merged with a bounded heap into the ``limit`` best.
+
+Timing: the whole search has GLOBAL_SEARCH_BUDGET_MS, and each entity
+search GLOBAL_SEARCH_ENTITY_TIMEOUT_MS. On PostgreSQL the entity timeout is
+also set as ``statement_timeout`` (SET LOCAL, so it is safe behind
+PgBouncer), which cancels the slow query instead of leaving it running. An
+entity that misses its deadline is left out and reported in ``timed_out``;
+the other entities are still returned.
+"""
+import contextvars
+import heapq
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import OperationalError, close_old_connections, connections, transaction
+
+from .replica_utils import current_read_alias
+from .search_utils import search_customers, search_invoices, search_services
+from .vehicle_lookup_utils import lookup_car_ids
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_SEARCH_BUDGET_MS = getattr(settings, 'GLOBAL_SEARCH_BUDGET_MS', 500)
+GLOBAL_SEARCH_ENTITY_TIMEOUT_MS = getattr(settings, 'GLOBAL_SEARCH_ENTITY_TIMEOUT_MS', 300)
+GLOBAL_SEARCH_WORKERS = getattr(settings, 'GLOBAL_SEARCH_WORKERS', 8)
+GLOBAL_SEARCH_MAX_RESULTS = getattr(settings, 'GLOBAL_SEARCH_MAX_RESULTS', 20)
+
+MIN_QUERY_LENGTH = 2
+
+# Scores of identifier matches; full-text scores stay below 1
+EXACT_SCORE = 1.0
+PREFIX_SCORE = 0.8
+SUFFIX_SCORE = 0.6
+# Without full-text ranking (SQLite), by position
+UNRANKED_SCORE = 0.5
+
+# SQLSTATE of a query cancelled by statement_timeout
+QUERY_CANCELED = '57014'
+
+
+def _ranked_score(row, position):
+    rank = row.get('search_rank')
+    if rank is None:
+        return UNRANKED_SCORE / (1 + position)
+    return rank / (1 + rank)
+
+
+def _hit(entity, pk, score, title, subtitle):
+    return {'type': entity, 'id': pk, 'score': round(score, 4), 'title': title, 'subtitle': subtitle}
+
+
+def _search_customers(text, customer_id, limit):
+    from core.models import Customer
+
+    if customer_id is not None:
+        # Customers only find themselves, which is not a search
+        return []
+    queryset = search_customers(Customer.objects.all(), text)
+    fields = ['id', 'phone', 'user__first_name', 'user__last_name']
+    if 'search_rank' in queryset.query.annotations:
+        fields.append('search_rank')
+    return [
+        _hit('customer', row['id'],
+             EXACT_SCORE if row['phone'] == text else _ranked_score(row, position),
+             f"{row['user__first_name']} {row['user__last_name']}".strip(), row['phone'])
+        for position, row in enumerate(queryset.values(*fields)[:limit])
+    ]
+
+
+def _search_cars(text, customer_id, limit):
+    from core.models import Car
+
+    queryset = Car.objects.all()
+    if customer_id is not None:
+        queryset = queryset.filter(customer_id=customer_id)
+
+    scores = {}
+    for match, score in (('exact', EXACT_SCORE), ('prefix', PREFIX_SCORE), ('suffix', SUFFIX_SCORE)):
+        if len(scores) >= limit:
+            break
+        for pk in lookup_car_ids(text, match=match, queryset=queryset, limit=limit):
+            scores.setdefault(pk, score)
+    if not scores:
+        return []
+    rows = Car.objects.filter(pk__in=list(scores)[:limit]).values('id', 'license_plate', 'make', 'model', 'year')
+    return [
+        _hit('car', row['id'], scores[row['id']], row['license_plate'],
+             f"{row['make']} {row['model']} {row['year']}")
+        for row in rows
+    ]
+
+
+def _search_services(text, customer_id, limit):
+    from core.models import Service
+
+    queryset = Service.objects.all()
+    if customer_id is not None:
+        queryset = queryset.filter(customer_id=customer_id)
+    queryset = search_services(queryset, text)
+    fields = ['id', 'title', 'status', 'car__license_plate']
+    if 'search_rank' in queryset.query.annotations:
+        fields.append('search_rank')
+    return [
+        _hit('service', row['id'], _ranked_score(row, position), row['title'],
+             f"{row['car__license_plate']} - {row['status']}")
+        for position, row in enumerate(queryset.values(*fields)[:limit])
+    ]
+
+
+def _search_invoices(text, customer_id, limit):
+    from core.models import Invoice
+
+    queryset = Invoice.objects.all()
+    if customer_id is not None:
+        queryset = queryset.filter(customer_id=customer_id)
+    fields = ['id', 'invoice_number', 'status', 'service__title']
+
+    # Invoice numbers are stored upper case; the unique index answers this
+    hits = {
+        row['id']: _hit('invoice', row['id'], EXACT_SCORE, row['invoice_number'], row['service__title'])
+        for row in queryset.filter(invoice_number=text.upper()).values(*fields)
+    }
+    ranked = search_invoices(queryset, text)
+    if 'search_rank' in ranked.query.annotations:
+        fields.append('search_rank')
+    for position, row in enumerate(ranked.values(*fields)[:limit]):
+        hits.setdefault(row['id'], _hit('invoice', row['id'], _ranked_score(row, position),
+                                        row['invoice_number'], row['service__title']))
+    return list(hits.values())
+
+
+ENTITY_SEARCHES = {
+    'customer': _search_customers,
+    'car': _search_cars,
+    'service': _search_services,
+    'invoice': _search_invoices,
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=GLOBAL_SEARCH_WORKERS,
+                                               thread_name_prefix='global-search')
+    return _executor
+
+
+def _run_entity_search(search, text, customer_id, limit, timeout_ms):
+    # Runs in a pool thread, with its own database connection, on the replica
+    # of the caller's scope (see utils.replica_utils)
+    close_old_connections()
+    using = current_read_alias()
+    try:
+        with transaction.atomic(using=using):
+            if connections[using].vendor == 'postgresql':
+                with connections[using].cursor() as cursor:
+                    cursor.execute("SET LOCAL statement_timeout = %s", [int(timeout_ms)])
+            return search(text, customer_id, limit)
+    finally:
+        close_old_connections()
+
+
+def merge_top_hits(hit_lists, limit):
+    """The ``limit`` best-scored hits of all lists, best first"""
+    return heapq.nlargest(
+        limit,
+        (hit for hits in hit_lists for hit in hits),
+        key=lambda hit: hit['score'],
+    )
+
+
+def global_search(text, customer_id=None, entities=None, limit=None):
+    """
+    Search every entity for ``text`` in parallel, within the latency budget.
+
+    Args:
+        text (str): What the user typed: a name, phone, plate, title or invoice number
+        customer_id (int, optional): Restrict to this customer's records
+            (non-staff users). Customers themselves are then not searched.
+        entities (iterable, optional): Subset of ENTITY_SEARCHES. Defaults to all.
+        limit (int, optional): Maximum hits. Defaults to GLOBAL_SEARCH_MAX_RESULTS.
+
+    Returns:
+        dict: ``results`` (typed hits, best first), ``timed_out`` and
+        ``failed`` (entities left out) and ``took_ms``
+
+    Raises:
+        ValueError: If an entity is unknown
+    """
+    text = ' '.join(text.split())
+    limit = min(limit or GLOBAL_SEARCH_MAX_RESULTS, GLOBAL_SEARCH_MAX_RESULTS)
+    entities = list(entities or ENTITY_SEARCHES)
+    unknown = set(entities) - set(ENTITY_SEARCHES)
+    if unknown:
+        raise ValueError(f"Unknown search type: {', '.join(sorted(unknown))}")
+
+    started = time.monotonic()
+    response = {'results': [], 'timed_out': [], 'failed': [], 'took_ms': 0}
+    if len(text) < MIN_QUERY_LENGTH:
+        return response
+
+    executor = _get_executor()
+    futures = {
+        entity: executor.submit(contextvars.copy_context().run, _run_entity_search, ENTITY_SEARCHES[entity],
+                                text, customer_id, limit, GLOBAL_SEARCH_ENTITY_TIMEOUT_MS)
+        for entity in entities
+    }
+
+    budget_deadline = started + GLOBAL_SEARCH_BUDGET_MS / 1000
+    entity_deadline = started + GLOBAL_SEARCH_ENTITY_TIMEOUT_MS / 1000
+    hit_lists = []
+    for entity, future in futures.items():
+        remaining = min(budget_deadline, entity_deadline) - time.monotonic()
+        try:
+            hit_lists.append(future.result(timeout=max(remaining, 0)))
+        except FutureTimeoutError:
+            # Drops it if still queued; a running query is cancelled by statement_timeout
+            future.cancel()
+            response['timed_out'].append(entity)
+        except OperationalError as e:
+            if getattr(e.__cause__, 'pgcode', None) == QUERY_CANCELED:
+                response['timed_out'].append(entity)
+            else:
+                logger.warning(f"Global search on {entity} failed: {str(e)}")
+                response['failed'].append(entity)
+        except Exception as e:
+            logger.warning(f"Global search on {entity} failed: {str(e)}")
+            response['failed'].append(entity)
+
+    response['results'] = merge_top_hits(hit_lists, limit)
+    response['took_ms'] = round((time.monotonic() - started) * 1000)
+    return response
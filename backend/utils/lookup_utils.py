@@ -0,0 +1,105 @@
+"""
+Hot lookups served from the two-tier cache (see utils.cache_utils.TwoTierCache).
+
+These are read on nearly every request: the customer owning a user account
+(for queryset scoping), the current state of a user account (for revoking JWT
+identities, see api.authentication) and the service intervals applicable to a
+car make and model (for service predictions). Repeated lookups in a worker are answered
+from process memory.
+"""
+from django.conf import settings
+from django.db.models import Q, Case, When, IntegerField
+
+from .cache_utils import TwoTierCache
+
+customer_ids = TwoTierCache(
+    'customer_by_user',
+    depends_on=['core.Customer'],
+    max_size=getattr(settings, 'CUSTOMER_LOOKUP_CACHE_SIZE', 10000),
+    local_ttl=300,
+)
+
+# Short-lived: bounds how long a deactivated account keeps using its tokens
+# when a version bump from another worker is missed
+user_identities = TwoTierCache(
+    'user_identity',
+    depends_on=['auth.User', 'core.Customer'],
+    max_size=getattr(settings, 'CUSTOMER_LOOKUP_CACHE_SIZE', 10000),
+    local_ttl=getattr(settings, 'IDENTITY_CACHE_TTL', 30),
+    timeout=getattr(settings, 'IDENTITY_CACHE_TTL', 30),
+)
+
+service_intervals = TwoTierCache(
+    'service_intervals',
+    depends_on=['core.ServiceInterval'],
+    max_size=1000,
+    local_ttl=300,
+)
+
+
+def get_customer_id(user_id):
+    """
+    ID of the customer profile of a user account.
+
+    Returns:
+        int: Customer ID, or None if the user has no customer profile
+    """
+    from core.models import Customer
+
+    return customer_ids.get(
+        user_id,
+        lambda: Customer.objects.filter(user_id=user_id).values_list('id', flat=True).first(),
+    )
+
+
+def get_user_identity(user_id):
+    """
+    Current authorization state of a user account.
+
+    Returns:
+        dict: is_active, is_staff, is_superuser and customer_id, or None if
+        the user does not exist
+    """
+    from django.contrib.auth.models import User
+
+    def load():
+        row = User.objects.filter(pk=user_id).values(
+            'is_active', 'is_staff', 'is_superuser', 'customer__id'
+        ).first()
+        if row is None:
+            return None
+        row['customer_id'] = row.pop('customer__id')
+        return row
+
+    return user_identities.get(user_id, load)
+
+
+def get_applicable_service_intervals(make, model):
+    """
+    Active service intervals that apply to a car make and model, most specific
+    first: make and model, then make only, then global intervals.
+
+    Returns:
+        tuple: ServiceInterval instances (shared, do not modify)
+    """
+    from core.models import ServiceInterval
+
+    def load():
+        return tuple(
+            ServiceInterval.objects.filter(
+                Q(car_make=make, car_model=model) |
+                Q(car_make=make, car_model__isnull=True) |
+                Q(car_make__isnull=True, car_model__isnull=True),
+                is_active=True
+            ).order_by(
+                Case(
+                    When(car_make=make, car_model=model, then=0),
+                    When(car_make=make, car_model__isnull=True, then=1),
+                    default=2,
+                    output_field=IntegerField(),
+                ),
+                'id',
+            )
+        )
+
+    return service_intervals.get(f"{make}:{model}", load)
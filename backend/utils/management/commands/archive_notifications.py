@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from utils.notification_utils import (
+    archive_notifications, purge_archived_notifications, notification_table_stats
+)
+
+
+class Command(BaseCommand):
+    help = 'Archive old read notifications and report table size and throughput'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days',
+            type=int,
+            help='Archive read notifications older than this many days (default: NOTIFICATION_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            help='Rows moved per transaction (default: NOTIFICATION_ARCHIVE_BATCH_SIZE)'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0,
+            help='Seconds to sleep between batches'
+        )
+        parser.add_argument(
+            '--purge-days',
+            type=int,
+            help='Also delete archived notifications older than this many days (default: NOTIFICATION_ARCHIVE_RETENTION_DAYS)'
+        )
+        parser.add_argument(
+            '--report',
+            action='store_true',
+            help='Only report table sizes'
+        )
+
+    def _report(self, label):
+        self.stdout.write(label)
+        for table, stats in notification_table_stats().items():
+            size = f", {stats['size_bytes'] / 1024 / 1024:.1f} MB" if stats['size_bytes'] is not None else ''
+            self.stdout.write(f"  {table}: {stats['rows']} rows{size}")
+
+    def handle(self, *args, **options):
+        try:
+            self._report("Before:" if not options['report'] else "Notification tables:")
+            if options['report']:
+                return
+
+            result = archive_notifications(
+                older_than_days=options['days'],
+                batch_size=options['batch_size'],
+                pause=options['pause'],
+            )
+            self.stdout.write(self.style.SUCCESS(
+                f"Archived {result['archived']} notifications in {result['batches']} batches "
+                f"({result['elapsed']:.2f}s, {result['per_second']:.0f} rows/sec)"
+            ))
+
+            purged = purge_archived_notifications(
+                older_than_days=options['purge_days'],
+                batch_size=options['batch_size'],
+            )
+            if purged['deleted']:
+                self.stdout.write(self.style.SUCCESS(
+                    f"Purged {purged['deleted']} archived notifications "
+                    f"({purged['elapsed']:.2f}s, {purged['per_second']:.0f} rows/sec)"
+                ))
+
+            self._report("After:")
+        except Exception as e:
+            raise CommandError(f"Error archiving notifications: {str(e)}")
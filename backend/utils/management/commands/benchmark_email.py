@@ -0,0 +1,61 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from utils.email_utils import build_email_message, send_bulk_emails
+from utils.smtp_sink import SMTPSink
+
+
+class Command(BaseCommand):
+    help = 'Compare per-message and batched email throughput against a local SMTP sink'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Number of emails to send')
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages per send_messages() call')
+        parser.add_argument('--template', type=str, default='emails/service_completed.html', help='Email template to render')
+
+    def handle(self, *args, **options):
+        count = options['count']
+        context = {
+            'user': {'first_name': 'Client', 'last_name': 'ECAR'},
+            'car': {'make': 'Peugeot', 'model': '208', 'license_plate': '123TU4567'},
+            'service': {'title': 'Vidange'},
+        }
+
+        try:
+            with SMTPSink() as sink:
+                with override_settings(
+                    EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                    EMAIL_HOST='127.0.0.1',
+                    EMAIL_PORT=sink.port,
+                    EMAIL_USE_TLS=False,
+                    EMAIL_USE_SSL=False,
+                    EMAIL_HOST_USER='',
+                    EMAIL_HOST_PASSWORD='',
+                ):
+                    # One connection per email, as send_email_notification() does
+                    started = time.monotonic()
+                    for i in range(count):
+                        build_email_message(f"client{i}@example.tn", 'Benchmark', options['template'], context).send()
+                    single_elapsed = time.monotonic() - started
+                    single_connections = sink.connections
+
+                    # Rendering plus one shared connection
+                    started = time.monotonic()
+                    messages = [
+                        build_email_message(f"client{i}@example.tn", 'Benchmark', options['template'], context)
+                        for i in range(count)
+                    ]
+                    result = send_bulk_emails(messages, batch_size=options['batch_size'])
+                    batch_elapsed = time.monotonic() - started
+                    batch_connections = sink.connections - single_connections
+        except Exception as e:
+            raise CommandError(f"Error running email benchmark: {str(e)}")
+
+        self.stdout.write(
+            f"Per-message: {count} sent in {single_elapsed:.2f}s "
+            f"({count / single_elapsed:.1f} msgs/sec, {single_connections} connections)"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Batched:     {result['sent']} sent in {batch_elapsed:.2f}s "
+            f"({result['sent'] / batch_elapsed:.1f} msgs/sec, {batch_connections} connections)"
+        ))
@@ -0,0 +1,59 @@
+import time
+from cryptography.fernet import Fernet
+from django.core.management.base import BaseCommand, CommandError
+from utils import encryption_utils
+from utils.encryption_utils import decrypt_data, decrypt_many, encrypt_data, encrypt_many
+
+
+class Command(BaseCommand):
+    help = 'Measure field encryption throughput with per-call key derivation (as before) and with the cached keys'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100, help='Values per run (e.g. one page of rows)')
+        parser.add_argument('--legacy-count', type=int, default=20,
+                            help='Values for the per-call derivation run, which is much slower')
+
+    def _rate(self, label, count, func):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label}: {count} in {elapsed * 1000:.1f}ms ({count / elapsed:,.0f} ops/sec)")
+        return count / elapsed
+
+    def handle(self, *args, **options):
+        count = options['count']
+        legacy_count = options['legacy_count']
+        values = [f"{i} avenue Habib Bourguiba, 1001 Tunis" for i in range(count)]
+
+        try:
+            keys, current = encryption_utils._key_material()
+            material = keys[current]
+            derive = encryption_utils._derive_key.__wrapped__
+
+            def legacy_encrypt():
+                # What every call did before: derive the key, build a Fernet
+                return [Fernet(derive(material)).encrypt(value.encode()) for value in values[:legacy_count]]
+
+            legacy_tokens = legacy_encrypt()
+
+            def legacy_decrypt():
+                return [Fernet(derive(material)).decrypt(token) for token in legacy_tokens]
+
+            encrypt_data(values[0])  # derive the cached key outside the measurement
+            encrypted = encrypt_many(values)
+
+            self.stdout.write("Per-call key derivation:")
+            before_encrypt = self._rate("  encrypt", legacy_count, legacy_encrypt)
+            before_decrypt = self._rate("  decrypt", legacy_count, legacy_decrypt)
+
+            self.stdout.write("Cached keys:")
+            self._rate("  encrypt_data", count, lambda: [encrypt_data(value) for value in values])
+            after_decrypt = self._rate("  decrypt_data", count, lambda: [decrypt_data(value) for value in encrypted])
+            after_encrypt = self._rate("  encrypt_many", count, lambda: encrypt_many(values))
+            self._rate("  decrypt_many", count, lambda: decrypt_many(encrypted))
+        except Exception as e:
+            raise CommandError(f"Error running encryption benchmark: {str(e)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Encrypt {after_encrypt / before_encrypt:,.0f}x, decrypt {after_decrypt / before_decrypt:,.0f}x faster"
+        ))
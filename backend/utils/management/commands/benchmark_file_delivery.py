@@ -0,0 +1,73 @@
+import statistics
+import time
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from api.views import InvoiceViewSet
+from core.models import Invoice
+from utils.file_delivery import DJANGO, X_ACCEL
+
+
+class Command(BaseCommand):
+    help = 'Compare how long invoice downloads occupy a worker when streamed by Django and when handed to nginx'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--invoice', type=int, help='Invoice ID to download (default: the first invoice)')
+        parser.add_argument('--requests', type=int, default=50, help='Downloads per mode')
+        parser.add_argument(
+            '--client-kbps',
+            type=int,
+            default=2000,
+            help='Simulated client download speed in kB/s; a streaming worker is held until the client has read the file'
+        )
+
+    def handle(self, *args, **options):
+        invoice = Invoice.objects.filter(pk=options['invoice']).first() if options['invoice'] \
+            else Invoice.objects.order_by('id').first()
+        if invoice is None:
+            raise CommandError("No invoice to download")
+        user = User.objects.filter(is_staff=True, is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError("A staff user is required to download invoices")
+
+        view = InvoiceViewSet.as_view({'get': 'download'})
+        factory = APIRequestFactory()
+        bytes_per_second = options['client_kbps'] * 1024
+
+        def download():
+            request = factory.get(f'/api/invoices/{invoice.pk}/download/')
+            force_authenticate(request, user=user)
+            started = time.monotonic()
+            response = view(request, pk=invoice.pk)
+            if response.status_code != 200:
+                raise CommandError(f"Download failed with status {response.status_code}")
+            size = 0
+            if response.streaming:
+                # The worker writes each block to the socket at the client's pace
+                for chunk in response.streaming_content:
+                    size += len(chunk)
+                    time.sleep(len(chunk) / bytes_per_second)
+            response.close()
+            return time.monotonic() - started, size
+
+        results = {}
+        for mode in (DJANGO, X_ACCEL):
+            with override_settings(FILE_DELIVERY_MODE=mode):
+                download()  # Generate the PDF and warm up
+                timings = []
+                streamed = 0
+                for _ in range(options['requests']):
+                    elapsed, size = download()
+                    timings.append(elapsed)
+                    streamed += size
+            results[mode] = (timings, streamed)
+
+        for mode, (timings, streamed) in results.items():
+            mean = statistics.mean(timings)
+            p95 = sorted(timings)[int(len(timings) * 0.95) - 1] if len(timings) > 1 else timings[0]
+            line = (
+                f"{mode:8} occupancy mean {mean * 1000:.2f}ms, p95 {p95 * 1000:.2f}ms, "
+                f"{1 / mean:.0f} downloads/sec per worker, {streamed / len(timings):.0f} bytes through Python per download"
+            )
+            self.stdout.write(self.style.SUCCESS(line) if mode == X_ACCEL else line)
@@ -0,0 +1,51 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from utils.sms_client import SMSClient
+from utils.sms_fake_gateway import FakeSMSGateway
+
+
+class Command(BaseCommand):
+    help = 'Measure SMS client throughput against the local fake gateway'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=1000, help='Number of messages to send')
+        parser.add_argument('--concurrency', type=int, default=8, help='Concurrent connections')
+        parser.add_argument('--rate', type=float, default=0, help='Messages per second (0 = unlimited)')
+        parser.add_argument('--batch-size', type=int, default=0, help='Use the batch endpoint with this many messages per request')
+        parser.add_argument('--latency', type=float, default=0.02, help='Simulated gateway latency in seconds')
+        parser.add_argument('--failure-rate', type=float, default=0.0, help='Probability of a transient 503 per request')
+
+    def handle(self, *args, **options):
+        messages = [
+            (f"+2162{i:07d}", f"Rappel: votre véhicule est attendu pour son entretien ({i})")
+            for i in range(options['count'])
+        ]
+
+        try:
+            with FakeSMSGateway(latency=options['latency'], failure_rate=options['failure_rate']) as gateway:
+                client = SMSClient(
+                    api_key='benchmark',
+                    endpoint=gateway.url,
+                    batch_endpoint=gateway.batch_url if options['batch_size'] else None,
+                    batch_size=options['batch_size'] or 100,
+                    max_workers=options['concurrency'],
+                    rate_limit=options['rate'],
+                    backoff_base=0.05,
+                )
+
+                started = time.monotonic()
+                results = client.send_many(messages)
+                elapsed = time.monotonic() - started
+                client.close()
+        except Exception as e:
+            raise CommandError(f"Error running SMS benchmark: {str(e)}")
+
+        sent = sum(1 for result in results if result['status'] == 'success')
+        retries = sum(result['attempts'] - 1 for result in results)
+        mode = f"batch of {options['batch_size']}" if options['batch_size'] else 'single'
+
+        self.stdout.write(f"Mode: {mode}, concurrency {options['concurrency']}, gateway latency {options['latency'] * 1000:.0f}ms")
+        self.stdout.write(f"Gateway requests: {gateway.requests}, retries: {retries}")
+        self.stdout.write(self.style.SUCCESS(
+            f"{sent}/{len(messages)} sent in {elapsed:.2f}s ({len(messages) / elapsed:.1f} msgs/sec)"
+        ))
@@ -0,0 +1,60 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+from api.tokens import blacklist_jti
+
+
+class Command(BaseCommand):
+    help = ('Copy still-valid blacklisted refresh tokens from the legacy token_blacklist tables '
+            'to Redis, then delete expired (or, with --purge, all) rows')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows deleted per statement')
+        parser.add_argument('--purge', action='store_true',
+                            help='Delete every row once the blacklist is in Redis; the tables are no longer read')
+        parser.add_argument('--report', action='store_true', help='Only report row counts')
+
+    def _report(self, label):
+        self.stdout.write(
+            f"{label} {OutstandingToken.objects.count()} outstanding, "
+            f"{BlacklistedToken.objects.count()} blacklisted"
+        )
+
+    def _delete_in_batches(self, queryset, batch_size):
+        deleted = 0
+        while True:
+            ids = list(queryset.values_list('id', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            # Cascades to the BlacklistedToken rows
+            OutstandingToken.objects.filter(id__in=ids).delete()
+            deleted += len(ids)
+
+    def handle(self, *args, **options):
+        try:
+            self._report("Before:")
+            if options['report']:
+                return
+
+            started = time.monotonic()
+            now = aware_utcnow()
+
+            copied = 0
+            valid = BlacklistedToken.objects.filter(token__expires_at__gt=now) \
+                .values_list('token__jti', 'token__expires_at')
+            for jti, expires_at in valid.iterator(chunk_size=options['batch_size']):
+                blacklist_jti(jti, expires_at.timestamp())
+                copied += 1
+            self.stdout.write(f"Copied {copied} blacklisted tokens to Redis")
+
+            queryset = OutstandingToken.objects.order_by('id')
+            if not options['purge']:
+                queryset = queryset.filter(expires_at__lte=now)
+            deleted = self._delete_in_batches(queryset, options['batch_size'])
+
+            elapsed = time.monotonic() - started
+            self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} outstanding tokens in {elapsed:.2f}s"))
+            self._report("After:")
+        except Exception as e:
+            raise CommandError(f"Error compacting token tables: {str(e)}")
@@ -0,0 +1,50 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from utils.outbox import dispatch_all
+
+
+class Command(BaseCommand):
+    help = 'Deliver pending email/SMS notifications from the outbox'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=100,
+            help='Number of messages claimed per batch'
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll the outbox every --interval seconds'
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=5.0,
+            help='Seconds to sleep between polls when --loop is set'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        try:
+            while True:
+                started = time.monotonic()
+                totals = dispatch_all(batch_size=batch_size)
+                elapsed = time.monotonic() - started
+
+                if totals['batches'] or not options['loop']:
+                    self.stdout.write(self.style.SUCCESS(
+                        f"Outbox: {totals['sent']} sent, {totals['skipped']} skipped, "
+                        f"{totals['retried']} retried, {totals['failed']} failed "
+                        f"in {totals['batches']} batches ({elapsed:.2f}s)"
+                    ))
+
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            self.stdout.write("Outbox dispatcher stopped")
+        except Exception as e:
+            raise CommandError(f"Error dispatching outbox: {str(e)}")
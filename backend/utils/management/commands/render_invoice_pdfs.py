@@ -0,0 +1,75 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Invoice
+from utils.pdf_utils import generate_invoice_pdfs
+
+
+class Command(BaseCommand):
+    help = 'Render invoice PDFs in parallel and report pages/sec'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            type=str,
+            help='Render invoices issued in this month (YYYY-MM)'
+        )
+        parser.add_argument(
+            '--ids',
+            type=int,
+            nargs='+',
+            help='Render these invoice IDs'
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Render every invoice'
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Worker processes (default: number of CPUs)'
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            help='Invoices fetched per query'
+        )
+
+    def handle(self, *args, **options):
+        invoices = Invoice.objects.all()
+
+        if options['ids']:
+            invoices = invoices.filter(pk__in=options['ids'])
+        elif options['month']:
+            try:
+                start = datetime.datetime.strptime(options['month'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError("--month must be in YYYY-MM format")
+            end = (start + datetime.timedelta(days=32)).replace(day=1)
+            invoices = invoices.filter(issued_date__gte=start, issued_date__lt=end)
+        elif not options['all']:
+            raise CommandError("Specify --month, --ids or --all")
+
+        invoice_ids = list(invoices.order_by('id').values_list('id', flat=True))
+        if not invoice_ids:
+            self.stdout.write("No invoices to render")
+            return
+
+        self.stdout.write(f"Rendering {len(invoice_ids)} invoices...")
+        try:
+            result = generate_invoice_pdfs(
+                invoice_ids,
+                workers=options['workers'],
+                chunk_size=options['chunk_size'],
+            )
+        except Exception as e:
+            raise CommandError(f"Error rendering invoices: {str(e)}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {result['rendered']} invoices ({result['reused']} unchanged, {result['pages']} pages) in {result['elapsed']:.2f}s "
+            f"({result['pages_per_second']:.1f} pages/sec)"
+        ))
+        if result['skipped']:
+            self.stdout.write(f"{result['skipped']} invoices skipped: they have an uploaded PDF")
+        if result['failed']:
+            self.stdout.write(self.style.ERROR(f"{result['failed']} invoices failed, see the log for details"))
@@ -0,0 +1,133 @@
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Case, When, Value, CharField
+from core.models import Invoice
+from utils.pdf_utils import invoice_pdf_name, is_generated_pdf
+from utils.storage import add_reference, hash_file, is_sharded_name, sharded_name
+
+
+def _link_into_place(old_name, pdf_hash, generated):
+    """
+    Hard-link one flat file to its sharded name (runs in worker threads).
+
+    The old file is left in place until the database points at the new name.
+
+    Returns:
+        tuple: (old name, new name, sha256 or None for generated PDFs, size,
+        whether the content was already stored, error)
+    """
+    try:
+        old_path = os.path.join(settings.MEDIA_ROOT, old_name)
+        if generated:
+            new_name = invoice_pdf_name(pdf_hash)
+            sha256, size = None, os.path.getsize(old_path)
+        else:
+            sha256, size = hash_file(old_path)
+            extension = os.path.splitext(old_name)[1].lower()
+            new_name = sharded_name(os.path.dirname(old_name), sha256, extension)
+
+        new_path = os.path.join(settings.MEDIA_ROOT, new_name)
+        os.makedirs(os.path.dirname(new_path), exist_ok=True)
+        try:
+            os.link(old_path, new_path)
+            shared = False
+        except FileExistsError:
+            # Same content already stored (duplicate upload)
+            shared = True
+        return old_name, new_name, sha256, size, shared, None
+    except Exception as e:
+        return old_name, None, None, 0, False, str(e)
+
+
+class Command(BaseCommand):
+    help = 'Move flat media files into the sharded content-addressed layout, deduplicating identical files'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='Files hashed and linked in parallel')
+        parser.add_argument('--batch-size', type=int, default=500, help='Invoices updated per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the files to move')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        pending = Invoice.objects.exclude(pdf_file='').exclude(pdf_file__isnull=True) \
+            .only('id', 'invoice_number', 'pdf_file', 'pdf_hash').order_by('id')
+
+        if options['dry_run']:
+            count = sum(1 for invoice in pending.iterator() if not is_sharded_name(invoice.pdf_file.name))
+            self.stdout.write(f"{count} files to move")
+            return
+
+        moved = 0
+        deduplicated = 0
+        failed = 0
+        started = time.monotonic()
+        last_id = 0
+
+        try:
+            with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+                while True:
+                    invoices = list(pending.filter(id__gt=last_id)[:batch_size])
+                    if not invoices:
+                        break
+                    last_id = invoices[-1].id
+
+                    flat = [invoice for invoice in invoices if not is_sharded_name(invoice.pdf_file.name)]
+                    results = executor.map(
+                        lambda invoice: (invoice.id,) + _link_into_place(
+                            invoice.pdf_file.name, invoice.pdf_hash, is_generated_pdf(invoice)
+                        ),
+                        flat,
+                    )
+
+                    new_names = {}
+                    references = Counter()
+                    sizes = {}
+                    old_names = []
+                    for invoice_id, old_name, new_name, sha256, size, shared, error in results:
+                        if error:
+                            failed += 1
+                            self.stderr.write(f"Invoice {invoice_id}: {old_name}: {error}")
+                            continue
+                        new_names[invoice_id] = new_name
+                        old_names.append(old_name)
+                        deduplicated += shared
+                        if sha256:
+                            references[(new_name, sha256)] += 1
+                            sizes[new_name] = size
+
+                    if not new_names:
+                        continue
+
+                    with transaction.atomic():
+                        Invoice.objects.filter(pk__in=new_names.keys()).update(
+                            pdf_file=Case(
+                                *[When(pk=invoice_id, then=Value(name)) for invoice_id, name in new_names.items()],
+                                output_field=CharField(),
+                            )
+                        )
+                        for (name, sha256), count in references.items():
+                            add_reference(name, sha256, sizes[name], count)
+
+                    # The database now points at the sharded names
+                    for old_name in old_names:
+                        try:
+                            os.remove(os.path.join(settings.MEDIA_ROOT, old_name))
+                        except OSError:
+                            pass
+
+                    moved += len(new_names)
+                    self.stdout.write(f"Moved {moved} files...")
+        except Exception as e:
+            raise CommandError(f"Error moving media files: {str(e)}")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {moved} files in {elapsed:.2f}s ({deduplicated} duplicates shared)"
+        ))
+        if failed:
+            self.stdout.write(self.style.ERROR(f"{failed} files could not be moved"))
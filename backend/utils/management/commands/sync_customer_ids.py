@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from utils.customer_scope_utils import BATCH_SIZE, CUSTOMER_SOURCES, mismatched, sync_customer_ids
+
+
+class Command(BaseCommand):
+    help = ('Check the denormalized customer_id of services, invoices, service items and service history '
+            'against the car owner, and repair the rows that differ')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Rows updated per statement')
+        parser.add_argument('--check', action='store_true',
+                            help='Only report mismatched rows; fail if there are any')
+
+    def handle(self, *args, **options):
+        try:
+            started = time.monotonic()
+            total = 0
+            for label in CUSTOMER_SOURCES:
+                if options['check']:
+                    count = mismatched(label).count()
+                    self.stdout.write(f"{label}: {count} mismatched")
+                else:
+                    count = sync_customer_ids(label, batch_size=options['batch_size'])
+                    self.stdout.write(f"{label}: {count} repaired")
+                total += count
+        except Exception as e:
+            raise CommandError(f"Error syncing customer IDs: {str(e)}")
+
+        if options['check'] and total:
+            raise CommandError(f"{total} rows have a customer_id that differs from the car owner")
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} rows {'mismatched' if options['check'] else 'repaired'} in {elapsed:.2f}s"
+        ))
@@ -0,0 +1,221 @@
+"""
+Batch mileage ingestion for fleet telematics.
+
+The single-reading path (``POST /cars/{id}/report_mileage/``) validates each
+reading with its own queries and recomputes the car's service predictions twice
+per reading. This module validates a whole batch against the cars' current
+state fetched in one query, inserts the accepted readings with ``bulk_create``
+and advances ``Car.mileage`` with a single UPDATE, then recomputes predictions
+once per touched car.
+"""
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, When, Value, F, Max, Q, PositiveIntegerField
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core.models import Car, MileageUpdate
+from .vehicle_lookup_utils import normalize_plate_key
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of readings accepted in one request
+MAX_BATCH_SIZE = getattr(settings, 'MILEAGE_BATCH_MAX_SIZE', 5000)
+
+# Rows per INSERT statement
+INSERT_BATCH_SIZE = 1000
+
+# Tolerated clock skew for device timestamps in the future
+FUTURE_TOLERANCE = timedelta(minutes=5)
+
+
+def _reject(rejections, index, reading, reason):
+    rejections.append({
+        'index': index,
+        'car_id': reading.get('car_id') if isinstance(reading, dict) else None,
+        'license_plate': reading.get('license_plate') if isinstance(reading, dict) else None,
+        'mileage': reading.get('mileage') if isinstance(reading, dict) else None,
+        'reason': reason,
+    })
+
+
+def _parse_readings(readings, rejections):
+    """
+    Coerce raw readings into (index, car key, mileage, reported_date, notes) tuples.
+    Malformed readings are added to ``rejections`` instead of failing the batch.
+    """
+    now = timezone.now()
+    parsed = []
+
+    for index, reading in enumerate(readings):
+        if not isinstance(reading, dict):
+            _reject(rejections, index, reading, 'Reading must be an object')
+            continue
+
+        car_id = reading.get('car_id')
+        license_plate = reading.get('license_plate')
+        if car_id in (None, '') and not license_plate:
+            _reject(rejections, index, reading, 'car_id or license_plate is required')
+            continue
+
+        if car_id not in (None, ''):
+            try:
+                car_key = ('id', int(car_id))
+            except (TypeError, ValueError):
+                _reject(rejections, index, reading, 'car_id must be an integer')
+                continue
+        else:
+            car_key = ('plate', normalize_plate_key(license_plate))
+
+        try:
+            mileage = int(reading.get('mileage'))
+        except (TypeError, ValueError):
+            _reject(rejections, index, reading, 'mileage must be an integer')
+            continue
+        if mileage < 0:
+            _reject(rejections, index, reading, 'mileage cannot be negative')
+            continue
+
+        raw_date = reading.get('reported_date')
+        if raw_date:
+            reported_date = parse_datetime(str(raw_date))
+            if reported_date is None:
+                _reject(rejections, index, reading, 'reported_date is not a valid ISO 8601 datetime')
+                continue
+            if timezone.is_naive(reported_date):
+                reported_date = timezone.make_aware(reported_date)
+            if reported_date > now + FUTURE_TOLERANCE:
+                _reject(rejections, index, reading, 'reported_date is in the future')
+                continue
+        else:
+            reported_date = now
+
+        parsed.append((index, car_key, mileage, reported_date, reading.get('notes') or None))
+
+    return parsed
+
+
+def ingest_mileage_readings(readings, user=None, update_predictions=True):
+    """
+    Validate and store a batch of mileage readings.
+
+    Readings are validated per car in a single pass, in timestamp order: each
+    accepted reading must not be lower than the car's current mileage, the
+    highest previously reported mileage, or the previous accepted reading, and
+    must not predate the car's latest stored update.
+
+    Args:
+        readings (list): Dicts with ``car_id`` or ``license_plate``, ``mileage``,
+            and optional ``reported_date`` (ISO 8601) and ``notes``
+        user (User, optional): When given and not staff, only the user's own
+            cars are accepted
+        update_predictions (bool): Recompute service predictions for touched cars
+
+    Returns:
+        dict: ``accepted``, ``rejected``, ``cars_updated`` counts and the
+        itemized ``rejections`` list
+    """
+    rejections = []
+    parsed = _parse_readings(readings, rejections)
+
+    car_ids = {key[1] for _, key, _, _, _ in parsed if key[0] == 'id'}
+    plates = {key[1] for _, key, _, _, _ in parsed if key[0] == 'plate'}
+
+    # Fetch the current state of every referenced car in one query
+    cars = Car.objects.filter(Q(pk__in=car_ids) | Q(plate_key__in=plates))
+    if user is not None and not user.is_staff:
+        cars = cars.filter(customer__user_id=user.pk)
+    car_state = {}
+    plate_to_id = {}
+    for row in cars.annotate(
+        last_reported_mileage=Max('mileage_updates__mileage'),
+        last_reported_date=Max('mileage_updates__reported_date'),
+    ).values('id', 'plate_key', 'mileage', 'last_reported_mileage', 'last_reported_date'):
+        floor = max(row['mileage'], row['last_reported_mileage'] or 0)
+        car_state[row['id']] = {'floor': floor, 'last_date': row['last_reported_date']}
+        plate_to_id[row['plate_key']] = row['id']
+
+    # Group readings per car, then walk each group in timestamp order
+    per_car = defaultdict(list)
+    for index, car_key, mileage, reported_date, notes in parsed:
+        car_id = car_key[1] if car_key[0] == 'id' else plate_to_id.get(car_key[1])
+        if car_id not in car_state:
+            _reject(rejections, index, readings[index], 'Car not found')
+            continue
+        per_car[car_id].append((reported_date, mileage, index, notes))
+
+    to_create = []
+    new_mileage = {}
+    for car_id, car_readings in per_car.items():
+        car_readings.sort(key=lambda r: (r[0], r[1], r[2]))
+        state = car_state[car_id]
+        floor = state['floor']
+        last_date = state['last_date']
+        seen = set()
+
+        for reported_date, mileage, index, notes in car_readings:
+            if (reported_date, mileage) in seen:
+                _reject(rejections, index, readings[index], 'Duplicate reading')
+                continue
+            if last_date and reported_date < last_date:
+                _reject(rejections, index, readings[index],
+                        f"Reading predates the latest stored update ({last_date.isoformat()})")
+                continue
+            if mileage < floor:
+                _reject(rejections, index, readings[index],
+                        f"Reported mileage ({mileage}) cannot be less than the current mileage ({floor})")
+                continue
+
+            seen.add((reported_date, mileage))
+            floor = mileage
+            last_date = reported_date
+            to_create.append(MileageUpdate(
+                car_id=car_id,
+                mileage=mileage,
+                reported_date=reported_date,
+                notes=notes,
+            ))
+
+        if floor > state['floor']:
+            new_mileage[car_id] = floor
+
+    touched = {update.car_id for update in to_create}
+
+    with transaction.atomic():
+        MileageUpdate.objects.bulk_create(to_create, batch_size=INSERT_BATCH_SIZE)
+
+        # Advance every car's mileage with a single UPDATE; GREATEST keeps a
+        # concurrent writer from being rolled back to a lower value.
+        if new_mileage:
+            Car.objects.filter(pk__in=new_mileage.keys()).update(
+                mileage=Greatest(
+                    F('mileage'),
+                    Case(
+                        *[When(pk=car_id, then=Value(mileage)) for car_id, mileage in new_mileage.items()],
+                        output_field=PositiveIntegerField(),
+                    ),
+                ),
+                updated_at=timezone.now(),
+            )
+
+    if update_predictions:
+        for car in Car.objects.filter(pk__in=touched):
+            try:
+                car.update_service_predictions()
+            except Exception as e:
+                logger.error(f"Error updating service predictions for car {car.id}: {str(e)}")
+
+    rejections.sort(key=lambda r: r['index'])
+    logger.info(f"Mileage batch ingested: {len(to_create)} accepted, {len(rejections)} rejected, {len(touched)} cars updated")
+
+    return {
+        'accepted': len(to_create),
+        'rejected': len(rejections),
+        'cars_updated': len(touched),
+        'rejections': rejections,
+    }
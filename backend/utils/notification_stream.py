@@ -0,0 +1,88 @@
+"""
+Live notification events over Redis.
+
+When a Notification is committed, ``publish_notification`` appends it to a
+short per-user backlog (a sorted set scored by notification ID, used to resume
+after a reconnect) and publishes it on the user's pub/sub channel. The SSE
+endpoint in ``api.sse`` listens on those channels through one shared Redis
+connection per process.
+"""
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Set to False to stop publishing (e.g. when no Redis is available)
+STREAM_ENABLED = getattr(settings, 'NOTIFICATION_STREAM_ENABLED', True)
+
+# Redis used for the event channels and backlogs
+STREAM_REDIS_URL = getattr(settings, 'NOTIFICATION_STREAM_REDIS_URL', 'redis://127.0.0.1:6379/1')
+
+# Events kept per user for Last-Event-ID resume, and how long they are kept
+BACKLOG_SIZE = getattr(settings, 'NOTIFICATION_STREAM_BACKLOG_SIZE', 100)
+BACKLOG_TTL = getattr(settings, 'NOTIFICATION_STREAM_BACKLOG_TTL', 60 * 60 * 24)
+
+CHANNEL_PREFIX = 'notifications:events:user:'
+
+_client = None
+
+
+def channel_name(user_id):
+    return f"{CHANNEL_PREFIX}{user_id}"
+
+
+def backlog_key(user_id):
+    return f"notifications:backlog:user:{user_id}"
+
+
+def get_redis_client():
+    """Process-wide synchronous Redis client for publishing"""
+    global _client
+    if _client is None:
+        _client = redis.Redis.from_url(STREAM_REDIS_URL, socket_timeout=2, socket_connect_timeout=2)
+    return _client
+
+
+def serialize_notification(notification):
+    return {
+        'id': notification.id,
+        # Titles set with gettext_lazy are proxies, which json cannot dump
+        'title': str(notification.title),
+        'message': str(notification.message),
+        'notification_type': notification.notification_type,
+        'is_read': notification.is_read,
+        'created_at': notification.created_at.isoformat(),
+    }
+
+
+def _publish(user_id, event):
+    key = backlog_key(user_id)
+    try:
+        data = json.dumps(event)
+        pipe = get_redis_client().pipeline(transaction=False)
+        pipe.zadd(key, {data: event['id']})
+        pipe.zremrangebyrank(key, 0, -BACKLOG_SIZE - 1)
+        pipe.expire(key, BACKLOG_TTL)
+        pipe.publish(channel_name(user_id), data)
+        pipe.execute()
+    except (redis.RedisError, TypeError, ValueError) as e:
+        # Runs after the commit: clients fall back to the REST list, never fail the write for this
+        logger.warning(f"Failed to publish notification {event['id']} to stream: {str(e)}")
+
+
+def publish_notification(notification, user_id):
+    """
+    Push a new notification to the user's live stream once the transaction commits.
+
+    Args:
+        notification (Notification): The saved notification
+        user_id (int): ID of the customer's user account
+    """
+    if not STREAM_ENABLED:
+        return
+    event = serialize_notification(notification)
+    transaction.on_commit(lambda: _publish(user_id, event))
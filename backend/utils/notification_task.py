@@ -0,0 +1,44 @@
+import logging
+from celery import shared_task
+from .notification_utils import reconcile_unread_counts, archive_notifications, purge_archived_notifications
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def reconcile_unread_counts_task():
+    """
+    Celery task to rewrite the cached unread notification counters from the database.
+    
+    Returns:
+        dict: Number of counters written and how many had drifted
+    """
+    try:
+        return reconcile_unread_counts()
+    except Exception as e:
+        logger.error(f"Unread counter reconciliation failed: {str(e)}")
+        return {
+            'status': 'failed',
+            'error': str(e)
+        }
+
+@shared_task
+def archive_notifications_task():
+    """
+    Celery task to archive old read notifications and purge expired archives.
+    
+    Returns:
+        dict: Number of notifications archived and archived rows purged
+    """
+    try:
+        archived = archive_notifications()
+        purged = purge_archived_notifications()
+        return {
+            'archived': archived['archived'],
+            'purged': purged['deleted']
+        }
+    except Exception as e:
+        logger.error(f"Notification archival failed: {str(e)}")
+        return {
+            'status': 'failed',
+            'error': str(e)
+        }
@@ -0,0 +1,265 @@
+"""
+Per-customer unread notification counters.
+
+The unread badge is served from a counter in the cache (Redis in production)
+keyed by user ID, so polling it costs one GET and no database query. The
+counter is incremented when an unread Notification is committed, decremented
+by ``mark_read``, zeroed by ``mark_all_read`` and dropped on any other change,
+in which case the next read recounts from the database. A periodic task
+(``utils.notification_task.reconcile_unread_counts_task``) rewrites all
+counters from the database to correct any drift.
+
+Read notifications older than NOTIFICATION_RETENTION_DAYS are moved to the
+ArchivedNotification table by ``archive_notifications`` in short batched
+transactions, so the hot table stays small.
+"""
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# Counters are refreshed by the reconcile task well before they expire
+UNREAD_COUNT_TTL = getattr(settings, 'NOTIFICATION_UNREAD_COUNT_TTL', 60 * 60 * 24)
+
+# Keys written per set_many() call when reconciling
+RECONCILE_CHUNK_SIZE = 1000
+
+# Read notifications older than this are archived
+RETENTION_DAYS = getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+
+# Archived notifications older than this are deleted (None keeps them forever)
+ARCHIVE_RETENTION_DAYS = getattr(settings, 'NOTIFICATION_ARCHIVE_RETENTION_DAYS', None)
+
+# Rows moved per transaction
+ARCHIVE_BATCH_SIZE = getattr(settings, 'NOTIFICATION_ARCHIVE_BATCH_SIZE', 1000)
+
+
+def unread_count_key(user_id):
+    return f"notifications:unread:user:{user_id}"
+
+
+def count_unread_in_db(user_id):
+    """Count unread notifications with the partial notif_unread_idx index"""
+    from core.models import Notification
+    return Notification.objects.filter(customer__user_id=user_id, is_read=False).count()
+
+
+def get_unread_count(user_id):
+    """
+    Return the number of unread notifications for a user.
+
+    Args:
+        user_id (int): ID of the customer's user account
+
+    Returns:
+        int: Unread notification count
+    """
+    key = unread_count_key(user_id)
+    count = cache.get(key)
+    if count is None:
+        count = count_unread_in_db(user_id)
+        # add() so a concurrent increment that recreated the key is not overwritten
+        cache.add(key, count, timeout=UNREAD_COUNT_TTL)
+    return max(int(count), 0)
+
+
+def _adjust(user_id, delta):
+    key = unread_count_key(user_id)
+    try:
+        if delta > 0:
+            cache.incr(key, delta)
+        else:
+            cache.decr(key, -delta)
+    except ValueError:
+        # No counter cached yet; the next read counts from the database
+        pass
+
+
+def adjust_unread_count(user_id, delta):
+    """
+    Add ``delta`` to a user's counter once the current transaction commits.
+    A missing counter is left missing.
+    """
+    if delta:
+        transaction.on_commit(lambda: _adjust(user_id, delta))
+
+
+def set_unread_count(user_id, count):
+    """Overwrite a user's counter once the current transaction commits"""
+    transaction.on_commit(lambda: cache.set(unread_count_key(user_id), count, timeout=UNREAD_COUNT_TTL))
+
+
+def invalidate_unread_count(user_id):
+    """Drop a user's counter once the current transaction commits"""
+    transaction.on_commit(lambda: cache.delete(unread_count_key(user_id)))
+
+
+def reconcile_unread_counts():
+    """
+    Rewrite every customer's counter from the database.
+
+    Returns:
+        dict: Number of counters written and how many of them had drifted
+    """
+    from core.models import Customer
+
+    counts = Customer.objects.annotate(
+        unread=Count('notifications', filter=Q(notifications__is_read=False))
+    ).values_list('user_id', 'unread')
+
+    written = 0
+    drifted = 0
+    chunk = {}
+    for user_id, unread in counts.iterator(chunk_size=RECONCILE_CHUNK_SIZE):
+        chunk[unread_count_key(user_id)] = unread
+        if len(chunk) >= RECONCILE_CHUNK_SIZE:
+            drifted += _write_chunk(chunk)
+            written += len(chunk)
+            chunk = {}
+    if chunk:
+        drifted += _write_chunk(chunk)
+        written += len(chunk)
+
+    if drifted:
+        logger.warning(f"Reconciled unread notification counters: {drifted} of {written} had drifted")
+    return {'written': written, 'drifted': drifted}
+
+
+def _write_chunk(chunk):
+    cached = cache.get_many(list(chunk.keys()))
+    drifted = sum(1 for key, value in cached.items() if value != chunk[key])
+    cache.set_many(chunk, timeout=UNREAD_COUNT_TTL)
+    return drifted
+
+
+def archive_notifications(older_than_days=None, batch_size=None, max_batches=None, pause=0):
+    """
+    Move read notifications older than the retention period to the archive table.
+
+    Each batch is copied and deleted in its own short transaction. Rows locked
+    by another transaction are skipped and picked up by the next run.
+
+    Args:
+        older_than_days (int, optional): Defaults to NOTIFICATION_RETENTION_DAYS
+        batch_size (int, optional): Defaults to NOTIFICATION_ARCHIVE_BATCH_SIZE
+        max_batches (int, optional): Stop after this many batches
+        pause (float): Seconds to sleep between batches to limit load
+
+    Returns:
+        dict: Rows archived, batches run, elapsed seconds and rows/sec
+    """
+    from core.models import Notification, ArchivedNotification
+
+    days = RETENTION_DAYS if older_than_days is None else older_than_days
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    fields = ['id', 'customer_id', 'title', 'message', 'notification_type', 'created_at']
+
+    archived = 0
+    batches = 0
+    started = time.monotonic()
+
+    while max_batches is None or batches < max_batches:
+        with transaction.atomic():
+            rows = list(
+                Notification.objects.select_for_update(skip_locked=True)
+                .filter(is_read=True, created_at__lt=cutoff)
+                .order_by('id')
+                .values(*fields)[:batch_size]
+            )
+            if not rows:
+                break
+
+            now = timezone.now()
+            ArchivedNotification.objects.bulk_create([
+                ArchivedNotification(
+                    original_id=row['id'],
+                    customer_id=row['customer_id'],
+                    title=row['title'],
+                    message=row['message'],
+                    notification_type=row['notification_type'],
+                    created_at=row['created_at'],
+                    archived_at=now,
+                )
+                for row in rows
+            ], ignore_conflicts=True)
+            Notification.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+
+        archived += len(rows)
+        batches += 1
+        if pause:
+            time.sleep(pause)
+
+    elapsed = time.monotonic() - started
+    if archived:
+        logger.info(f"Archived {archived} notifications in {batches} batches ({elapsed:.2f}s)")
+
+    return {
+        'archived': archived,
+        'batches': batches,
+        'elapsed': elapsed,
+        'per_second': archived / elapsed if elapsed else 0.0,
+    }
+
+
+def purge_archived_notifications(older_than_days=None, batch_size=None):
+    """
+    Delete archived notifications older than NOTIFICATION_ARCHIVE_RETENTION_DAYS.
+
+    Returns:
+        dict: Rows deleted, elapsed seconds and rows/sec
+    """
+    from core.models import ArchivedNotification
+
+    days = ARCHIVE_RETENTION_DAYS if older_than_days is None else older_than_days
+    if days is None:
+        return {'deleted': 0, 'elapsed': 0.0, 'per_second': 0.0}
+
+    batch_size = batch_size or ARCHIVE_BATCH_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    started = time.monotonic()
+
+    while True:
+        ids = list(
+            ArchivedNotification.objects.filter(created_at__lt=cutoff)
+            .order_by('id').values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            break
+        deleted += ArchivedNotification.objects.filter(pk__in=ids).delete()[0]
+
+    elapsed = time.monotonic() - started
+    return {
+        'deleted': deleted,
+        'elapsed': elapsed,
+        'per_second': deleted / elapsed if elapsed else 0.0,
+    }
+
+
+def notification_table_stats():
+    """
+    Row counts of the live and archive tables, plus on-disk size on PostgreSQL.
+
+    Returns:
+        dict: Per table ``rows`` and ``size_bytes`` (None if unavailable)
+    """
+    from core.models import Notification, ArchivedNotification
+
+    stats = {}
+    for model in (Notification, ArchivedNotification):
+        table = model._meta.db_table
+        size = None
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_total_relation_size(%s)", [table])
+                size = cursor.fetchone()[0]
+        stats[table] = {'rows': model.objects.count(), 'size_bytes': size}
+    return stats
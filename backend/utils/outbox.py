@@ -0,0 +1,294 @@
+"""
+Transactional outbox for email and SMS notifications.
+
+Model ``save()`` methods call ``enqueue_message`` instead of sending inline.
+The outbox row is written in the caller's transaction, so a rolled-back change
+never produces a message. A dispatcher (``manage.py dispatch_outbox`` or the
+``utils.outbox_task.dispatch_outbox_task`` Celery task) drains pending rows in
+batches, with retries and exponential backoff.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import transaction, IntegrityError
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import OutboxMessage, Service, Invoice
+from .sms_utils import get_sms_config
+
+logger = logging.getLogger(__name__)
+
+# Delivery attempts before a message is marked as failed
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+
+# Backoff between attempts: base * 2^(attempt - 1), capped
+BACKOFF_BASE_SECONDS = getattr(settings, 'OUTBOX_BACKOFF_BASE_SECONDS', 30)
+BACKOFF_MAX_SECONDS = getattr(settings, 'OUTBOX_BACKOFF_MAX_SECONDS', 60 * 60)
+
+# How long a claimed message stays invisible to other dispatchers
+CLAIM_LEASE_SECONDS = getattr(settings, 'OUTBOX_CLAIM_LEASE_SECONDS', 5 * 60)
+
+# (event, channel) -> (model, queryset select_related, sender function path)
+HANDLERS = {
+    ('service_completed', 'email'): (Service, ['car__customer__user'], 'utils.email_utils.send_service_completed_notification'),
+    ('service_completed', 'sms'): (Service, ['car__customer__user'], 'utils.sms_utils.send_service_completed_sms'),
+    ('invoice_updated', 'email'): (Invoice, ['service__car__customer__user'], 'utils.email_utils.send_invoice_notification'),
+    ('invoice_created', 'sms'): (Invoice, ['service__car__customer__user'], 'utils.sms_utils.send_invoice_sms'),
+}
+
+
+class OutboxDeliveryError(Exception):
+    """Raised by a transport when a message could not be delivered and should be retried"""
+
+
+class DjangoTransport:
+    """
+    Deliver messages through the existing email/SMS utilities.
+    Email goes through Django's EMAIL_BACKEND, SMS through utils.sms_utils.
+    A batch of emails shares one backend connection, opened on first use.
+    """
+
+    def __init__(self):
+        self.connection = None
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def deliver(self, message, obj):
+        """
+        Send one message.
+
+        Returns:
+            str: 'sent' or 'skipped' (nothing to send, or no SMS provider configured)
+
+        Raises:
+            OutboxDeliveryError: If the provider reported a failure
+        """
+        sender = import_string(HANDLERS[(message.event, message.channel)][2])
+        if message.channel == 'email':
+            if self.connection is None:
+                self.connection = get_connection()
+                self.connection.open()
+            try:
+                result = sender(obj, connection=self.connection)
+            except Exception:
+                # Start the next message on a fresh connection
+                self.close()
+                raise
+        elif not get_sms_config()['api_key']:
+            # No SMS provider in this deployment: nothing to retry
+            return 'skipped'
+        else:
+            result = sender(obj)
+
+        # SMS helpers return a status dict, email helpers return a boolean
+        if isinstance(result, dict):
+            if result.get('status') == 'success':
+                return 'sent'
+            if result.get('status') == 'skipped':
+                return 'skipped'
+            raise OutboxDeliveryError(result.get('message') or 'SMS delivery failed')
+
+        return 'sent' if result else 'skipped'
+
+
+class StubTransport:
+    """
+    Local transport for tests: records messages instead of sending them.
+
+    Set ``OUTBOX_TRANSPORT = 'utils.outbox.StubTransport'`` or pass an instance
+    to ``dispatch_pending``. ``fail_times`` makes the first N deliveries raise,
+    to exercise the retry path.
+    """
+
+    def __init__(self, fail_times=0):
+        self.sent = []
+        self.fail_times = fail_times
+
+    def deliver(self, message, obj):
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise OutboxDeliveryError('Stub transport failure')
+        self.sent.append((message.event, message.channel, obj))
+        return 'sent'
+
+
+def get_transport():
+    """Instantiate the transport configured by OUTBOX_TRANSPORT"""
+    return import_string(getattr(settings, 'OUTBOX_TRANSPORT', 'utils.outbox.DjangoTransport'))()
+
+
+def enqueue_message(event, channel, obj, dedup_key=None):
+    """
+    Record a notification to be delivered after the current transaction commits.
+
+    Args:
+        event (str): Event name, e.g. 'service_completed'
+        channel (str): 'email' or 'sms'
+        obj: The Service or Invoice the message is about
+        dedup_key (str, optional): Unique key; enqueuing the same key twice is a no-op.
+            Defaults to '<event>:<channel>:<object id>'
+
+    Returns:
+        bool: True if a new message was recorded
+    """
+    if (event, channel) not in HANDLERS:
+        raise ValueError(f"No outbox handler for event '{event}' on channel '{channel}'")
+
+    dedup_key = dedup_key or f"{event}:{channel}:{obj.pk}"
+    try:
+        # The savepoint keeps a duplicate key from breaking the caller's transaction
+        with transaction.atomic():
+            OutboxMessage.objects.create(
+                event=event,
+                channel=channel,
+                object_id=obj.pk,
+                dedup_key=dedup_key,
+            )
+        return True
+    except IntegrityError:
+        logger.info(f"Outbox message {dedup_key} already queued, skipping")
+        return False
+
+
+def occurrence_key(event, channel, obj):
+    """
+    Dedup key of the next occurrence of ``event`` for ``obj``.
+
+    Numbered by the messages already recorded for it, so an event that can
+    happen again (a service completed, reopened and completed again) gets a
+    new key each time. Two enqueues of the same occurrence compute the same
+    key, and the second is dropped.
+    """
+    count = OutboxMessage.objects.filter(event=event, channel=channel, object_id=obj.pk).count()
+    return f"{event}:{channel}:{obj.pk}:{count + 1}"
+
+
+def _backoff(attempts):
+    """Delay before the next attempt, with jitter so failed batches spread out"""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * (2 ** max(attempts - 1, 0)))
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _claim_batch(batch_size):
+    """
+    Lock a batch of due messages and push their next attempt past the lease,
+    so concurrent dispatchers skip them while they are being delivered.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size]
+        )
+        if messages:
+            OutboxMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+                next_attempt_at=now + timedelta(seconds=CLAIM_LEASE_SECONDS)
+            )
+    return messages
+
+
+def _load_objects(messages):
+    """Fetch the objects referenced by a batch with one query per model"""
+    ids_by_key = {}
+    for message in messages:
+        model, related, _ = HANDLERS[(message.event, message.channel)]
+        ids_by_key.setdefault((model, tuple(related)), set()).add(message.object_id)
+
+    objects = {}
+    for (model, related), ids in ids_by_key.items():
+        for pk, obj in model.objects.select_related(*related).in_bulk(ids).items():
+            objects[(model, pk)] = obj
+    return objects
+
+
+def dispatch_pending(batch_size=100, transport=None):
+    """
+    Deliver one batch of pending outbox messages.
+
+    Args:
+        batch_size (int): Maximum number of messages to claim
+        transport (optional): Transport instance; defaults to OUTBOX_TRANSPORT
+
+    Returns:
+        dict: Number of messages sent, skipped, retried and failed
+    """
+    transport = transport or get_transport()
+    stats = {'sent': 0, 'skipped': 0, 'retried': 0, 'failed': 0}
+
+    messages = _claim_batch(batch_size)
+    if not messages:
+        return stats
+
+    objects = _load_objects(messages)
+
+    # Transports that hold connections (e.g. SMTP) keep them open for the batch
+    try:
+        _deliver_batch(messages, objects, transport, stats)
+    finally:
+        if hasattr(transport, 'close'):
+            transport.close()
+
+    OutboxMessage.objects.bulk_update(
+        messages, ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at']
+    )
+    return stats
+
+
+def _deliver_batch(messages, objects, transport, stats):
+    """Deliver claimed messages and record the outcome on each of them"""
+    for message in messages:
+        model = HANDLERS[(message.event, message.channel)][0]
+        obj = objects.get((model, message.object_id))
+        message.attempts += 1
+
+        if obj is None:
+            message.status = 'skipped'
+            message.last_error = f"{model.__name__} {message.object_id} no longer exists"
+        else:
+            try:
+                message.status = transport.deliver(message, obj)
+                message.last_error = None
+                if message.status == 'sent':
+                    message.sent_at = timezone.now()
+            except Exception as e:
+                message.last_error = str(e)
+                if message.attempts >= MAX_ATTEMPTS:
+                    message.status = 'failed'
+                    logger.error(f"Outbox message {message.dedup_key} failed after {message.attempts} attempts: {str(e)}")
+                else:
+                    message.status = 'pending'
+                    message.next_attempt_at = timezone.now() + _backoff(message.attempts)
+                    stats['retried'] += 1
+                    logger.warning(f"Outbox message {message.dedup_key} attempt {message.attempts} failed, retrying: {str(e)}")
+
+        if message.status in stats and message.status != 'pending':
+            stats[message.status] += 1
+
+
+def dispatch_all(batch_size=100, max_batches=None, transport=None):
+    """
+    Drain the outbox until no due messages remain.
+
+    Returns:
+        dict: Aggregated counts over all batches
+    """
+    transport = transport or get_transport()
+    totals = {'sent': 0, 'skipped': 0, 'retried': 0, 'failed': 0, 'batches': 0}
+
+    while max_batches is None or totals['batches'] < max_batches:
+        stats = dispatch_pending(batch_size=batch_size, transport=transport)
+        if not any(stats.values()):
+            break
+        totals['batches'] += 1
+        for key, value in stats.items():
+            totals[key] += value
+
+    return totals
@@ -0,0 +1,22 @@
+import logging
+from celery import shared_task
+from .outbox import dispatch_all
+
+logger = logging.getLogger(__name__)
+
+@shared_task
+def dispatch_outbox_task(batch_size=100, max_batches=50):
+    """
+    Celery task to deliver pending email/SMS notifications from the outbox.
+    
+    Returns:
+        dict: Number of messages sent, skipped, retried and failed
+    """
+    try:
+        return dispatch_all(batch_size=batch_size, max_batches=max_batches)
+    except Exception as e:
+        logger.error(f"Outbox dispatch task failed: {str(e)}")
+        return {
+            'status': 'failed',
+            'error': str(e)
+        }
@@ -1,17 +1,369 @@
+"""
+Invoice PDF rendering engine.
+
+Rendering is split in two steps so that many invoices can be produced quickly:
+
+1. ``fetch_invoice_data`` loads everything an invoice PDF shows (invoice,
+   customer, car, service and items) for any number of invoices in a single
+   joined query and returns plain, picklable snapshots.
+2. ``render_invoice_pdf`` turns one snapshot into PDF bytes using styles
+   built once per process.
+
+``generate_invoice_pdf`` renders one invoice and stores it on the model;
+``generate_invoice_pdfs`` renders a list of invoices across a process pool and
+reports pages/sec.
+
+Generated PDFs are keyed by a hash of their render inputs (the snapshot plus
+TEMPLATE_VERSION) and stored in the sharded layout of ``utils.storage`` as
+``invoices/<h[:2]>/<h[2:4]>/<hash>.pdf``.
+``ensure_invoice_pdf`` renders lazily, only when the hash no longer matches
+the stored file, and the hash doubles as the download's strong ETag.
+"""
+import hashlib
+import json
+import logging
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from io import BytesIO
 from django.conf import settings
-from django.utils import timezone
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models import Case, When, Value, CharField
+from django.utils import translation
 from django.utils.translation import gettext_lazy as _
-from django.core.files.base import ContentFile
 from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.lib.units import cm
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle, Image
-from django.db import connection
-from django.db import transaction
-from core.models import ServiceItem
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+from core.models import Invoice, ServiceItem
+from utils.cache_utils import bump_version
+from utils.storage import is_sharded_name, sharded_name, write_atomic
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so previously rendered PDFs can be told apart
+TEMPLATE_VERSION = 1
+
+# Invoices fetched per query in batch mode
+FETCH_CHUNK_SIZE = 200
+
+# Directory (under MEDIA_ROOT) where invoice PDFs are written
+INVOICE_PDF_DIR = 'invoices'
+
+# Columns fetched per invoice; item columns repeat once per service item
+INVOICE_FIELDS = {
+    'id': 'id',
+    'invoice_number': 'invoice_number',
+    'issued_date': 'issued_date',
+    'due_date': 'due_date',
+    'status': 'status',
+    'notes': 'notes',
+    'service_title': 'service__title',
+    'service_description': 'service__description',
+    'car_make': 'service__car__make',
+    'car_model': 'service__car__model',
+    'car_year': 'service__car__year',
+    'car_license_plate': 'service__car__license_plate',
+    'car_mileage': 'service__car__mileage',
+    'customer_phone': 'service__car__customer__phone',
+    'customer_address': 'service__car__customer__address',
+    'customer_first_name': 'service__car__customer__user__first_name',
+    'customer_last_name': 'service__car__customer__user__last_name',
+    'customer_email': 'service__car__customer__user__email',
+}
+ITEM_FIELDS = {
+    'item_id': 'service__items__id',
+    'name': 'service__items__name',
+    'item_type': 'service__items__item_type',
+    'quantity': 'service__items__quantity',
+    'unit_price': 'service__items__unit_price',
+}
+
+ITEMS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 12),
+    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+    ('BACKGROUND', (0, 1), (-1, -4), colors.white),
+    ('GRID', (0, 0), (-1, -4), 1, colors.black),
+    ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
+    ('FONTNAME', (0, -3), (2, -1), 'Helvetica-Bold'),
+    ('FONTNAME', (3, -1), (3, -1), 'Helvetica-Bold'),
+    ('LINEABOVE', (0, -3), (-1, -3), 1, colors.black),
+    ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
+])
+
+ITEMS_TABLE_COL_WIDTHS = [8 * cm, 2 * cm, 3 * cm, 3 * cm]
+
+
+@lru_cache(maxsize=1)
+def get_invoice_styles():
+    """Paragraph styles for invoices, built once per process"""
+    styles = getSampleStyleSheet()
+    styles.add(ParagraphStyle(
+        name='RightAlign',
+        parent=styles['Normal'],
+        alignment=2,  # right alignment
+    ))
+    return styles
+
+
+def fetch_invoice_data(invoice_ids):
+    """
+    Load the render inputs of many invoices with one joined query.
+
+    Args:
+        invoice_ids (iterable): Invoice IDs
+
+    Returns:
+        dict: Invoice ID -> snapshot dict (invoice, customer, car, service and items)
+    """
+    status_display = Case(
+        *[When(status=value, then=Value(str(label))) for value, label in Invoice.STATUS_CHOICES],
+        default='status',
+        output_field=CharField(),
+    )
+    rows = (
+        Invoice.objects.filter(pk__in=list(invoice_ids))
+        .annotate(status_display=status_display)
+        .values('status_display', *INVOICE_FIELDS.values(), *ITEM_FIELDS.values())
+        .order_by('id', 'service__items__id')
+    )
+
+    item_types = dict(ServiceItem.TYPE_CHOICES)
+    snapshots = {}
+    for row in rows:
+        snapshot = snapshots.get(row['id'])
+        if snapshot is None:
+            snapshot = {key: row[field] for key, field in INVOICE_FIELDS.items()}
+            snapshot['status_display'] = row['status_display']
+            snapshot['items'] = []
+            snapshots[row['id']] = snapshot
+
+        # LEFT JOIN: an invoice without items yields one row with empty item columns
+        if row[ITEM_FIELDS['item_id']] is not None:
+            item = {key: row[field] for key, field in ITEM_FIELDS.items()}
+            item['item_type_display'] = str(item_types.get(item['item_type'], item['item_type']))
+            item['total_price'] = item['quantity'] * item['unit_price']
+            snapshot['items'].append(item)
+
+    return snapshots
+
+
+def render_invoice_pdf(data):
+    """
+    Render an invoice snapshot to PDF.
+
+    Args:
+        data (dict): Snapshot from fetch_invoice_data
+
+    Returns:
+        tuple: (PDF bytes, number of pages)
+    """
+    styles = get_invoice_styles()
+    buffer = BytesIO()
+
+    doc = SimpleDocTemplate(
+        buffer,
+        pagesize=A4,
+        rightMargin=72,
+        leftMargin=72,
+        topMargin=72,
+        bottomMargin=72,
+        title=f"Invoice {data['invoice_number']}"
+    )
+
+    # Container for the 'Flowable' objects
+    elements = []
+
+    # Header
+    elements.append(Paragraph(f"<b>FACTURE #{data['invoice_number']}</b>", styles['Title']))
+    elements.append(Spacer(1, 0.5 * cm))
+
+    # Date and status
+    elements.append(Paragraph(f"<b>{_('Date')}:</b> {data['issued_date'].strftime('%d/%m/%Y')}", styles['Normal']))
+    elements.append(Paragraph(f"<b>{_('Due Date')}:</b> {data['due_date'].strftime('%d/%m/%Y')}", styles['Normal']))
+    elements.append(Paragraph(f"<b>{_('Status')}:</b> {data['status_display']}", styles['Normal']))
+    elements.append(Spacer(1, 0.5 * cm))
+
+    # Customer information
+    elements.append(Paragraph("<b>INFORMATIONS CLIENT</b>", styles['Heading2']))
+    elements.append(Paragraph(f"{data['customer_first_name']} {data['customer_last_name']}", styles['Normal']))
+    elements.append(Paragraph(f"{data['customer_phone']}", styles['Normal']))
+    if data['customer_address']:
+        elements.append(Paragraph(f"{data['customer_address']}", styles['Normal']))
+    elements.append(Paragraph(f"{data['customer_email']}", styles['Normal']))
+    elements.append(Spacer(1, 0.5 * cm))
+
+    # Car information
+    elements.append(Paragraph("<b>INFORMATIONS VÉHICULE</b>", styles['Heading2']))
+    elements.append(Paragraph(f"{data['car_make']} {data['car_model']} ({data['car_year']})", styles['Normal']))
+    elements.append(Paragraph(f"{_('License Plate')}: {data['car_license_plate']}", styles['Normal']))
+    elements.append(Paragraph(f"{_('Mileage')}: {data['car_mileage']} km", styles['Normal']))
+    elements.append(Spacer(1, 0.5 * cm))
+
+    # Service information
+    elements.append(Paragraph("<b>DÉTAILS DU SERVICE</b>", styles['Heading2']))
+    elements.append(Paragraph(f"<b>{data['service_title']}</b>", styles['Normal']))
+    elements.append(Paragraph(f"{data['service_description']}", styles['Normal']))
+    elements.append(Spacer(1, 0.5 * cm))
+
+    # Items table
+    table_data = [
+        [_('Description'), _('Quantity'), _('Unit Price'), _('Total')],
+    ]
+    for item in data['items']:
+        table_data.append([
+            f"{item['name']} ({item['item_type_display']})",
+            str(item['quantity']),
+            f"{item['unit_price']:.2f} DT",
+            f"{item['total_price']:.2f} DT",
+        ])
+
+    subtotal = sum(float(item['total_price']) for item in data['items'])
+
+    # Add subtotal and total
+    table_data.append(['', '', f"<b>{_('Subtotal')}</b>", f"{subtotal:.2f} DT"])
+    table_data.append(['', '', f"<b>{_('Total')}</b>", f"<b>{subtotal:.2f} DT</b>"])
+
+    table = Table(table_data, colWidths=ITEMS_TABLE_COL_WIDTHS)
+    table.setStyle(ITEMS_TABLE_STYLE)
+
+    elements.append(table)
+    elements.append(Spacer(1, 1 * cm))
+
+    # Notes
+    if data['notes']:
+        elements.append(Paragraph("<b>NOTES</b>", styles['Heading3']))
+        elements.append(Paragraph(data['notes'], styles['Normal']))
+
+    # Build the PDF
+    doc.build(elements)
+    pdf = buffer.getvalue()
+    buffer.close()
+
+    return pdf, doc.page
+
+
+def compute_render_hash(data):
+    """SHA-256 of everything that affects the rendered PDF, including the language of its labels"""
+    payload = json.dumps(
+        {'template_version': TEMPLATE_VERSION, 'language': translation.get_language(), 'data': data},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def invoice_pdf_name(render_hash):
+    """Storage name (relative to MEDIA_ROOT) of a generated PDF"""
+    return sharded_name(INVOICE_PDF_DIR, render_hash, '.pdf')
+
+
+def legacy_invoice_pdf_name(invoice_number, render_hash):
+    """Flat name generated PDFs had before the sharded layout"""
+    return f"{INVOICE_PDF_DIR}/invoice_{invoice_number}_{render_hash[:16]}.pdf"
+
+
+def _render_to_file(data, media_root, language):
+    """Render one snapshot in ``language`` and write it under ``media_root`` (runs in worker processes)"""
+    try:
+        with translation.override(language):
+            render_hash = compute_render_hash(data)
+            name = invoice_pdf_name(render_hash)
+            path = os.path.join(media_root, name)
+
+            # Same inputs, same bytes: reuse an existing artifact
+            if os.path.exists(path):
+                return data['id'], name, render_hash, 0, None
+
+            pdf, pages = render_invoice_pdf(data)
+        write_atomic(path, [pdf])
+        return data['id'], name, render_hash, pages, None
+    except Exception as e:
+        return data['id'], None, None, 0, str(e)
+
+
+def is_generated_pdf(invoice):
+    """True if the invoice's pdf_file was rendered by this module (not uploaded)"""
+    return bool(
+        invoice.pdf_hash and invoice.pdf_file
+        and invoice.pdf_file.name in (
+            invoice_pdf_name(invoice.pdf_hash),
+            legacy_invoice_pdf_name(invoice.invoice_number, invoice.pdf_hash),
+        )
+    )
+
+
+def _has_uploaded_pdf(invoice):
+    return bool(invoice.pdf_file) and not is_generated_pdf(invoice)
+
+
+def _remove_replaced_pdf(old_name, new_name):
+    if old_name and old_name != new_name:
+        try:
+            default_storage.delete(old_name)
+        except OSError:
+            pass
+
+
+def _store_pdf(invoice, name, render_hash):
+    """Point the invoice at a generated PDF without calling Invoice.save()"""
+    old_name = invoice.pdf_file.name if is_generated_pdf(invoice) else None
+    Invoice.objects.filter(pk=invoice.id).update(pdf_file=name, pdf_hash=render_hash)
+    # update() sends no signals; drop cached invoice data once the new file is visible
+    invoice_id = invoice.id
+    transaction.on_commit(lambda: bump_version(Invoice, invoice_id))
+    invoice.pdf_file.name = name
+    invoice.pdf_hash = render_hash
+    _remove_replaced_pdf(old_name, name)
+
+
+def ensure_invoice_pdf(invoice):
+    """
+    Return an up-to-date PDF for the invoice, rendering it only if needed.
+
+    Uploaded PDFs are returned as they are. Generated PDFs are re-rendered
+    only when the render inputs changed since the stored file was made.
+
+    Args:
+        invoice (Invoice): The invoice
+
+    Returns:
+        tuple: (storage name, strong ETag value), or (None, None) if the invoice is gone
+    """
+    if _has_uploaded_pdf(invoice):
+        name = invoice.pdf_file.name
+        if is_sharded_name(name):
+            # Content-addressed: the name is the content hash
+            return name, 'u' + os.path.splitext(os.path.basename(name))[0]
+        try:
+            size = invoice.pdf_file.size
+        except OSError:
+            size = 0
+        return name, 'u' + hashlib.sha256(f"{name}:{size}".encode()).hexdigest()[:32]
+
+    data = fetch_invoice_data([invoice.id]).get(invoice.id)
+    if data is None:
+        return None, None
+
+    render_hash = compute_render_hash(data)
+    name = invoice_pdf_name(render_hash)
+    if invoice.pdf_hash == render_hash and invoice.pdf_file.name == name \
+            and os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+        return name, render_hash
+
+    _, name, render_hash, _pages, error = _render_to_file(data, settings.MEDIA_ROOT, translation.get_language())
+    if error:
+        raise RuntimeError(error)
+
+    _store_pdf(invoice, name, render_hash)
+    return name, render_hash
+
 
 def generate_invoice_pdf(invoice):
     """
@@ -20,209 +372,121 @@ def generate_invoice_pdf(invoice):
     # Check if we're in a recursion loop
     if getattr(invoice, '_pdf_generation_in_progress', False):
         return None
-        
+
     # Set flag to prevent recursion
     invoice._pdf_generation_in_progress = True
-    
+
     try:
-        # Create a buffer to receive PDF data
-        buffer = BytesIO()
-        
-        # Create the PDF object using the buffer as its "file"
-        doc = SimpleDocTemplate(
-            buffer,
-            pagesize=A4,
-            rightMargin=72,
-            leftMargin=72,
-            topMargin=72,
-            bottomMargin=72,
-            title=f"Invoice {invoice.invoice_number}"
-        )
-        
-        # Container for the 'Flowable' objects
-        elements = []
-        
-        # Styles
-        styles = getSampleStyleSheet()
-        styles.add(ParagraphStyle(
-            name='RightAlign',
-            parent=styles['Normal'],
-            alignment=2,  # right alignment
-        ))
-        
-        # Header
-        elements.append(Paragraph(f"<b>FACTURE #{invoice.invoice_number}</b>", styles['Title']))
-        elements.append(Spacer(1, 0.5 * cm))
-        
-        # Date and status
-        elements.append(Paragraph(f"<b>{_('Date')}:</b> {invoice.issued_date.strftime('%d/%m/%Y')}", styles['Normal']))
-        elements.append(Paragraph(f"<b>{_('Due Date')}:</b> {invoice.due_date.strftime('%d/%m/%Y')}", styles['Normal']))
-        elements.append(Paragraph(f"<b>{_('Status')}:</b> {invoice.get_status_display()}", styles['Normal']))
-        elements.append(Spacer(1, 0.5 * cm))
-        
-        # Get related objects directly from database to avoid recursion
-        with connection.cursor() as cursor:
-            # Get customer information
-            cursor.execute("""
-                SELECT 
-                    c.phone, c.address, 
-                    u.first_name, u.last_name, u.email
-                FROM 
-                    core_customer c
-                JOIN 
-                    auth_user u ON c.user_id = u.id
-                JOIN 
-                    core_car car ON car.customer_id = c.id
-                JOIN 
-                    core_service s ON s.car_id = car.id
-                WHERE 
-                    s.id = %s
-            """, [invoice.service_id])
-            customer_data = cursor.fetchone()
-            
-            if customer_data:
-                phone, address, first_name, last_name, email = customer_data
-                
-                # Customer information
-                elements.append(Paragraph("<b>INFORMATIONS CLIENT</b>", styles['Heading2']))
-                elements.append(Paragraph(f"{first_name} {last_name}", styles['Normal']))
-                elements.append(Paragraph(f"{phone}", styles['Normal']))
-                if address:
-                    elements.append(Paragraph(f"{address}", styles['Normal']))
-                elements.append(Paragraph(f"{email}", styles['Normal']))
-                elements.append(Spacer(1, 0.5 * cm))
-            
-            # Get car information
-            cursor.execute("""
-                SELECT 
-                    car.make, car.model, car.year, car.license_plate, car.mileage
-                FROM 
-                    core_car car
-                JOIN 
-                    core_service s ON s.car_id = car.id
-                WHERE 
-                    s.id = %s
-            """, [invoice.service_id])
-            car_data = cursor.fetchone()
-            
-            if car_data:
-                make, model, year, license_plate, mileage = car_data
-                
-                # Car information
-                elements.append(Paragraph("<b>INFORMATIONS VÉHICULE</b>", styles['Heading2']))
-                elements.append(Paragraph(f"{make} {model} ({year})", styles['Normal']))
-                elements.append(Paragraph(f"{_('License Plate')}: {license_plate}", styles['Normal']))
-                elements.append(Paragraph(f"{_('Mileage')}: {mileage} km", styles['Normal']))
-                elements.append(Spacer(1, 0.5 * cm))
-            
-            # Get service information
-            cursor.execute("""
-                SELECT 
-                    title, description
-                FROM 
-                    core_service
-                WHERE 
-                    id = %s
-            """, [invoice.service_id])
-            service_data = cursor.fetchone()
-            
-            if service_data:
-                service_title, service_description = service_data
-                
-                # Service information
-                elements.append(Paragraph("<b>DÉTAILS DU SERVICE</b>", styles['Heading2']))
-                elements.append(Paragraph(f"<b>{service_title}</b>", styles['Normal']))
-                elements.append(Paragraph(f"{service_description}", styles['Normal']))
-                elements.append(Spacer(1, 0.5 * cm))
-            
-            # Get service items
-            cursor.execute("""
-                SELECT 
-                    name, item_type, quantity, unit_price, (quantity * unit_price) as total_price
-                FROM 
-                    core_serviceitem
-                WHERE 
-                    service_id = %s
-            """, [invoice.service_id])
-            service_items = cursor.fetchall()
-            
-            # Items table
-            data = [
-                [_('Description'), _('Quantity'), _('Unit Price'), _('Total')],
-            ]
-            
-            for item in service_items:
-                name, item_type, quantity, unit_price, total_price = item
-                item_type_display = dict(ServiceItem.TYPE_CHOICES).get(item_type, item_type)
-                data.append([
-                    f"{name} ({item_type_display})",
-                    str(quantity),
-                    f"{unit_price:.2f} DT",
-                    f"{total_price:.2f} DT",
-                ])
-        
-        # Calculate totals manually
-        subtotal = sum(float(item[4]) for item in service_items) if service_items else 0
-        
-        # Add subtotal and total
-        data.append(['', '', f"<b>{_('Subtotal')}</b>", f"{subtotal:.2f} DT"])
-        data.append(['', '', f"<b>{_('Total')}</b>", f"<b>{subtotal:.2f} DT</b>"])
-        
-        table = Table(data, colWidths=[8 * cm, 2 * cm, 3 * cm, 3 * cm])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -4), colors.white),
-            ('GRID', (0, 0), (-1, -4), 1, colors.black),
-            ('ALIGN', (1, 1), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, -3), (2, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (3, -1), (3, -1), 'Helvetica-Bold'),
-            ('LINEABOVE', (0, -3), (-1, -3), 1, colors.black),
-            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.black),
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 1 * cm))
-        
-        # Notes
-        if invoice.notes:
-            elements.append(Paragraph("<b>NOTES</b>", styles['Heading3']))
-            elements.append(Paragraph(invoice.notes, styles['Normal']))
-        
-        # Build the PDF
-        doc.build(elements)
-        
-        # Get the value of the BytesIO buffer and save it to the invoice
-        pdf = buffer.getvalue()
-        buffer.close()
-        
-        # Generate filename
-        filename = f"invoice_{invoice.invoice_number}.pdf"
-        
+        data = fetch_invoice_data([invoice.id]).get(invoice.id)
+        if data is None:
+            return None
+
+        _, name, render_hash, _pages, error = _render_to_file(data, settings.MEDIA_ROOT, translation.get_language())
+        if error:
+            raise RuntimeError(error)
+
         # Save the PDF to the invoice model - but without trigger save recursion
-        with transaction.atomic():
-            with connection.cursor() as cursor:
-                cursor.execute(
-                    "UPDATE core_invoice SET pdf_file = %s WHERE id = %s",
-                    [f"invoices/{filename}", invoice.id]
-                )
-        
-        # Create the file in the media directory
-        # Ensure the invoices directory exists
-        invoices_dir = os.path.join(settings.MEDIA_ROOT, 'invoices')
-        os.makedirs(invoices_dir, exist_ok=True)
-        
-        # Write the file
-        file_path = os.path.join(invoices_dir, filename)
-        with open(file_path, 'wb') as f:
-            f.write(pdf)
-        
-        return file_path
-    
+        _store_pdf(invoice, name, render_hash)
+
+        return os.path.join(settings.MEDIA_ROOT, name)
+
     finally:
         # Clear flag
         invoice._pdf_generation_in_progress = False
+
+
+def generate_invoice_pdfs(invoice_ids, workers=None, chunk_size=None):
+    """
+    Render many invoice PDFs in parallel and store them on their invoices.
+
+    Invoice data is bulk-fetched in chunks in this process; rendering and file
+    writes happen in a process pool.
+
+    Args:
+        invoice_ids (iterable): Invoice IDs to render
+        workers (int, optional): Worker processes (default: CPU count)
+        chunk_size (int, optional): Invoices fetched per query
+
+    Invoices with an uploaded PDF are skipped and keep it, as in
+    ``ensure_invoice_pdf``.
+
+    Returns:
+        dict: Invoices rendered (of which reused unchanged), skipped and
+        failed, pages, elapsed seconds and pages/sec
+    """
+    invoice_ids = list(invoice_ids)
+    chunk_size = chunk_size or FETCH_CHUNK_SIZE
+
+    rendered = 0
+    reused = 0
+    skipped = 0
+    failed = 0
+    pages = 0
+    started = time.monotonic()
+
+    # Labels are rendered in the caller's language, not the workers' default
+    language = translation.get_language()
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for i in range(0, len(invoice_ids), chunk_size):
+            chunk = invoice_ids[i:i + chunk_size]
+            # Uploaded PDFs are never replaced
+            uploaded = {
+                invoice.id
+                for invoice in Invoice.objects.filter(pk__in=chunk).only('id', 'invoice_number', 'pdf_file', 'pdf_hash')
+                if _has_uploaded_pdf(invoice)
+            }
+            skipped += len(uploaded)
+            snapshots = fetch_invoice_data([invoice_id for invoice_id in chunk if invoice_id not in uploaded])
+            if snapshots:
+                # The pool forks workers lazily on submit, after the queries above reopened
+                # the connection; they must not inherit this process's database sockets
+                connections.close_all()
+            futures = [executor.submit(_render_to_file, data, settings.MEDIA_ROOT, language) for data in snapshots.values()]
+
+            results = {}
+            for future in futures:
+                invoice_id, name, render_hash, page_count, error = future.result()
+                if error:
+                    failed += 1
+                    logger.error(f"Failed to render PDF for invoice {invoice_id}: {error}")
+                    continue
+                results[invoice_id] = (name, render_hash)
+                pages += page_count
+                if not page_count:
+                    reused += 1
+
+            if results:
+                # Generated files being replaced; uploaded PDFs are left alone
+                stale = [
+                    invoice.pdf_file.name
+                    for invoice in Invoice.objects.filter(pk__in=results.keys()).only('id', 'invoice_number', 'pdf_file', 'pdf_hash')
+                    if is_generated_pdf(invoice) and invoice.pdf_file.name != results[invoice.id][0]
+                ]
+                Invoice.objects.filter(pk__in=results.keys()).update(
+                    pdf_file=Case(
+                        *[When(pk=invoice_id, then=Value(name)) for invoice_id, (name, _) in results.items()],
+                        output_field=CharField(),
+                    ),
+                    pdf_hash=Case(
+                        *[When(pk=invoice_id, then=Value(render_hash)) for invoice_id, (_, render_hash) in results.items()],
+                        output_field=CharField(),
+                    ),
+                )
+                transaction.on_commit(lambda: bump_version(Invoice))
+                for name in stale:
+                    _remove_replaced_pdf(name, None)
+            rendered += len(results)
+
+    elapsed = time.monotonic() - started
+    logger.info(f"Rendered {rendered} invoice PDFs ({pages} pages) in {elapsed:.2f}s")
+
+    return {
+        'rendered': rendered,
+        'reused': reused,
+        'skipped': skipped,
+        'failed': failed,
+        'pages': pages,
+        'elapsed': elapsed,
+        'pages_per_second': pages / elapsed if elapsed else 0.0,
+    }
@@ -0,0 +1,126 @@
+"""
+Read-replica routing.
+
+``ReplicaRouter`` sends every write, and by default every read, to the
+primary. Reads go to a replica only inside a ``use_replica()`` scope, which
+is opened by:
+
+- ``api.replica_routing.ReplicaRoutingMixin`` for the viewset actions listed
+  in ``replica_actions`` (or READ_REPLICA_ACTIONS in settings)
+- ``api.replica_routing.replica_view`` for function views
+- ``run_scheduled_tasks`` for the nightly maintenance jobs
+
+Read-your-writes:
+
+- a request that writes reads from the primary for the rest of the request
+- a user who wrote is pinned to the primary for READ_REPLICA_PIN_SECONDS
+  (``pin_to_primary``, set by ``api.replica_routing.ReplicaPinMiddleware``)
+- reads inside a transaction on the primary stay on the primary
+- values built for the cache are read from the primary (``utils.cache_utils``)
+
+The replicas are the READ_REPLICAS database aliases. With none configured,
+``use_replica()`` does nothing and every query runs on the primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+READ_REPLICAS = list(getattr(settings, 'READ_REPLICAS', []))
+
+# Seconds a user's reads stay on the primary after they write
+PIN_SECONDS = getattr(settings, 'READ_REPLICA_PIN_SECONDS', 10)
+
+PIN_KEY_PREFIX = 'replica_pin'
+
+
+class _Scope:
+    def __init__(self, alias, sticky):
+        self.alias = alias
+        self.sticky = sticky
+
+
+# The replica scope of the current request, task or thread
+_scope = ContextVar('replica_scope', default=None)
+
+
+@contextmanager
+def use_replica(sticky=True):
+    """
+    Read from one replica, picked at random, inside the block.
+
+    Args:
+        sticky (bool): Read from the primary for the rest of the block after
+            the first write. Batch jobs whose reads do not depend on their own
+            earlier writes pass False to stay on the replica.
+    """
+    alias = random.choice(READ_REPLICAS) if READ_REPLICAS else None
+    token = _scope.set(_Scope(alias, sticky))
+    try:
+        yield alias
+    finally:
+        _scope.reset(token)
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, even within a replica scope"""
+    token = _scope.set(None)
+    try:
+        yield
+    finally:
+        _scope.reset(token)
+
+
+def current_read_alias():
+    """The alias reads go to at this point: a replica or the primary"""
+    scope = _scope.get()
+    if scope is None or scope.alias is None:
+        return DEFAULT_DB_ALIAS
+    # Reads in a transaction on the primary must see its uncommitted writes
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    return scope.alias
+
+
+def _pin_key(user_id):
+    return f"{PIN_KEY_PREFIX}:user:{user_id}"
+
+
+def pin_to_primary(user_id):
+    """Send the user's reads to the primary for the next PIN_SECONDS"""
+    if READ_REPLICAS and PIN_SECONDS > 0:
+        cache.set(_pin_key(user_id), 1, PIN_SECONDS)
+
+
+def is_pinned(user_id):
+    """Whether the user wrote within the last PIN_SECONDS"""
+    return bool(READ_REPLICAS) and cache.get(_pin_key(user_id)) is not None
+
+
+class ReplicaRouter:
+    """Writes, migrations and reads outside a replica scope go to the primary"""
+
+    def db_for_read(self, model, **hints):
+        return current_read_alias()
+
+    def db_for_write(self, model, **hints):
+        scope = _scope.get()
+        if scope is not None and scope.sticky:
+            scope.alias = None
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, *READ_REPLICAS}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in READ_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,169 @@
+"""
+Full-text search over services, invoices, customers and users.
+
+On PostgreSQL, each searched table has a generated ``search_vector`` tsvector
+column with a GIN index (core migration 0020). Free text uses the French
+configuration (settings.LANGUAGE_CODE is fr-fr), so "vidange" matches
+"vidanges". Names and e-mail addresses use the ``simple`` configuration,
+so they are not stemmed. The columns are maintained by PostgreSQL and are
+not declared on the models, so they are never loaded with the rows.
+
+Every search term is matched as a word prefix ("vid" finds "vidange"), all
+terms must match, and results are ordered by rank (title and invoice number
+weigh more than descriptions and notes).
+
+Other databases (local SQLite) fall back to ``icontains`` over the same
+columns, without ranking.
+"""
+import re
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connection
+from django.db.models import Expression, F, OuterRef, Q, Subquery
+
+from .vehicle_lookup_utils import car_id_for_plate, normalize_plate_key
+
+TEXT_SEARCH_CONFIG = getattr(settings, 'TEXT_SEARCH_CONFIG', 'french')
+NAME_SEARCH_CONFIG = 'simple'
+
+# Generated column name, see core migration 0020_full_text_search
+SEARCH_VECTOR_COLUMN = 'search_vector'
+
+# Fallback columns when the database has no full-text search
+FALLBACK_FIELDS = {
+    'core.Service': ['title', 'description', 'technician_notes'],
+    'core.Invoice': ['invoice_number', 'notes'],
+    'auth.User': ['username', 'email', 'first_name', 'last_name'],
+}
+
+WORD_RE = re.compile(r'\w+')
+PHONE_RE = re.compile(r'^\+?[\d\s().-]+$')
+# Could be a license plate: letters and digits, at least one digit
+PLATE_RE = re.compile(r'^(?=.*\d)[A-Z0-9]+$')
+
+
+class SearchVectorColumn(Expression):
+    """The generated search_vector column of the queried table"""
+
+    output_field = SearchVectorField()
+
+    def as_sql(self, compiler, connection):
+        alias = compiler.query.get_initial_alias()
+        qn = compiler.quote_name_unless_alias
+        return f"{qn(alias)}.{connection.ops.quote_name(SEARCH_VECTOR_COLUMN)}", []
+
+
+def is_supported():
+    return connection.vendor == 'postgresql'
+
+
+def prefix_query(text, config=TEXT_SEARCH_CONFIG):
+    """
+    tsquery matching every word of ``text`` as a prefix, or None if ``text``
+    has no words. Operators in the user input are dropped, so it never fails
+    to parse.
+    """
+    words = WORD_RE.findall(text)
+    if not words:
+        return None
+    return SearchQuery(' & '.join(f"{word}:*" for word in words), config=config, search_type='raw')
+
+
+def _fallback(queryset, text, fields, extra=None):
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f"{field}__icontains": text})
+    if extra is not None:
+        condition |= extra
+    return queryset.filter(condition)
+
+
+def _ranked(queryset, query, extra=None):
+    """Filter on the search vector, OR ``extra``, and order by rank"""
+    queryset = queryset.alias(_search_vector=SearchVectorColumn())
+    condition = Q(_search_vector=query)
+    if extra is not None:
+        condition |= extra
+    return queryset.filter(condition).annotate(
+        search_rank=SearchRank(F('_search_vector'), query)
+    ).order_by('-search_rank', '-pk')
+
+
+def normalize_plate(text):
+    """Lookup key of ``text`` if it could be a license plate, or None"""
+    plate = normalize_plate_key(text)
+    return plate if PLATE_RE.match(plate) else None
+
+
+def _plate_car_id(text):
+    plate = normalize_plate(text)
+    if plate is None:
+        return None
+    # Index-only lookup on the plate key; resolved first so the search can OR
+    # on an indexed column
+    return car_id_for_plate(plate)
+
+
+def search_services(queryset, text):
+    """Services matching ``text`` in title, description, technician notes or license plate"""
+    text = text.strip()
+    car_id = _plate_car_id(text)
+    extra = Q(car_id=car_id) if car_id is not None else None
+
+    if not is_supported():
+        return _fallback(queryset, text, FALLBACK_FIELDS['core.Service'], extra)
+    query = prefix_query(text)
+    if query is None:
+        return queryset.filter(extra) if extra is not None else queryset.none()
+    return _ranked(queryset, query, extra)
+
+
+def search_invoices(queryset, text):
+    """Invoices matching ``text`` in invoice number, notes or license plate"""
+    from core.models import Service
+
+    text = text.strip()
+    car_id = _plate_car_id(text)
+    extra = None
+    if car_id is not None:
+        extra = Q(service_id__in=list(Service.objects.filter(car_id=car_id).values_list('id', flat=True)))
+
+    if not is_supported():
+        return _fallback(queryset, text, FALLBACK_FIELDS['core.Invoice'], extra)
+    query = prefix_query(text)
+    if query is None:
+        return queryset.filter(extra) if extra is not None else queryset.none()
+    return _ranked(queryset, query, extra)
+
+
+def search_users(queryset, text):
+    """Users matching ``text`` in username, e-mail, first or last name"""
+    text = text.strip()
+    if not is_supported():
+        return _fallback(queryset, text, FALLBACK_FIELDS['auth.User'])
+    query = prefix_query(text, config=NAME_SEARCH_CONFIG)
+    if query is None:
+        return queryset.none()
+    return _ranked(queryset, query)
+
+
+def search_customers(queryset, text):
+    """
+    Customers matching ``text``: by phone number prefix if it looks like one,
+    otherwise by the name, e-mail and username of their user account.
+    """
+    from django.contrib.auth.models import User
+
+    text = text.strip()
+    if PHONE_RE.match(text):
+        return queryset.filter(phone__startswith=text)
+
+    users = search_users(User.objects.all(), text)
+    queryset = queryset.filter(user_id__in=users.values('id'))
+    if not is_supported():
+        return queryset
+    # Order by the rank of the matching user account
+    return queryset.annotate(
+        search_rank=Subquery(users.filter(pk=OuterRef('user_id')).values('search_rank')[:1])
+    ).order_by('-search_rank', '-pk')
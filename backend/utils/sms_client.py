@@ -0,0 +1,246 @@
+"""
+Pooled SMS gateway client.
+
+``utils.sms_utils.send_sms`` used to open a new HTTPS connection per message
+and send strictly one message at a time. ``SMSClient`` keeps a single
+``requests.Session`` (keep-alive connection pool) per process, sends bulk
+campaigns through a bounded thread pool or the provider's batch endpoint,
+throttles with a token bucket and retries transient failures with jittered
+exponential backoff.
+
+The client is independent of the ORM: it returns one result dict per message
+and leaves auditing to the caller (see ``utils.sms_utils.send_bulk_sms``).
+"""
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: ``rate`` tokens per second, up to ``capacity``.
+    A rate of 0 disables throttling.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(rate, 1))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """Block until ``tokens`` are available, then take them"""
+        if self.rate <= 0:
+            return
+
+        # Requests larger than the bucket wait for a full bucket and go into debt
+        needed = min(float(tokens), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= needed:
+                    self.tokens -= tokens
+                    return
+                wait = (needed - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class SMSClient:
+    """
+    Send SMS through an HTTP gateway over a shared connection pool.
+
+    Args:
+        api_key (str): Provider API key
+        sender_id (str): Sender name shown to the recipient
+        endpoint (str): Single-message endpoint URL
+        batch_endpoint (str, optional): Batch endpoint URL; when set,
+            ``send_many`` posts up to ``batch_size`` messages per request
+        timeout (float): Per-request timeout in seconds
+        max_retries (int): Retries after the first attempt for transient failures
+        rate_limit (float): Messages per second (0 disables throttling)
+        burst (int): Token bucket capacity
+        max_workers (int): Concurrent requests for ``send_many``
+        batch_size (int): Messages per batch request
+        backoff_base (float): First retry delay in seconds, doubled per attempt
+    """
+
+    def __init__(self, api_key, sender_id='ECAR', endpoint=None, batch_endpoint=None,
+                 timeout=10, max_retries=3, rate_limit=20, burst=None, max_workers=8,
+                 batch_size=100, backoff_base=0.5, session=None):
+        self.api_key = api_key
+        self.sender_id = sender_id
+        self.endpoint = endpoint
+        self.batch_endpoint = batch_endpoint or None
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.max_workers = max(1, int(max_workers))
+        self.batch_size = max(1, int(batch_size))
+        self.backoff_base = backoff_base
+        self.bucket = TokenBucket(rate_limit, burst)
+
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def _backoff(self, attempt, response=None):
+        """Delay before retry ``attempt`` (1-based), honoring Retry-After"""
+        if response is not None:
+            retry_after = response.headers.get('Retry-After')
+            if retry_after and retry_after.isdigit():
+                return float(retry_after)
+        return random.uniform(0, self.backoff_base * (2 ** (attempt - 1)))
+
+    def _post(self, url, payload, tokens=1):
+        """
+        POST with rate limiting and retries.
+
+        Returns:
+            tuple: (response JSON or None, attempts, error message or None)
+        """
+        attempts = 0
+        while True:
+            attempts += 1
+            self.bucket.acquire(tokens)
+            response = None
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+                if response.status_code not in RETRY_STATUS_CODES:
+                    response.raise_for_status()
+                    try:
+                        data = response.json()
+                    except ValueError:
+                        data = {}
+                    if not isinstance(data, dict):
+                        data = {'response': data}
+                    return data, attempts, None
+                error = f"HTTP {response.status_code}"
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = str(e)
+            except requests.exceptions.RequestException as e:
+                # Non-retryable client error (4xx)
+                return None, attempts, str(e)
+
+            if attempts > self.max_retries:
+                return None, attempts, error
+            delay = self._backoff(attempts, response)
+            logger.warning(f"SMS gateway request failed ({error}), retry {attempts}/{self.max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+
+    def _payload(self, phone_number, message):
+        return {
+            'api_key': self.api_key,
+            'sender_id': self.sender_id,
+            'phone': phone_number,
+            'message': message,
+        }
+
+    def send(self, phone_number, message):
+        """
+        Send one SMS.
+
+        Returns:
+            dict: ``status`` ('success' or 'failed'), ``attempts``,
+            ``provider_message_id`` and ``provider_response`` or ``message``
+        """
+        data, attempts, error = self._post(self.endpoint, self._payload(phone_number, message))
+        if error:
+            return {'status': 'failed', 'message': error, 'attempts': attempts}
+        return {
+            'status': 'success',
+            'provider_response': data,
+            'provider_message_id': str(data.get('id')) if data.get('id') is not None else None,
+            'attempts': attempts,
+        }
+
+    def _send_batch(self, batch):
+        """Send a list of (phone, message) through the batch endpoint"""
+        payload = {
+            'api_key': self.api_key,
+            'sender_id': self.sender_id,
+            'messages': [{'phone': phone, 'message': message} for phone, message in batch],
+        }
+        data, attempts, error = self._post(self.batch_endpoint, payload, tokens=len(batch))
+        if error:
+            return [{'status': 'failed', 'message': error, 'attempts': attempts} for _ in batch]
+
+        # Providers report per-message results in request order; a missing
+        # list means the whole batch was accepted.
+        items = data.get('results') or [{} for _ in batch]
+        results = []
+        for item in items[:len(batch)]:
+            if item.get('status') in ('failed', 'rejected'):
+                results.append({'status': 'failed', 'message': item.get('error') or 'Rejected by provider', 'attempts': attempts})
+            else:
+                results.append({
+                    'status': 'success',
+                    'provider_response': item,
+                    'provider_message_id': str(item['id']) if item.get('id') is not None else None,
+                    'attempts': attempts,
+                })
+        results.extend({'status': 'failed', 'message': 'Missing from provider response', 'attempts': attempts}
+                       for _ in range(len(batch) - len(results)))
+        return results
+
+    def send_many(self, messages):
+        """
+        Send many SMS concurrently.
+
+        Args:
+            messages (list): (phone_number, message) tuples
+
+        Returns:
+            list: One result dict per message, in input order
+        """
+        messages = list(messages)
+        if not messages:
+            return []
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            if self.batch_endpoint:
+                batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+                return [result for batch_results in executor.map(self._send_batch, batches)
+                        for result in batch_results]
+            return list(executor.map(lambda m: self.send(*m), messages))
+
+    def close(self):
+        self.session.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_sms_client():
+    """Return the process-wide client built from the SMS_* settings"""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SMSClient(
+                    api_key=getattr(settings, 'SMS_API_KEY', None),
+                    sender_id=getattr(settings, 'SMS_SENDER_ID', 'ECAR'),
+                    endpoint=getattr(settings, 'SMS_API_ENDPOINT', 'https://api.smsgateway.example/v1/messages'),
+                    batch_endpoint=getattr(settings, 'SMS_BATCH_ENDPOINT', None),
+                    timeout=getattr(settings, 'SMS_TIMEOUT', 10),
+                    max_retries=getattr(settings, 'SMS_MAX_RETRIES', 3),
+                    rate_limit=getattr(settings, 'SMS_RATE_LIMIT', 20),
+                    burst=getattr(settings, 'SMS_RATE_BURST', None),
+                    max_workers=getattr(settings, 'SMS_MAX_CONCURRENCY', 8),
+                    batch_size=getattr(settings, 'SMS_BATCH_SIZE', 100),
+                )
+    return _client
@@ -0,0 +1,118 @@
+"""
+Local fake SMS gateway for tests and benchmarks.
+
+Runs a threaded HTTP server on 127.0.0.1 that accepts the same payloads as the
+provider (``/v1/messages`` and ``/v1/messages/batch``), with optional latency
+and random transient failures to exercise the client's retry path::
+
+    with FakeSMSGateway(latency=0.05, failure_rate=0.1) as gateway:
+        client = SMSClient(api_key='test', endpoint=gateway.url,
+                           batch_endpoint=gateway.batch_url)
+        client.send_many(messages)
+        print(gateway.received)
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _GatewayHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like a real provider
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        gateway = self.server.gateway
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        with gateway.lock:
+            gateway.requests += 1
+        if gateway.latency:
+            time.sleep(gateway.latency)
+        if random.random() < gateway.failure_rate:
+            return self._respond(503, {'error': 'Service temporarily unavailable'})
+
+        if self.path.rstrip('/') == '/v1/messages':
+            messages = [payload]
+        elif self.path.rstrip('/') == '/v1/messages/batch':
+            messages = payload.get('messages', [])
+        else:
+            return self._respond(404, {'error': 'Not found'})
+
+        results = []
+        with gateway.lock:
+            for message in messages:
+                if not message.get('phone') or not message.get('message'):
+                    results.append({'status': 'rejected', 'error': 'phone and message are required'})
+                    continue
+                message_id = next(gateway.ids)
+                gateway.received.append((message['phone'], message['message']))
+                results.append({'id': message_id, 'status': 'queued'})
+
+        if self.path.rstrip('/') == '/v1/messages':
+            if results[0]['status'] == 'rejected':
+                return self._respond(400, results[0])
+            return self._respond(200, results[0])
+        return self._respond(200, {'results': results})
+
+
+class FakeSMSGateway:
+    """
+    Context manager running the fake gateway in a background thread.
+
+    Args:
+        latency (float): Seconds to wait before answering each request
+        failure_rate (float): Probability of answering 503 instead of accepting
+    """
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.received = []
+        self.requests = 0
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.server = None
+        self.thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/v1/messages"
+
+    @property
+    def batch_url(self):
+        return f"{self.url}/batch"
+
+    def start(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _GatewayHandler)
+        self.server.daemon_threads = True
+        self.server.gateway = self
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -1,6 +1,6 @@
 import logging
-import requests
 from django.conf import settings
+from .sms_client import get_sms_client
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +14,49 @@ def get_sms_config():
     return {
         'api_key': getattr(settings, 'SMS_API_KEY', None),
         'sender_id': getattr(settings, 'SMS_SENDER_ID', 'ECAR'),
+        'timeout': getattr(settings, 'SMS_TIMEOUT', 10),
     }
 
+def format_phone_number(phone_number):
+    """
+    Ensure a phone number has a country code
+    
+    Args:
+        phone_number (str): Local or international phone number
+        
+    Returns:
+        str: Phone number in international format
+    """
+    if not phone_number.startswith('+'):
+        # Default to Tunisia country code if not specified
+        phone_number = '+216' + phone_number.lstrip('0')
+    return phone_number
+
+def record_deliveries(messages, results):
+    """
+    Store the outcome of each SMS in the SMSDelivery audit table
+    
+    Args:
+        messages (list): (phone_number, message) tuples
+        results (list): Result dicts from SMSClient, in the same order
+    """
+    from core.models import SMSDelivery
+    
+    try:
+        SMSDelivery.objects.bulk_create([
+            SMSDelivery(
+                phone_number=phone_number,
+                message=message,
+                status='sent' if result['status'] == 'success' else 'failed',
+                provider_message_id=result.get('provider_message_id'),
+                attempts=result.get('attempts', 1),
+                error=result.get('message') if result['status'] != 'success' else None,
+            )
+            for (phone_number, message), result in zip(messages, results)
+        ], batch_size=500)
+    except Exception as e:
+        logger.error(f"Failed to record SMS deliveries: {str(e)}")
+
 def send_sms(phone_number, message):
     """
     Send an SMS to a customer
@@ -36,41 +77,55 @@ def send_sms(phone_number, message):
             'message': 'SMS API key not configured'
         }
     
-    # Format phone number - ensure it has country code
-    if not phone_number.startswith('+'):
-        # Default to Tunisia country code if not specified
-        phone_number = '+216' + phone_number.lstrip('0')
+    phone_number = format_phone_number(phone_number)
     
-    try:
-        # This is a template for a generic SMS API service
-        # Replace this with your actual SMS provider's API
-        api_endpoint = "https://api.smsgateway.example/v1/messages"
-        
-        payload = {
-            'api_key': config['api_key'],
-            'sender_id': config['sender_id'],
-            'phone': phone_number,
-            'message': message,
-        }
-        
-        # Send the request to the SMS provider
-        response = requests.post(api_endpoint, json=payload)
-        response.raise_for_status()  # Raise exception for non-2xx responses
-        
-        result = response.json()
+    # The pooled client reuses keep-alive connections and retries transient failures
+    result = get_sms_client().send(phone_number, message)
+    record_deliveries([(phone_number, message)], [result])
+    
+    if result['status'] == 'success':
         logger.info(f"SMS sent to {phone_number}")
+    else:
+        logger.error(f"Failed to send SMS: {result['message']}")
+    
+    return result
+
+def send_bulk_sms(messages):
+    """
+    Send many SMS concurrently, e.g. for reminder campaigns
+    
+    Messages go out through the provider batch endpoint when SMS_BATCH_ENDPOINT
+    is set, otherwise over up to SMS_MAX_CONCURRENCY parallel connections,
+    throttled to SMS_RATE_LIMIT messages per second.
+    
+    Args:
+        messages (list): (phone_number, message) tuples
         
-        return {
-            'status': 'success',
-            'provider_response': result
-        }
-        
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to send SMS: {str(e)}")
+    Returns:
+        dict: Number of messages sent and failed, and the per-message results
+    """
+    config = get_sms_config()
+    
+    if not config['api_key']:
+        logger.warning("SMS_API_KEY not configured. Bulk SMS not sent.")
         return {
             'status': 'failed',
-            'message': str(e)
+            'message': 'SMS API key not configured'
         }
+    
+    messages = [(format_phone_number(phone), text) for phone, text in messages]
+    results = get_sms_client().send_many(messages)
+    record_deliveries(messages, results)
+    
+    sent = sum(1 for result in results if result['status'] == 'success')
+    logger.info(f"Bulk SMS: {sent} sent, {len(results) - sent} failed")
+    
+    return {
+        'status': 'success',
+        'sent': sent,
+        'failed': len(results) - sent,
+        'results': results
+    }
 
 def send_service_completed_sms(service):
     """
@@ -0,0 +1,113 @@
+"""
+Local SMTP sink for tests and benchmarks.
+
+Accepts mail on 127.0.0.1 without TLS or authentication and keeps the raw
+messages in memory. It counts connections, so tests can assert that a batch
+went over a single session::
+
+    with SMTPSink() as sink:
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+                               EMAIL_HOST='127.0.0.1', EMAIL_PORT=sink.port,
+                               EMAIL_USE_TLS=False, EMAIL_HOST_USER=''):
+            send_bulk_emails(messages)
+        print(len(sink.messages), sink.connections)
+"""
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    disable_nagle_algorithm = True
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        sink = self.server.sink
+        with sink.lock:
+            sink.connections += 1
+
+        self.reply('220 localhost ECAR SMTP sink')
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+
+            if verb == 'EHLO':
+                self.wfile.write(b'250-localhost\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(command[8:].strip().strip('<>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk == b'.\r\n':
+                        break
+                    # Undo dot-stuffing
+                    data.append(chunk[1:] if chunk.startswith(b'..') else chunk)
+                if sink.latency:
+                    time.sleep(sink.latency)
+                with sink.lock:
+                    sink.messages.append((recipients, b''.join(data)))
+                self.reply('250 OK: queued')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+class SMTPSink:
+    """
+    Context manager running the sink in a background thread.
+
+    Args:
+        latency (float): Seconds to wait before accepting each message
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.messages = []
+        self.connections = 0
+        self.lock = threading.Lock()
+        self.server = None
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.server = _ThreadingTCPServer(('127.0.0.1', 0), _SMTPHandler)
+        self.server.sink = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,193 @@
+"""
+Sharded, content-addressed media storage.
+
+``ShardedContentStorage`` (the default storage, see STORAGES in settings)
+names every saved file after the SHA-256 of its content and places it two
+directory levels deep, e.g. ``invoices/3f/a2/3fa2…c9.pdf``. No directory holds
+more than a few entries, so lookups, backups and rsync do not slow down as the
+number of files grows, and identical uploads are stored once. The StoredFile
+table counts the references to each file; ``delete`` removes the file only
+when the last reference is released. A new file is moved into place when
+the transaction that references it commits, and dropped if it rolls back.
+
+Generated invoice PDFs (``utils.pdf_utils``) use the same layout keyed by
+their render hash and are written directly by the render workers.
+"""
+import hashlib
+import os
+import posixpath
+import re
+import tempfile
+import weakref
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+# Read size when hashing existing files
+HASH_CHUNK_SIZE = 1024 * 1024
+
+SHARDED_NAME_RE = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[\w]+)?$')
+
+
+def sharded_name(directory, digest, extension=''):
+    """Storage name of a file keyed by ``digest`` under ``directory``"""
+    return posixpath.join(directory, digest[:2], digest[2:4], f"{digest}{extension}")
+
+
+def is_sharded_name(name):
+    return bool(SHARDED_NAME_RE.search(name or ''))
+
+
+def file_mode():
+    return settings.FILE_UPLOAD_PERMISSIONS or 0o644
+
+
+def write_atomic(path, chunks):
+    """
+    Write ``chunks`` to ``path`` through a temporary file in the same directory,
+    so readers never see a partial file.
+
+    Returns:
+        tuple: (sha256 hex digest, size in bytes)
+    """
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in chunks:
+                digest.update(chunk)
+                size += len(chunk)
+                f.write(chunk)
+        # mkstemp creates 0600 files, which nginx could not serve
+        os.chmod(tmp_path, file_mode())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest.hexdigest(), size
+
+
+def hash_file(path):
+    """SHA-256 hex digest and size of a file on disk"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+def _remove_if_exists(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def on_commit_or_discard(on_commit, on_discard):
+    """
+    Run ``on_commit`` once the current transaction commits, or ``on_discard``
+    if it is rolled back. Immediately, outside a transaction.
+
+    Django has no rollback hook, but a rollback drops the pending on_commit
+    callbacks. ``on_discard`` therefore runs when the callback is released
+    without having run.
+    """
+    state = {'ran': False}
+
+    def callback():
+        state['ran'] = True
+        on_commit()
+
+    weakref.finalize(callback, lambda: None if state['ran'] else on_discard())
+    transaction.on_commit(callback)
+
+
+def add_reference(name, sha256, size, count=1):
+    """Record ``count`` new references to a stored file"""
+    from core.models import StoredFile
+
+    with transaction.atomic():
+        stored, created = StoredFile.objects.select_for_update().get_or_create(
+            name=name, defaults={'sha256': sha256, 'size': size, 'reference_count': count}
+        )
+        if not created:
+            StoredFile.objects.filter(pk=stored.pk).update(reference_count=F('reference_count') + count)
+
+
+class ShardedContentStorage(FileSystemStorage):
+    """FileSystemStorage that stores each distinct content once, under a hash-sharded path"""
+
+    def get_available_name(self, name, max_length=None):
+        # The final name is derived from the content in _save(), so it never collides
+        return name
+
+    def _save(self, name, content):
+        from core.models import StoredFile
+
+        directory = posixpath.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        tmp_directory = self.path(directory)
+        os.makedirs(tmp_directory, exist_ok=True)
+
+        # Hash while spooling to a temporary file, so the content is read once
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=tmp_directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    size += len(chunk)
+                    f.write(chunk)
+            os.chmod(tmp_path, file_mode())
+
+            sha256 = digest.hexdigest()
+            name = sharded_name(directory, sha256, extension)
+            path = self.path(name)
+
+            # The row lock orders this against a concurrent delete() of the same content
+            with transaction.atomic():
+                stored, created = StoredFile.objects.select_for_update().get_or_create(
+                    name=name, defaults={'sha256': sha256, 'size': size}
+                )
+                if not created:
+                    StoredFile.objects.filter(pk=stored.pk).update(reference_count=F('reference_count') + 1)
+        except BaseException:
+            _remove_if_exists(tmp_path)
+            raise
+
+        def move_into_place():
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(tmp_path, path)
+            _remove_if_exists(tmp_path)
+
+        # The file is placed only once its reference is committed, so a rolled
+        # back upload leaves no unreferenced file behind
+        on_commit_or_discard(move_into_place, lambda: _remove_if_exists(tmp_path))
+        return name
+
+    def delete(self, name):
+        """Release one reference; the file goes when none are left"""
+        from core.models import StoredFile
+
+        if not name:
+            raise ValueError("The name must be given to delete().")
+
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(name=name).first()
+            if stored is not None:
+                if stored.reference_count > 1:
+                    StoredFile.objects.filter(pk=stored.pk).update(reference_count=F('reference_count') - 1)
+                    return
+                stored.delete()
+            # Unreferenced or untracked (e.g. generated PDFs): remove the file
+            super().delete(name)
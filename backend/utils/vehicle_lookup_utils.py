@@ -0,0 +1,119 @@
+"""
+License plate and VIN lookups that ignore how the value was typed.
+
+Every car stores a normalized copy of its plate and VIN (``Car.plate_key``
+and ``Car.vin_key``), maintained by ``Car.save()``: upper case, letters and
+digits only. "123 tu 4567", "123-TU-4567" and "123TU4567" all have the key
+"123TU4567". Arabic "تونس" is read as "TU". VIN keys also map the letters a
+VIN never contains (I, O, Q) to the digits they are mistaken for (1, 0, 0).
+
+``lookup_car_ids`` matches a key exactly, by prefix, or by suffix ("the car
+ending in 4567"). On PostgreSQL, each key has a ``varchar_pattern_ops``
+index and a ``reverse(key)`` index, both covering ``id`` and
+``customer_id`` (core migration 0022): exact and prefix matches read the
+first, suffix matches are prefix matches on the reversed key and read the
+second. Either way the lookup is an index-only scan.
+"""
+import re
+
+from django.conf import settings
+from django.db.models import Q
+from django.db.models.functions import Reverse
+
+VEHICLE_LOOKUP_LIMIT = getattr(settings, 'VEHICLE_LOOKUP_LIMIT', 20)
+
+# Prefix and suffix matches need this many characters, so "1" does not
+# return every car
+PARTIAL_MIN_LENGTH = 2
+
+MATCH_MODES = ('exact', 'prefix', 'suffix')
+FIELDS = {'plate': 'plate_key', 'vin': 'vin_key'}
+
+NON_ALNUM_RE = re.compile(r'[^A-Z0-9]')
+ARABIC_TU = 'تونس'
+VIN_LOOKALIKES = str.maketrans({'I': '1', 'O': '0', 'Q': '0'})
+
+
+def normalize_plate_key(value):
+    """Lookup key of a license plate, '' if it has no letters or digits"""
+    if not value:
+        return ''
+    value = str(value).replace(ARABIC_TU, 'TU').upper()
+    return NON_ALNUM_RE.sub('', value)
+
+
+def normalize_vin_key(value):
+    """Lookup key of a VIN, or None if it has no letters or digits"""
+    if not value:
+        return None
+    key = NON_ALNUM_RE.sub('', str(value).upper()).translate(VIN_LOOKALIKES)
+    return key or None
+
+
+NORMALIZERS = {'plate_key': normalize_plate_key, 'vin_key': normalize_vin_key}
+
+
+def _key_condition(field, key, match):
+    if match == 'exact':
+        return Q(**{field: key})
+    if match == 'prefix':
+        return Q(**{f"{field}__startswith": key})
+    return Q(**{f"_{field}_reversed__startswith": key[::-1]})
+
+
+def lookup_car_ids(term, match='exact', fields=None, queryset=None, limit=None):
+    """
+    IDs of the cars whose plate or VIN matches ``term``, however it is written.
+
+    Args:
+        term (str): What the user typed, e.g. "123 tu 4567" or "4567"
+        match (str): 'exact', 'prefix' or 'suffix'
+        fields (iterable, optional): 'plate' and/or 'vin'. Defaults to both.
+        queryset (QuerySet, optional): Cars to search, e.g. a customer's own
+        limit (int, optional): Maximum results. Defaults to VEHICLE_LOOKUP_LIMIT.
+
+    Returns:
+        list: Car primary keys, ordered by the matched key
+
+    Raises:
+        ValueError: If ``match`` or a field is unknown
+    """
+    from core.models import Car
+
+    fields = tuple(fields or FIELDS)
+    if match not in MATCH_MODES:
+        raise ValueError(f"match must be one of {', '.join(MATCH_MODES)}")
+    unknown = set(fields) - set(FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown lookup field: {', '.join(sorted(unknown))}")
+
+    queryset = Car.objects.all() if queryset is None else queryset
+    limit = limit or VEHICLE_LOOKUP_LIMIT
+
+    condition = Q()
+    for name in fields:
+        field = FIELDS[name]
+        key = NORMALIZERS[field](term)
+        if not key or (match != 'exact' and len(key) < PARTIAL_MIN_LENGTH):
+            continue
+        if match == 'suffix':
+            # Matches the reverse(key) expression index
+            queryset = queryset.alias(**{f"_{field}_reversed": Reverse(field)})
+        condition |= _key_condition(field, key, match)
+    if not condition:
+        return []
+
+    # One field: in index order
+    order = [FIELDS[fields[0]]] if len(fields) == 1 else []
+    return list(queryset.filter(condition).order_by(*order, 'pk').values_list('pk', flat=True)[:limit])
+
+
+def car_id_for_plate(plate, queryset=None):
+    """ID of the car with this license plate, however it is written, or None"""
+    key = normalize_plate_key(plate)
+    if not key:
+        return None
+    from core.models import Car
+
+    queryset = Car.objects.all() if queryset is None else queryset
+    return queryset.filter(plate_key=key).values_list('pk', flat=True).first()